@@ -0,0 +1,280 @@
+"""
+Carga em massa direto no Oracle, sem passar pela API HTTP.
+
+Usado para backfill de histórico: lê CSV, Parquet ou NDJSON em blocos,
+insere cada bloco com executemany (array binding) e faz um commit por
+bloco. Na mesma transação das linhas, o bloco é registrado na tabela de
+controle irrigacao_cargas (chave: carga + bloco). Uma carga interrompida
+continua de onde parou ao ser executada de novo, e um bloco já confirmado
+nunca é inserido outra vez: a chave primária do registro rejeita a
+repetição e a transação é desfeita.
+
+Valores ausentes nas colunas numéricas e de status entram como NULL.
+
+Uso:
+    python backend/bulk_loader.py dados.ndjson
+    python backend/bulk_loader.py historico.parquet --workers 4 --bloco 50000
+"""
+import argparse
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import oracledb
+import pandas as pd
+
+from oracle_db import conectar_oracle, criar_tabela_se_nao_existir, TABELA
+
+COLUNAS_OBRIGATORIAS = ['humidity', 'temperature', 'ph', 'fosforo_presente', 'potassio_presente', 'bomba_status']
+
+# Tabela de controle: um registro por bloco confirmado de cada carga
+TABELA_CARGAS = 'irrigacao_cargas'
+
+
+def identificar_carga(caminho):
+    # O mesmo arquivo (caminho e tamanho) é sempre a mesma carga
+    tamanho = os.path.getsize(caminho)
+    return hashlib.sha1(f"{os.path.abspath(caminho)}|{tamanho}".encode()).hexdigest()[:16]
+
+
+def criar_tabela_cargas(conn):
+    # Cria a tabela de controle de blocos na primeira carga
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*) FROM user_tables WHERE table_name = UPPER(:1)", (TABELA_CARGAS,))
+    if cur.fetchone()[0] == 0:
+        cur.execute(f"""
+            CREATE TABLE {TABELA_CARGAS} (
+                carga_id VARCHAR2(40),
+                bloco NUMBER,
+                tamanho_bloco NUMBER,
+                linhas NUMBER,
+                concluido_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (carga_id, bloco)
+            )
+        """)
+        conn.commit()
+        print(f"Tabela {TABELA_CARGAS} criada com sucesso")
+    cur.close()
+
+
+def ler_blocos(caminho, tamanho_bloco):
+    # Gera (indice, DataFrame) para cada bloco do arquivo de entrada
+    extensao = os.path.splitext(caminho)[1].lower()
+
+    if extensao == '.csv':
+        leitor = pd.read_csv(caminho, chunksize=tamanho_bloco)
+    elif extensao in ('.ndjson', '.jsonl'):
+        leitor = pd.read_json(caminho, lines=True, chunksize=tamanho_bloco)
+    elif extensao == '.parquet':
+        import pyarrow.parquet as pq
+        arquivo = pq.ParquetFile(caminho)
+        leitor = (lote.to_pandas() for lote in arquivo.iter_batches(batch_size=tamanho_bloco))
+    else:
+        raise ValueError(f"Formato não suportado: {extensao} (use .csv, .parquet ou .ndjson)")
+
+    for indice, bloco in enumerate(leitor):
+        yield indice, bloco
+
+
+def preparar_linhas(df):
+    # Converte um bloco em lista de tuplas na ordem do INSERT
+    df = df.rename(columns=str.lower)
+    faltando = [c for c in COLUNAS_OBRIGATORIAS if c not in df.columns]
+    if faltando:
+        raise ValueError(f"Colunas obrigatórias ausentes: {', '.join(faltando)}")
+
+    colunas = list(COLUNAS_OBRIGATORIAS)
+    saida = pd.DataFrame({
+        'humidity': pd.to_numeric(df['humidity']),
+        'temperature': pd.to_numeric(df['temperature']),
+        'ph': pd.to_numeric(df['ph']),
+        # Int64 aceita ausentes (astype(int) falharia com NaN)
+        'fosforo_presente': pd.to_numeric(df['fosforo_presente']).round().astype('Int64'),
+        'potassio_presente': pd.to_numeric(df['potassio_presente']).round().astype('Int64'),
+        'bomba_status': df['bomba_status'].astype('string').str.upper(),
+    })
+
+    # Mantém o horário original da leitura quando o arquivo traz essa coluna
+    if 'data_coleta' in df.columns:
+        datas = pd.to_datetime(df['data_coleta'])
+        if datas.dt.tz is not None:
+            datas = datas.dt.tz_convert(None)
+        saida['data_coleta'] = datas
+        colunas.append('data_coleta')
+
+    # Dispositivo/campo de origem (opcional; sem ele a leitura entra só no modelo global)
+    if 'dispositivo_id' in df.columns:
+        dispositivos = df['dispositivo_id']
+        if pd.api.types.is_float_dtype(dispositivos):
+            # Ids inteiros com ausentes chegam como float do CSV/NDJSON
+            dispositivos = dispositivos.astype('Int64')
+        saida['dispositivo_id'] = dispositivos.astype('string').astype(object).where(dispositivos.notna(), None)
+        colunas.append('dispositivo_id')
+
+    # Ausentes (NaN, NaT, <NA>) viram None, gravado como NULL
+    saida = saida[colunas].astype(object)
+    saida = saida.where(saida.notna(), None)
+    return colunas, list(saida.itertuples(index=False, name=None))
+
+
+class CarregadorMassivo:
+    """
+    Carrega arquivos de leituras direto na tabela de irrigação.
+
+    Cada worker mantém sua própria conexão, fechada ao final de executar. O registro do bloco em
+    TABELA_CARGAS é confirmado no mesmo commit das linhas, então uma
+    retomada nunca duplica blocos confirmados.
+    """
+
+    def __init__(self, caminho, tamanho_bloco=20000, workers=4, carga_id=None):
+        self.caminho = caminho
+        self.tamanho_bloco = tamanho_bloco
+        self.workers = workers
+        self.carga_id = carga_id or identificar_carga(caminho)
+        self.blocos_concluidos = set()
+        self.linhas_inseridas = 0
+        self.linhas_com_erro = 0
+        self._lock = threading.Lock()
+        self._conexoes = threading.local()
+        self._abertas = []
+
+    def carregar_blocos_concluidos(self, conn):
+        # Lê da tabela de controle os blocos já confirmados desta carga
+        cur = conn.cursor()
+        cur.execute(f"SELECT bloco, tamanho_bloco FROM {TABELA_CARGAS} WHERE carga_id = :1", (self.carga_id,))
+        registros = cur.fetchall()
+        cur.close()
+        tamanhos = {tamanho for _, tamanho in registros}
+        if tamanhos and tamanhos != {self.tamanho_bloco}:
+            raise ValueError(
+                f"Carga {self.carga_id} iniciada com bloco de {min(tamanhos)} linhas; "
+                f"use o mesmo tamanho para retomar"
+            )
+        self.blocos_concluidos = {int(bloco) for bloco, _ in registros}
+        if self.blocos_concluidos:
+            print(f"Retomando carga {self.carga_id}: {len(self.blocos_concluidos)} blocos já concluídos")
+
+    def _conexao(self):
+        # Conexão do worker atual, aberta no primeiro bloco que ele insere
+        conn = getattr(self._conexoes, 'conn', None)
+        if conn is None:
+            conn = conectar_oracle()
+            if conn is None:
+                raise ConnectionError("Não foi possível conectar ao Oracle")
+            self._conexoes.conn = conn
+            with self._lock:
+                self._abertas.append(conn)
+        return conn
+
+    def _fechar_conexoes(self):
+        # Fecha as conexões dos workers; chamado depois que o executor terminou
+        with self._lock:
+            abertas, self._abertas = self._abertas, []
+        self._conexoes = threading.local()
+        for conn in abertas:
+            try:
+                conn.close()
+            except Exception as e:
+                print(f"Erro ao fechar conexão: {e}")
+
+    def inserir_bloco(self, indice, df):
+        # Insere um bloco inteiro com uma única chamada executemany e um commit
+        colunas, linhas = preparar_linhas(df)
+        conn = self._conexao()
+        cur = conn.cursor()
+
+        marcadores = ', '.join(f':{i + 1}' for i in range(len(colunas)))
+        try:
+            # Registro do bloco na mesma transação das linhas: se ele já foi
+            # confirmado, a chave primária rejeita e nada é inserido
+            cur.execute(
+                f"INSERT INTO {TABELA_CARGAS} (carga_id, bloco, tamanho_bloco, linhas) VALUES (:1, :2, :3, :4)",
+                (self.carga_id, indice, self.tamanho_bloco, len(linhas))
+            )
+            cur.executemany(
+                f"INSERT INTO {TABELA} ({', '.join(colunas)}) VALUES ({marcadores})",
+                linhas,
+                batcherrors=True
+            )
+            erros = cur.getbatcherrors()
+            conn.commit()
+        except oracledb.IntegrityError:
+            conn.rollback()
+            print(f"Bloco {indice} já confirmado anteriormente; ignorado")
+            return 0
+        except Exception:
+            # Descarta o bloco parcial para não ser confirmado junto com o próximo
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+        with self._lock:
+            self.linhas_inseridas += len(linhas) - len(erros)
+            self.linhas_com_erro += len(erros)
+            self.blocos_concluidos.add(indice)
+
+        for erro in erros[:3]:
+            print(f"Bloco {indice}, linha {erro.offset + 1}: {erro.message}")
+        return len(linhas)
+
+    def executar(self):
+        # Carrega todos os blocos pendentes usando os workers em paralelo
+        criar_tabela_se_nao_existir()
+        conn = conectar_oracle()
+        try:
+            criar_tabela_cargas(conn)
+            self.carregar_blocos_concluidos(conn)
+        finally:
+            conn.close()
+
+        inicio = time.time()
+        pendentes = set()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for indice, bloco in ler_blocos(self.caminho, self.tamanho_bloco):
+                    if indice in self.blocos_concluidos:
+                        continue
+
+                    # Limita blocos em memória a ~2 por worker
+                    while len(pendentes) >= self.workers * 2:
+                        concluido = next(as_completed(pendentes))
+                        pendentes.discard(concluido)
+                        self._verificar(concluido)
+
+                    pendentes.add(executor.submit(self.inserir_bloco, indice, bloco))
+
+                for futuro in as_completed(pendentes):
+                    self._verificar(futuro)
+        finally:
+            self._fechar_conexoes()
+
+        duracao = time.time() - inicio
+        taxa = self.linhas_inseridas / duracao if duracao > 0 else 0
+        print(f"✓ {self.linhas_inseridas:,} linhas inseridas em {duracao:.1f}s ({taxa:,.0f} linhas/s)")
+        if self.linhas_com_erro:
+            print(f"{self.linhas_com_erro:,} linhas rejeitadas pelo banco")
+
+        return self.linhas_inseridas
+
+    def _verificar(self, futuro):
+        try:
+            linhas = futuro.result()
+            print(f"Bloco concluído ({linhas} linhas) - total inserido: {self.linhas_inseridas:,}")
+        except Exception as e:
+            print(f"Erro ao inserir bloco: {e}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Carga em massa de leituras no Oracle')
+    parser.add_argument('arquivo', help='Arquivo .csv, .parquet ou .ndjson com as leituras')
+    parser.add_argument('--bloco', type=int, default=20000, help='Linhas por bloco/commit (padrão: 20000)')
+    parser.add_argument('--workers', type=int, default=4, help='Conexões paralelas (padrão: 4)')
+    parser.add_argument('--carga', help='Identificador da carga para retomar (padrão: derivado do caminho e tamanho do arquivo)')
+    args = parser.parse_args()
+
+    carregador = CarregadorMassivo(args.arquivo, args.bloco, args.workers, args.carga)
+    carregador.executar()
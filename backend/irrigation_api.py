@@ -1,74 +1,58 @@
 from flask import Flask, request, jsonify
-import oracledb
 import pandas as pd
 from datetime import datetime
 import json
+import gzip
+import os
 import time
+import zlib
+from prediction_service import obter_servico, obter_pool, obter_monitor
+from oracle_db import TABELA, conectar_oracle, criar_tabela_se_nao_existir
 
 app = Flask(__name__)
 
-# Configurações do banco
-ORACLE_CONFIG = {
-    'dsn': 'oracle.fiap.com.br:1521/orcl',
-    'user': '********',
-    'password': '******'
-}
+# Inicializa a tabela se não existir
+criar_tabela_se_nao_existir()
 
-TABELA = 'irrigacao_dados'
+# Tamanho mínimo de resposta (bytes) para compactar com gzip
+TAMANHO_MIN_GZIP = 1024
 
-def conectar_oracle():
-    """Conecta ao Oracle com retry"""
-    for tentativa in range(3):
-        try:
-            conn = oracledb.connect(
-                user=ORACLE_CONFIG['user'],
-                password=ORACLE_CONFIG['password'],
-                dsn=ORACLE_CONFIG['dsn']
-            )
-            return conn
-        except Exception as e:
-            if tentativa == 2:
-                raise e
-            time.sleep(1)
-    return None
+# Tamanho máximo de um corpo gzip depois de descompactado (evita "bombas" de compressão)
+TAMANHO_MAX_DESCOMPACTADO = int(os.environ.get('API_MAX_CORPO_MB', 64)) * 1024 * 1024
 
-def criar_tabela_se_nao_existir():
-    # verificação e criação da tabela de dados
-    try:
-        conn = conectar_oracle()
-        cur = conn.cursor()
-        
-        # Verifica se tabela existe
-        cur.execute("""
-            SELECT COUNT(*) FROM user_tables WHERE table_name = UPPER(:1)
-        """, (TABELA,))
-        
-        if cur.fetchone()[0] == 0:
-            # Cria a tabela
-            cur.execute(f"""
-                CREATE TABLE {TABELA} (
-                    id NUMBER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
-                    humidity NUMBER(5,2),
-                    temperature NUMBER(5,2),
-                    ph NUMBER(4,2),
-                    fosforo_presente NUMBER(1),
-                    potassio_presente NUMBER(1),
-                    bomba_status VARCHAR2(20),
-                    data_coleta TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            conn.commit()
-            print(f"Tabela {TABELA} criada com sucesso")
-        
-        cur.close()
-        conn.close()
-        return True
-    except Exception as e:
-        print(f"Erro ao verificar/criar tabela: {e}")
-        return False
+@app.before_request
+def descompactar_requisicao():
+    # Aceita corpos enviados com Content-Encoding: gzip (cliente compartilhado),
+    # descompactando no máximo TAMANHO_MAX_DESCOMPACTADO bytes
+    if request.headers.get('Content-Encoding', '').lower() == 'gzip':
+        descompactador = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            corpo = descompactador.decompress(request.get_data(), TAMANHO_MAX_DESCOMPACTADO)
+        except zlib.error:
+            return jsonify({'erro': 'Corpo gzip inválido'}), 400
+        if descompactador.unconsumed_tail:
+            return jsonify({'erro': f'Corpo descompactado maior que {TAMANHO_MAX_DESCOMPACTADO} bytes'}), 413
+        if not descompactador.eof:
+            return jsonify({'erro': 'Corpo gzip incompleto'}), 400
+        request._cached_data = corpo
 
-# Inicializa a tabela se não existir
-criar_tabela_se_nao_existir()
+@app.after_request
+def compactar_resposta(response):
+    # Compacta respostas grandes quando o cliente aceita gzip
+    if ('gzip' not in request.headers.get('Accept-Encoding', '').lower()
+            or response.direct_passthrough
+            or response.status_code < 200 or response.status_code >= 300
+            or 'Content-Encoding' in response.headers):
+        return response
+    
+    dados = response.get_data()
+    if len(dados) < TAMANHO_MIN_GZIP:
+        return response
+    
+    response.set_data(gzip.compress(dados, compresslevel=5))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -89,6 +73,11 @@ def health_check():
             'database': 'disconnected'
         }), 503
 
+def _dispositivo(registro):
+    # dispositivo_id é opcional (leituras sem dispositivo usam o modelo global)
+    valor = registro.get('dispositivo_id')
+    return None if valor is None else str(valor)
+
 @app.route('/dados', methods=['POST'])
 def inserir_dado():
     # Endpoint para inserir um único dado
@@ -105,15 +94,17 @@ def inserir_dado():
         cur = conn.cursor()
         
         cur.execute(f"""
-            INSERT INTO {TABELA} (humidity, temperature, ph, fosforo_presente, potassio_presente, bomba_status)
-            VALUES (:1, :2, :3, :4, :5, :6)
+            INSERT INTO {TABELA} (humidity, temperature, ph, fosforo_presente, potassio_presente, bomba_status,
+                                  dispositivo_id)
+            VALUES (:1, :2, :3, :4, :5, :6, :7)
         """, (
             float(data['humidity']),
             float(data['temperature']),
             float(data['ph']),
             int(data['fosforo_presente']),
             int(data['potassio_presente']),
-            str(data['bomba_status']).upper()
+            str(data['bomba_status']).upper(),
+            _dispositivo(data)
         ))
         
         conn.commit()
@@ -149,15 +140,17 @@ def inserir_multiplos_dados():
         for i, registro in enumerate(data):
             try:
                 cur.execute(f"""
-                    INSERT INTO {TABELA} (humidity, temperature, ph, fosforo_presente, potassio_presente, bomba_status)
-                    VALUES (:1, :2, :3, :4, :5, :6)
+                    INSERT INTO {TABELA} (humidity, temperature, ph, fosforo_presente, potassio_presente,
+                                          bomba_status, dispositivo_id)
+                    VALUES (:1, :2, :3, :4, :5, :6, :7)
                 """, (
                     float(registro['humidity']),
                     float(registro['temperature']),
                     float(registro['ph']),
                     int(registro['fosforo_presente']),
                     int(registro['potassio_presente']),
-                    str(registro['bomba_status']).upper()
+                    str(registro['bomba_status']).upper(),
+                    _dispositivo(registro)
                 ))
                 sucessos += 1
             except Exception as e:
@@ -187,6 +180,10 @@ def consultar_dados():
         offset = request.args.get('offset', 0, type=int)
         data_inicio = request.args.get('data_inicio')
         data_fim = request.args.get('data_fim')
+        # Sincronização incremental: só registros com id acima do último visto, em ordem de id
+        id_minimo = request.args.get('id_minimo', type=int)
+        ordem = request.args.get('ordem', 'desc').lower()
+        dispositivo_id = request.args.get('dispositivo_id')
         
         conn = conectar_oracle()
         cur = conn.cursor()
@@ -204,7 +201,15 @@ def consultar_dados():
             query += " AND data_coleta <= :data_fim"
             params.append(datetime.fromisoformat(data_fim.replace('Z', '+00:00')))
         
-        query += " ORDER BY data_coleta DESC"
+        if id_minimo is not None:
+            query += " AND id > :id_minimo"
+            params.append(id_minimo)
+        
+        if dispositivo_id:
+            query += " AND dispositivo_id = :dispositivo_id"
+            params.append(dispositivo_id)
+        
+        query += " ORDER BY id ASC" if ordem == 'asc' else " ORDER BY data_coleta DESC"
         query += f" OFFSET {offset} ROWS FETCH NEXT {limite} ROWS ONLY"
         
         cur.execute(query, params)
@@ -273,6 +278,135 @@ def obter_estatisticas():
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
+def _linha_predicao(registro):
+    # Monta o vetor de entrada do modelo a partir do JSON da requisição
+    agora = datetime.now()
+    return [
+        float(registro['humidity']),
+        float(registro['temperature']),
+        float(registro['ph']),
+        int(registro['fosforo_presente']),
+        int(registro['potassio_presente']),
+        int(registro.get('hora', agora.hour)),
+        int(registro.get('dia_semana', agora.weekday()))
+    ]
+
+def _resposta_predicao(lote, i, features=None):
+    resposta = {
+        'deve_irrigar': bool(lote['deve_irrigar'][i]),
+        'probabilidade_irrigar': float(lote['probabilidade_irrigar'][i]),
+        'confianca': float(lote['confianca'][i])
+    }
+    if lote.get('contribuicoes') is not None:
+        # Quanto cada feature somou ou tirou da probabilidade de irrigar
+        resposta['vies'] = float(lote['vies'][i])
+        resposta['contribuicoes'] = dict(zip(features, lote['contribuicoes'][i].tolist()))
+    return resposta
+
+def _prever_dispositivos(registros, explicar=False):
+    # Leituras de dispositivos com modelo próprio, agrupadas em um lote por
+    # dispositivo; as demais ficam None e seguem para o modelo global
+    pool = obter_pool()
+    grupos = {}
+    for i, registro in enumerate(registros):
+        dispositivo = _dispositivo(registro)
+        if dispositivo is not None:
+            grupos.setdefault(dispositivo, []).append(i)
+    
+    respostas = [None] * len(registros)
+    for dispositivo, indices in grupos.items():
+        preditor = pool.obter(dispositivo)
+        if preditor is None:
+            continue
+        lote, erro = preditor.prever_irrigacao_lote([_linha_predicao(registros[i]) for i in indices],
+                                                    explicar=explicar)
+        if erro:
+            raise RuntimeError(erro)
+        for j, i in enumerate(indices):
+            respostas[i] = dict(_resposta_predicao(lote, j, preditor.features), modelo=dispositivo)
+    return respostas
+
+def _registrar_deriva(registros):
+    # Leituras de /prever alimentam o monitor de deriva; falhas não afetam a predição
+    try:
+        monitor = obter_monitor()
+        # Só as contagens a cada requisição; o relatório (e o alerta) a cada N leituras
+        if monitor is not None and monitor.atualizar([_linha_predicao(registro) for registro in registros]):
+            monitor.verificar()
+    except Exception as e:
+        print(f"Erro no monitor de deriva: {e}")
+
+@app.route('/prever', methods=['POST'])
+def prever():
+    # Predição com o modelo residente; requisições simultâneas são agrupadas em lote.
+    # Com dispositivo_id, usa o modelo do dispositivo quando ele tem um próprio;
+    # com ?explicar=1, inclui a contribuição de cada feature para a decisão
+    try:
+        data = request.get_json()
+        explicar = request.args.get('explicar', '0').lower() in ('1', 'true', 'sim')
+        servico = obter_servico()
+        if servico is None:
+            return jsonify({'erro': 'Modelo não disponível'}), 503
+        
+        campos_obrigatorios = ['humidity', 'temperature', 'ph', 'fosforo_presente', 'potassio_presente']
+        registros = data if isinstance(data, list) else [data]
+        for registro in registros:
+            for campo in campos_obrigatorios:
+                if campo not in registro:
+                    return jsonify({'erro': f'Campo {campo} é obrigatório'}), 400
+        
+        respostas = _prever_dispositivos(registros, explicar)
+        _registrar_deriva(registros)
+        globais = [i for i, resposta in enumerate(respostas) if resposta is None]
+        
+        if isinstance(data, list) or explicar:
+            # Uma lista já é um lote: vai direto para o modelo
+            if globais:
+                sistema = servico.sistema
+                lote, erro = sistema.prever_irrigacao_lote([_linha_predicao(registros[i]) for i in globais],
+                                                           explicar=explicar)
+                if erro:
+                    return jsonify({'erro': erro}), 503
+                for j, i in enumerate(globais):
+                    respostas[i] = _resposta_predicao(lote, j, sistema.features)
+                    if _dispositivo(registros[i]) is not None:
+                        respostas[i]['modelo'] = 'global'
+            return jsonify(respostas if isinstance(data, list) else respostas[0]), 200
+        
+        if respostas[0] is not None:
+            return jsonify(respostas[0]), 200
+        
+        deve_irrigar, probabilidade, confianca = servico.prever(_linha_predicao(data))
+        resposta = {
+            'deve_irrigar': deve_irrigar,
+            'probabilidade_irrigar': probabilidade,
+            'confianca': confianca
+        }
+        if _dispositivo(data) is not None:
+            resposta['modelo'] = 'global'
+        return jsonify(resposta), 200
+        
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'erro': f'Entrada inválida: {e}'}), 400
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 500
+
+@app.route('/prever/metricas', methods=['GET'])
+def metricas_predicao():
+    # Tamanho dos lotes, tempo em fila e tempo de inferência do serviço de predição
+    servico = obter_servico()
+    if servico is None:
+        return jsonify({'erro': 'Modelo não disponível'}), 503
+    return jsonify(dict(servico.metricas(), dispositivos=obter_pool().metricas())), 200
+
+@app.route('/prever/deriva', methods=['GET'])
+def deriva_predicao():
+    # PSI/KS de cada feature das leituras recebidas contra o perfil de treino do modelo
+    monitor = obter_monitor()
+    if monitor is None:
+        return jsonify({'erro': 'Modelo sem perfil de treino (treine novamente para monitorar a deriva)'}), 503
+    return jsonify(dict(monitor.verificar(), versao_modelo=obter_servico().sistema.versao_modelo)), 200
+
 if __name__ == '__main__':
     print("Iniciando API de Irrigação...")
     print("Endpoints disponíveis:")
@@ -281,5 +415,8 @@ if __name__ == '__main__':
     print("- POST /dados/batch - Inserir múltiplos dados")
     print("- GET /dados/consulta - Consultar dados")
     print("- GET /dados/estatisticas - Estatísticas dos dados")
+    print("- POST /prever - Predição de irrigação (modelo residente, micro-batching)")
+    print("- GET /prever/metricas - Métricas do serviço de predição")
+    print("- GET /prever/deriva - Deriva das leituras em relação ao treino")
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""
+Conexão com o Oracle e tabela de leituras, compartilhadas pela API e pela
+carga em massa (sem importar o Flask).
+"""
+import time
+
+import oracledb
+
+# Configurações do banco
+ORACLE_CONFIG = {
+    'dsn': 'oracle.fiap.com.br:1521/orcl',
+    'user': '********',
+    'password': '******'
+}
+
+TABELA = 'irrigacao_dados'
+
+def conectar_oracle():
+    """Conecta ao Oracle com retry"""
+    for tentativa in range(3):
+        try:
+            conn = oracledb.connect(
+                user=ORACLE_CONFIG['user'],
+                password=ORACLE_CONFIG['password'],
+                dsn=ORACLE_CONFIG['dsn']
+            )
+            return conn
+        except Exception as e:
+            if tentativa == 2:
+                raise e
+            time.sleep(1)
+    return None
+
+def criar_tabela_se_nao_existir():
+    # verificação e criação da tabela de dados
+    try:
+        conn = conectar_oracle()
+        cur = conn.cursor()
+        
+        # Verifica se tabela existe
+        cur.execute("""
+            SELECT COUNT(*) FROM user_tables WHERE table_name = UPPER(:1)
+        """, (TABELA,))
+        
+        if cur.fetchone()[0] == 0:
+            # Cria a tabela
+            cur.execute(f"""
+                CREATE TABLE {TABELA} (
+                    id NUMBER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                    humidity NUMBER(5,2),
+                    temperature NUMBER(5,2),
+                    ph NUMBER(4,2),
+                    fosforo_presente NUMBER(1),
+                    potassio_presente NUMBER(1),
+                    bomba_status VARCHAR2(20),
+                    data_coleta TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    dispositivo_id VARCHAR2(50)
+                )
+            """)
+            conn.commit()
+            print(f"Tabela {TABELA} criada com sucesso")
+        else:
+            # Tabelas criadas antes da coluna de dispositivo/campo
+            cur.execute("""
+                SELECT COUNT(*) FROM user_tab_columns
+                WHERE table_name = UPPER(:1) AND column_name = 'DISPOSITIVO_ID'
+            """, (TABELA,))
+            if cur.fetchone()[0] == 0:
+                cur.execute(f"ALTER TABLE {TABELA} ADD (dispositivo_id VARCHAR2(50))")
+                conn.commit()
+                print(f"Coluna dispositivo_id adicionada à tabela {TABELA}")
+        
+        cur.close()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"Erro ao verificar/criar tabela: {e}")
+        return False
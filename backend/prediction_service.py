@@ -0,0 +1,311 @@
+"""
+Serviço de predição residente para a API.
+
+O modelo é carregado uma única vez e fica em memória. Requisições que
+chegam quase juntas são agrupadas (micro-batching) e avaliadas com uma
+única chamada vetorizada a prever_irrigacao_lote.
+
+Uma thread acompanha o registro de versões: quando outra versão é
+promovida (ou há rollback), o novo modelo é carregado ao lado do atual e
+trocado entre dois lotes, sem reiniciar o servidor nem perder requisições.
+
+Com PREVER_CACHE_ITENS > 0, as decisões ficam em um cache de entradas
+quantizadas (prediction_cache.py) compartilhado entre as versões: leituras
+repetidas não chegam ao modelo e o cache é limpo quando a versão muda.
+
+Leituras com dispositivo_id usam o modelo próprio do dispositivo, quando
+existe (device_models.py); os modelos por dispositivo ficam em um pool LRU
+limitado a PREVER_POOL_MB e são revalidados pela mesma thread de recarga.
+
+As leituras recebidas alimentam um monitor de deriva (drift_monitor.py)
+contra o perfil de treino do modelo residente; quando a distribuição se
+afasta da de treino, o retreino é recomendado no log e em /prever/deriva.
+O relatório é calculado na consulta e a cada DERIVA_VERIFICAR_A_CADA
+leituras, fora do caminho de cada predição. As contagens ficam em
+<registro>/deriva/api-<versão>.json: são gravadas quando o modelo é
+recarregado e no encerramento, e retomadas ao carregar a mesma versão.
+"""
+import atexit
+import os
+import sys
+import threading
+import time
+import queue
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+DIRETORIO_ML = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ml_model')
+sys.path.append(DIRETORIO_ML)
+
+CAMINHO_MODELO = os.environ.get('MODELO_IRRIGACAO', os.path.join(DIRETORIO_ML, 'modelo_irrigacao.pkl'))
+DIRETORIO_REGISTRO = os.environ.get('REGISTRO_MODELOS', os.path.join(DIRETORIO_ML, 'modelos'))
+
+
+class MicroBatcherPredicao:
+    """
+    Agrupa predições concorrentes em lotes.
+
+    A primeira requisição da fila abre uma janela de `janela_ms`; tudo que
+    chegar até o fim da janela (ou até completar `max_lote`) é avaliado junto.
+
+    Args:
+        funcao_lote (callable): Recebe matriz (N, 7) e devolve o dict de
+            prever_irrigacao_lote
+        janela_ms (float): Tempo máximo de espera para formar um lote
+        max_lote (int): Tamanho máximo do lote
+    """
+
+    def __init__(self, funcao_lote, janela_ms=2.0, max_lote=64, amostras_metricas=10000):
+        self.funcao_lote = funcao_lote
+        self.janela = janela_ms / 1000
+        self.max_lote = max_lote
+        self.fila = queue.Queue()
+        # Sistema que originou funcao_lote (trocado na recarga do modelo)
+        self.sistema = None
+        self.recargas = 0
+
+        self._lock = threading.Lock()
+        self.total_requisicoes = 0
+        self.total_lotes = 0
+        self.tamanhos_lote = deque(maxlen=amostras_metricas)
+        self.tempos_fila = deque(maxlen=amostras_metricas)
+        self.tempos_inferencia = deque(maxlen=amostras_metricas)
+
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+        self._thread.start()
+
+    def prever(self, linha, timeout=5.0):
+        """
+        Enfileira uma leitura (vetor de 7 valores) e espera o resultado.
+
+        Returns:
+            tuple: (deve_irrigar, probabilidade_irrigar, confianca)
+        """
+        futuro = Future()
+        self.fila.put((linha, time.perf_counter(), futuro))
+        return futuro.result(timeout=timeout)
+
+    def _coletar_lote(self):
+        # Bloqueia até a primeira requisição e junta as que chegarem na janela
+        itens = [self.fila.get()]
+        limite = time.perf_counter() + self.janela
+        while len(itens) < self.max_lote:
+            restante = limite - time.perf_counter()
+            if restante <= 0:
+                break
+            try:
+                itens.append(self.fila.get(timeout=restante))
+            except queue.Empty:
+                break
+        return itens
+
+    def _executar(self):
+        while True:
+            itens = self._coletar_lote()
+            inicio = time.perf_counter()
+            try:
+                lote, erro = self.funcao_lote(np.array([item[0] for item in itens], dtype=np.float64))
+                if erro:
+                    raise RuntimeError(erro)
+            except Exception as e:
+                for _, _, futuro in itens:
+                    futuro.set_exception(e)
+                continue
+            fim = time.perf_counter()
+
+            for i, (_, chegada, futuro) in enumerate(itens):
+                futuro.set_result((
+                    bool(lote['deve_irrigar'][i]),
+                    float(lote['probabilidade_irrigar'][i]),
+                    float(lote['confianca'][i])
+                ))
+
+            with self._lock:
+                self.total_requisicoes += len(itens)
+                self.total_lotes += 1
+                self.tamanhos_lote.append(len(itens))
+                self.tempos_fila.extend(inicio - chegada for _, chegada, _ in itens)
+                self.tempos_inferencia.append(fim - inicio)
+
+    def metricas(self):
+        # Estatísticas de lote, fila e inferência (tempos em ms)
+        with self._lock:
+            tamanhos = np.array(self.tamanhos_lote)
+            fila = np.array(self.tempos_fila) * 1000
+            inferencia = np.array(self.tempos_inferencia) * 1000
+            total_requisicoes, total_lotes = self.total_requisicoes, self.total_lotes
+        cache = self.sistema.cache_predicoes if self.sistema else None
+
+        def percentis(valores):
+            if len(valores) == 0:
+                return {}
+            return {nome: round(float(np.percentile(valores, p)), 3)
+                    for nome, p in [('p50', 50), ('p90', 90), ('p99', 99)]}
+
+        return {
+            'total_requisicoes': total_requisicoes,
+            'total_lotes': total_lotes,
+            'janela_ms': self.janela * 1000,
+            'max_lote': self.max_lote,
+            'fila_atual': self.fila.qsize(),
+            'tamanho_lote_medio': round(float(tamanhos.mean()), 2) if len(tamanhos) else 0,
+            'tamanho_lote': percentis(tamanhos),
+            'tempo_fila_ms': percentis(fila),
+            'tempo_inferencia_ms': percentis(inferencia),
+            'versao_modelo': self.sistema.versao_modelo if self.sistema else None,
+            'recargas_modelo': self.recargas,
+            'cache': cache.metricas() if cache is not None else None
+        }
+
+
+_servico = None
+_pool = None
+_monitor = None
+_caminho_monitor = None
+_lock_servico = threading.Lock()
+
+
+def _carregar_sistema(versao=None, cache=None):
+    from ml_irrigation_system import SistemaIrrigacaoML
+    sistema = SistemaIrrigacaoML()
+    sistema.caminho_modelo = CAMINHO_MODELO
+    sistema.diretorio_registro = DIRETORIO_REGISTRO
+    if not sistema.carregar_modelo(versao):
+        return None
+    if cache is not None:
+        sistema.cache_predicoes = cache
+    elif int(os.environ.get('PREVER_CACHE_ITENS', 0)) > 0:
+        sistema.ativar_cache(max_itens=int(os.environ['PREVER_CACHE_ITENS']),
+                             ttl_s=float(os.environ.get('PREVER_CACHE_TTL_S', 300)))
+    return sistema
+
+
+def _acompanhar_registro(servico, intervalo):
+    # Recarrega o modelo quando a versão promovida no registro muda
+    from model_registry import RegistroModelos
+    registro = RegistroModelos(DIRETORIO_REGISTRO)
+    while True:
+        time.sleep(intervalo)
+        if _pool is not None:
+            _pool.verificar_versoes()
+        versao = registro.versao_atual()
+        if versao is None or versao == servico.sistema.versao_modelo:
+            continue
+        sistema = _carregar_sistema(versao, servico.sistema.cache_predicoes)
+        if sistema is None:
+            continue
+        # O worker lê funcao_lote a cada lote: o lote em andamento termina
+        # com o modelo antigo e o próximo já usa o novo
+        servico.funcao_lote = sistema.prever_irrigacao_lote
+        servico.sistema = sistema
+        servico.recargas += 1
+        print(f"Modelo recarregado: versão {versao}")
+        # Salva as contagens do monitor anterior e passa a monitorar a versão nova
+        obter_monitor()
+
+
+def obter_servico():
+    """
+    Retorna o micro-batcher, carregando o modelo na primeira chamada.
+
+    Returns:
+        MicroBatcherPredicao ou None se o modelo não puder ser carregado
+    """
+    global _servico
+    if _servico is None:
+        with _lock_servico:
+            if _servico is None:
+                sistema = _carregar_sistema()
+                if sistema is None:
+                    return None
+                servico = MicroBatcherPredicao(
+                    sistema.prever_irrigacao_lote,
+                    janela_ms=float(os.environ.get('PREVER_JANELA_MS', 2.0)),
+                    max_lote=int(os.environ.get('PREVER_MAX_LOTE', 64))
+                )
+                servico.sistema = sistema
+
+                intervalo = float(os.environ.get('PREVER_RECARGA_S', 5.0))
+                if intervalo > 0:
+                    threading.Thread(target=_acompanhar_registro, args=(servico, intervalo),
+                                     daemon=True).start()
+                _servico = servico
+    return _servico
+
+
+def obter_pool():
+    """
+    Retorna o pool de modelos por dispositivo (criado na primeira chamada).
+
+    Returns:
+        PoolModelosDispositivo
+    """
+    global _pool
+    if _pool is None:
+        with _lock_servico:
+            if _pool is None:
+                from device_models import PoolModelosDispositivo
+                _pool = PoolModelosDispositivo(
+                    DIRETORIO_REGISTRO,
+                    max_memoria_mb=float(os.environ.get('PREVER_POOL_MB', 256)),
+                    caminho_modelo=CAMINHO_MODELO
+                )
+    return _pool
+
+
+def _alertar_deriva(relatorio):
+    print(f"ATENÇÃO: deriva em {', '.join(relatorio['features_em_deriva'])} "
+          f"({relatorio['leituras']} leituras novas); retreino recomendado")
+
+
+def _arquivo_monitor(versao):
+    return os.path.join(DIRETORIO_REGISTRO, 'deriva', f"api-{versao or 'modelo'}.json")
+
+
+def salvar_monitor():
+    """
+    Grava as contagens do monitor de deriva atual (chamado na recarga e no encerramento).
+    """
+    monitor, caminho = _monitor, _caminho_monitor
+    if monitor is None or caminho is None:
+        return
+    try:
+        monitor.salvar(caminho)
+    except OSError as e:
+        print(f"Erro ao salvar o monitor de deriva: {e}")
+
+
+def obter_monitor():
+    """
+    Retorna o monitor de deriva do modelo residente (recriado quando o
+    modelo é recarregado, retomando as contagens salvas da versão).
+
+    Returns:
+        MonitorDeriva ou None se o modelo não tiver perfil de treino
+    """
+    global _monitor, _caminho_monitor
+    servico = obter_servico()
+    if servico is None or not servico.sistema.perfil_treino:
+        return None
+    sistema = servico.sistema
+    perfil = sistema.perfil_treino
+    if _monitor is None or _monitor.perfil is not perfil:
+        with _lock_servico:
+            if _monitor is None or _monitor.perfil is not perfil:
+                from drift_monitor import MonitorDeriva
+                # Guarda as contagens do modelo anterior antes da troca
+                salvar_monitor()
+                caminho = _arquivo_monitor(sistema.versao_modelo)
+                _monitor = MonitorDeriva.restaurar(
+                    perfil, caminho,
+                    meia_vida=float(os.environ.get('DERIVA_MEIA_VIDA', 5000)),
+                    verificar_a_cada=int(os.environ.get('DERIVA_VERIFICAR_A_CADA', 1000)),
+                    ao_detectar=_alertar_deriva
+                )
+                _caminho_monitor = caminho
+    return _monitor
+
+
+atexit.register(salvar_monitor)
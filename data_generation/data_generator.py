@@ -1,49 +1,69 @@
-import requests
+import os
+import sys
 import random
 import time
 import json
+import gzip
+import queue
 from datetime import datetime, timedelta
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+from api_client import ClienteAPIIrrigacao
+
 class GeradorDadosIrrigacao:
     def __init__(self, api_url='http://localhost:5000'):
         self.api_url = api_url
+        self.cliente = ClienteAPIIrrigacao(api_url)
         self.rodando = False
         self.contador_registros = 0
         
-    def gerar_dados_realisticos(self):
+    @staticmethod
+    def ajuste_umidade_solo(dispositivo_id):
+        # Cada campo tem um solo que retém mais ou menos água (-12 a +12 pontos de umidade)
+        return ((int(dispositivo_id) * 7) % 5 - 2) * 6
+    
+    def gerar_dados_realisticos(self, rng=None, hora_atual=None, dispositivo_id=None):
         # gerar dados de irrigação realista p treinamento de ML
-        hora_atual = datetime.now().hour
+        # rng/hora_atual permitem gerar sequências reprodutíveis (gravação com semente)
+        # dispositivo_id: aplica o perfil de solo do campo e inclui o id na leitura
+        rng = rng or random
+        if hora_atual is None:
+            hora_atual = datetime.now().hour
         
         # Padrões baseados na hora do dia
         if 6 <= hora_atual <= 10:  # Manhã
-            base_humidity = random.uniform(60, 85)
-            base_temp = random.uniform(18, 25)
+            base_humidity = rng.uniform(60, 85)
+            base_temp = rng.uniform(18, 25)
             chance_irrigacao = 0.7
         elif 11 <= hora_atual <= 16:  # Tarde
-            base_humidity = random.uniform(35, 65)
-            base_temp = random.uniform(25, 35)
+            base_humidity = rng.uniform(35, 65)
+            base_temp = rng.uniform(25, 35)
             chance_irrigacao = 0.8
         elif 17 <= hora_atual <= 21:  # Noite
-            base_humidity = random.uniform(50, 75)
-            base_temp = random.uniform(20, 28)
+            base_humidity = rng.uniform(50, 75)
+            base_temp = rng.uniform(20, 28)
             chance_irrigacao = 0.6
         else:  # Madrugada
-            base_humidity = random.uniform(70, 90)
-            base_temp = random.uniform(15, 22)
+            base_humidity = rng.uniform(70, 90)
+            base_temp = rng.uniform(15, 22)
             chance_irrigacao = 0.3
         
+        if dispositivo_id is not None:
+            base_humidity += self.ajuste_umidade_solo(dispositivo_id)
+        
         # Adiciona variação natural
-        humidity = max(10, min(100, base_humidity + random.uniform(-15, 15)))
-        temperature = max(5, min(45, base_temp + random.uniform(-5, 5)))
+        humidity = max(10, min(100, base_humidity + rng.uniform(-15, 15)))
+        temperature = max(5, min(45, base_temp + rng.uniform(-5, 5)))
         
         # pH varia entre 5.5 e 8.0
-        ph = round(random.uniform(5.5, 8.0), 2)
+        ph = round(rng.uniform(5.5, 8.0), 2)
         
         # Nutrientes aleatórios
-        fosforo = random.choice([0, 1])
-        potassio = random.choice([0, 1])
+        fosforo = rng.choice([0, 1])
+        potassio = rng.choice([0, 1])
         
         # Lógica de irrigação baseada em condições
         deve_irrigar = False
@@ -55,16 +75,16 @@ class GeradorDadosIrrigacao:
             deve_irrigar = True
         elif (fosforo == 0 or potassio == 0) and humidity < 60:  # Falta nutrientes
             deve_irrigar = True
-        elif random.random() < (chance_irrigacao * 0.3):  # Chance aleatória
+        elif rng.random() < (chance_irrigacao * 0.3):  # Chance aleatória
             deve_irrigar = True
         
         # Pequena chance de não irrigar mesmo em condições ideais
-        if random.random() < 0.1:
+        if rng.random() < 0.1:
             deve_irrigar = False
         
         bomba_status = "LIGADA" if deve_irrigar else "DESLIGADA"
         
-        return {
+        dados = {
             'humidity': round(humidity, 2),
             'temperature': round(temperature, 2),
             'ph': ph,
@@ -72,36 +92,50 @@ class GeradorDadosIrrigacao:
             'potassio_presente': potassio,
             'bomba_status': bomba_status
         }
+        if dispositivo_id is not None:
+            dados['dispositivo_id'] = dispositivo_id
+        return dados
+    
+    def _dispositivo_aleatorio(self, num_dispositivos):
+        return random.randint(1, num_dispositivos) if num_dispositivos else None
     
-    def inserir_dados_batch_inicial(self, quantidade=200):
+    def inserir_dados_batch_inicial(self, quantidade=200, tamanho_lote=50, max_em_voo=4, num_dispositivos=None):
         # Insere um lote inicial de dados fictícios
+        # num_dispositivos: distribui as leituras entre campos com solos diferentes
         print(f"Gerando {quantidade} registros históricos...")
         
-        dados_batch = []
-        for i in range(quantidade):
-            # Simula dados de diferentes dias/horários
-            dados = self.gerar_dados_realisticos()
-            dados_batch.append(dados)
-            
-            if len(dados_batch) >= 50:  # Insere em lotes de 50
-                self.enviar_batch(dados_batch)
-                dados_batch = []
-                print(f"Inseridos {i+1}/{quantidade} registros...")
+        # Simula dados de diferentes dias/horários
+        dados_batch = [self.gerar_dados_realisticos(dispositivo_id=self._dispositivo_aleatorio(num_dispositivos))
+                       for _ in range(quantidade)]
         
-        # Insere registros restantes
-        if dados_batch:
-            self.enviar_batch(dados_batch)
+        # Envia vários lotes em paralelo pela mesma pool de conexões
+        totais = self.cliente.enviar_lotes(dados_batch, tamanho_lote=tamanho_lote, max_em_voo=max_em_voo)
+        self.contador_registros += totais['sucessos']
+        
+        if totais['lotes_falhos']:
+            print(f"{totais['lotes_falhos']} lotes falharam")
+        print(f"✓ {totais['sucessos']} registros históricos inseridos!")
+    
+    def exportar_historico(self, quantidade, caminho, dias=30, num_dispositivos=None):
+        """
+        Gera leituras históricas num arquivo NDJSON para carga em massa.
         
-        print(f"✓ {quantidade} registros históricos inseridos!")
+        As datas de coleta são espalhadas nos últimos `dias` dias. O arquivo
+        é consumido por backend/bulk_loader.py, sem passar pela API. Com
+        `num_dispositivos`, cada leitura vem de um campo com perfil de solo próprio.
+        """
+        agora = datetime.now()
+        with open(caminho, 'w') as f:
+            for _ in range(quantidade):
+                dados = self.gerar_dados_realisticos(dispositivo_id=self._dispositivo_aleatorio(num_dispositivos))
+                dados['data_coleta'] = (agora - timedelta(seconds=random.uniform(0, dias * 86400))).isoformat()
+                f.write(json.dumps(dados) + '\n')
+        print(f"✓ {quantidade} registros exportados para {caminho}")
     
     def enviar_batch(self, dados):
         # Envia um lote de dados para a API
         try:
-            response = requests.post(
-                f'{self.api_url}/dados/batch',
-                json=dados,
-                headers={'Content-Type': 'application/json'}
-            )
+            response = self.cliente.post('/dados/batch', json=dados)
             
             if response.status_code == 201:
                 resultado = response.json()
@@ -124,11 +158,7 @@ class GeradorDadosIrrigacao:
             try:
                 dados = self.gerar_dados_realisticos()
                 
-                response = requests.post(
-                    f'{self.api_url}/dados',
-                    json=dados,
-                    headers={'Content-Type': 'application/json'}
-                )
+                response = self.cliente.post('/dados', json=dados)
                 
                 if response.status_code == 201:
                     self.contador_registros += 1
@@ -153,15 +183,264 @@ class GeradorDadosIrrigacao:
     def parar_insercao(self):
         self.rodando = False
     
+    def simular_frota_concorrente(self, num_dispositivos=100, taxa_alvo=50.0, duracao=60,
+                                  max_concorrencia=64, timeout=10):
+        """
+        Simula uma frota de estações enviando leituras ao mesmo tempo.
+        
+        O agendamento é em malha aberta: os instantes de envio são fixados
+        antes do teste (chegadas de Poisson na taxa agregada alvo) e a
+        latência é medida a partir do instante planejado, não do envio real.
+        Assim, se a API travar, o atraso acumulado aparece nos percentis em
+        vez de ser escondido (coordinated omission).
+        
+        Args:
+            num_dispositivos (int): Número de estações simuladas
+            taxa_alvo (float): Requisições por segundo somando todos os dispositivos
+            duracao (float): Duração do teste em segundos
+            max_concorrencia (int): Máximo de requisições simultâneas em voo
+            timeout (float): Timeout de cada requisição em segundos
+        
+        Returns:
+            dict: Relatório com vazão, taxa de erro e percentis de latência
+        """
+        total = int(taxa_alvo * duracao)
+        if total <= 0:
+            print("Taxa ou duração inválida")
+            return None
+        
+        # Instantes planejados (chegadas de Poisson) e dispositivo de cada envio
+        rng = np.random.default_rng()
+        instantes = np.cumsum(rng.exponential(1.0 / taxa_alvo, size=total))
+        dispositivos = rng.integers(1, num_dispositivos + 1, size=total)
+        
+        latencias = np.full(total, np.nan)
+        sucessos = np.zeros(total, dtype=bool)
+        
+        def enviar(indice, instante_planejado):
+            dados = self.gerar_dados_realisticos()
+            dados['dispositivo_id'] = int(dispositivos[indice])
+            try:
+                # Sem retry: cada falha deve contar na taxa de erro
+                response = self.cliente.post('/dados', json=dados, timeout=timeout, tentativas=1)
+                sucessos[indice] = response.status_code == 201
+            except Exception:
+                sucessos[indice] = False
+            latencias[indice] = time.perf_counter() - instante_planejado
+        
+        print(f"Simulando {num_dispositivos} dispositivos a {taxa_alvo:.1f} req/s "
+              f"por {duracao}s ({total} requisições)...")
+        self.rodando = True
+        inicio = time.perf_counter()
+        
+        with ThreadPoolExecutor(max_workers=max_concorrencia) as executor:
+            for i in range(total):
+                try:
+                    if not self.rodando:
+                        raise KeyboardInterrupt
+                    instante_planejado = inicio + instantes[i]
+                    espera = instante_planejado - time.perf_counter()
+                    if espera > 0:
+                        time.sleep(espera)
+                    executor.submit(enviar, i, instante_planejado)
+                except KeyboardInterrupt:
+                    print("\nInterrompendo teste de carga...")
+                    total = i
+                    break
+        
+        tempo_total = time.perf_counter() - inicio
+        self.rodando = False
+        
+        latencias = latencias[:total]
+        sucessos = sucessos[:total]
+        self.contador_registros += int(sucessos.sum())
+        
+        latencias_ms = latencias * 1000
+        relatorio = {
+            'requisicoes': total,
+            'duracao_s': round(tempo_total, 3),
+            'taxa_alvo': taxa_alvo,
+            'vazao_obtida': round(int(sucessos.sum()) / tempo_total, 2) if tempo_total > 0 else 0.0,
+            'taxa_erro': round(float(1 - sucessos.mean()), 4) if total else 0.0,
+            'latencia_ms': {
+                nome: round(float(np.percentile(latencias_ms, p)), 2)
+                for nome, p in [('p50', 50), ('p90', 90), ('p99', 99), ('p999', 99.9)]
+            } if total else {},
+        }
+        if total:
+            relatorio['latencia_ms']['max'] = round(float(latencias_ms.max()), 2)
+        
+        print("\n=== RELATÓRIO DE CARGA ===")
+        print(f"Requisições: {relatorio['requisicoes']} em {relatorio['duracao_s']:.1f}s")
+        print(f"Vazão obtida: {relatorio['vazao_obtida']:.1f} req/s (alvo: {taxa_alvo:.1f})")
+        print(f"Taxa de erro: {relatorio['taxa_erro']:.2%}")
+        for nome, valor in relatorio['latencia_ms'].items():
+            print(f"Latência {nome}: {valor:.1f} ms")
+        
+        return relatorio
+    
+    def gravar_trafego(self, caminho, quantidade=1000, taxa=10.0, num_dispositivos=10,
+                       semente=42, enviar=True, inicio_gravacao=None):
+        """
+        Grava um fluxo de leituras com os intervalos entre chegadas.
+        
+        Cada leitura tem o horário em que foi gravada (início da gravação +
+        tempo decorrido), e os padrões de hora do dia vêm desse horário. A
+        sequência é determinística para a mesma semente e o mesmo
+        inicio_gravacao (padrão: agora). Com enviar=True as leituras também são
+        enviadas à API no ritmo gravado e o status/corpo de cada resposta fica
+        registrado, servindo de referência para a reprodução.
+        
+        O arquivo é NDJSON compactado com gzip: uma linha de cabeçalho seguida
+        de um registro por leitura com intervalo (ms), horário, hora, dia da
+        semana, dispositivo, leitura e resposta esperada.
+        """
+        rng = random.Random(semente)
+        inicio_gravacao = inicio_gravacao or datetime.now()
+        inicio = time.perf_counter()
+        instante = 0.0
+        
+        print(f"Gravando {quantidade} leituras em {caminho} (semente={semente})...")
+        with gzip.open(caminho, 'wt', encoding='utf-8') as f:
+            f.write(json.dumps({
+                'versao': 1,
+                'semente': semente,
+                'quantidade': quantidade,
+                'taxa': taxa,
+                'num_dispositivos': num_dispositivos,
+                'gravado_em': inicio_gravacao.isoformat()
+            }) + '\n')
+            
+            for i in range(quantidade):
+                intervalo = rng.expovariate(taxa)
+                instante += intervalo
+                dispositivo = rng.randint(1, num_dispositivos)
+                momento = inicio_gravacao + timedelta(seconds=instante)
+                dados = self.gerar_dados_realisticos(rng, hora_atual=momento.hour)
+                dados['dispositivo_id'] = dispositivo
+                
+                registro = {'t': round(intervalo * 1000, 3), 'em': momento.isoformat(timespec='milliseconds'),
+                            'h': momento.hour, 'w': momento.weekday(), 'd': dispositivo, 'r': dados}
+                
+                if enviar:
+                    espera = inicio + instante - time.perf_counter()
+                    if espera > 0:
+                        time.sleep(espera)
+                    registro['s'], registro['c'] = self._enviar_leitura(dados)
+                
+                f.write(json.dumps(registro, separators=(',', ':')) + '\n')
+        
+        print(f"✓ Gravação concluída: {quantidade} leituras")
+    
+    def _enviar_leitura(self, dados, timeout=10):
+        # Envia uma leitura e devolve (status, corpo sem campos voláteis)
+        try:
+            response = self.cliente.post('/dados', json=dados, timeout=timeout, tentativas=1)
+            try:
+                corpo = response.json()
+            except ValueError:
+                corpo = response.text
+            if isinstance(corpo, dict):
+                corpo.pop('timestamp', None)
+            return response.status_code, corpo
+        except Exception as e:
+            return None, str(e)
+    
+    def reproduzir_trafego(self, caminho, velocidade=1.0, num_workers=16):
+        """
+        Reproduz contra a API um fluxo gravado por gravar_trafego.
+        
+        Args:
+            caminho (str): Arquivo .ndjson.gz gravado
+            velocidade (float): 1.0 = tempo real, N = N vezes mais rápido,
+                0 = o mais rápido possível
+            num_workers (int): Threads de envio. Cada dispositivo é sempre
+                atendido pelo mesmo worker, preservando a ordem por dispositivo.
+        
+        Returns:
+            dict: Totais, latências e lista de divergências de resposta. Com
+                velocidade > 0 a latência conta a partir do horário planejado
+                de cada leitura (inclui a espera na fila); com 0, só a requisição.
+        """
+        with gzip.open(caminho, 'rt', encoding='utf-8') as f:
+            cabecalho = json.loads(f.readline())
+            registros = [json.loads(linha) for linha in f]
+        
+        print(f"Reproduzindo {len(registros)} leituras (semente={cabecalho.get('semente')}, "
+              f"velocidade={'máxima' if not velocidade else f'{velocidade}x'})...")
+        
+        filas = [queue.Queue() for _ in range(num_workers)]
+        latencias = np.full(len(registros), np.nan)
+        divergencias = []
+        lock = threading.Lock()
+        
+        def worker(fila):
+            while True:
+                item = fila.get()
+                if item is None:
+                    break
+                indice, registro, instante_planejado = item
+                # Na velocidade máxima não há horário planejado: mede só a requisição
+                referencia = instante_planejado if velocidade else time.perf_counter()
+                status, corpo = self._enviar_leitura(registro['r'])
+                latencias[indice] = time.perf_counter() - referencia
+                if 's' in registro and (status != registro['s'] or corpo != registro['c']):
+                    with lock:
+                        divergencias.append({
+                            'indice': indice,
+                            'dispositivo': registro['d'],
+                            'esperado': [registro['s'], registro['c']],
+                            'obtido': [status, corpo]
+                        })
+        
+        threads = [threading.Thread(target=worker, args=(fila,), daemon=True) for fila in filas]
+        for t in threads:
+            t.start()
+        
+        inicio = time.perf_counter()
+        instante = 0.0
+        for i, registro in enumerate(registros):
+            instante += registro['t'] / 1000
+            instante_planejado = inicio + (instante / velocidade if velocidade else 0)
+            espera = instante_planejado - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+            filas[registro['d'] % num_workers].put((i, registro, max(instante_planejado, inicio)))
+        
+        for fila in filas:
+            fila.put(None)
+        for t in threads:
+            t.join()
+        
+        duracao = time.perf_counter() - inicio
+        latencias_ms = latencias * 1000
+        relatorio = {
+            'leituras': len(registros),
+            'duracao_s': round(duracao, 3),
+            'vazao': round(len(registros) / duracao, 2) if duracao > 0 else 0.0,
+            'latencia_ms': {
+                nome: round(float(np.nanpercentile(latencias_ms, p)), 2)
+                for nome, p in [('p50', 50), ('p90', 90), ('p99', 99)]
+            } if len(registros) else {},
+            'divergencias': len(divergencias),
+            'detalhes_divergencias': sorted(divergencias, key=lambda d: d['indice'])[:20]
+        }
+        
+        print("\n=== RELATÓRIO DE REPRODUÇÃO ===")
+        print(f"Leituras: {relatorio['leituras']} em {relatorio['duracao_s']:.1f}s "
+              f"({relatorio['vazao']:.1f} req/s)")
+        for nome, valor in relatorio['latencia_ms'].items():
+            print(f"Latência {nome}: {valor:.1f} ms")
+        print(f"Respostas divergentes: {relatorio['divergencias']}")
+        for d in relatorio['detalhes_divergencias'][:5]:
+            print(f"  #{d['indice']} dispositivo {d['dispositivo']}: "
+                  f"esperado {d['esperado']} obtido {d['obtido']}")
+        
+        return relatorio
+    
     def verificar_api(self):
         # Verifica se a API está rodando
-        try:
-            response = requests.get(f'{self.api_url}/health')
-            if response.status_code == 200:
-                return True
-        except:
-            pass
-        return False
+        return self.cliente.verificar_saude()
 
 def menu_interativo():
     # Menu o gerador
@@ -181,7 +460,8 @@ def menu_interativo():
         print("3. Inserção contínua (30s)")
         print("4. Inserção contínua rápida (5s)")
         print("5. Ver estatísticas atuais")
-        print("6. Sair")
+        print("6. Teste de carga (frota de dispositivos)")
+        print("7. Sair")
         
         escolha = input("\nEscolha uma opção: ").strip()
         
@@ -201,7 +481,7 @@ def menu_interativo():
             
         elif escolha == '5':
             try:
-                response = requests.get(f'{gerador.api_url}/dados/estatisticas')
+                response = gerador.cliente.get('/dados/estatisticas')
                 if response.status_code == 200:
                     stats = response.json()
                     print("\n=== ESTATÍSTICAS ATUAIS ===")
@@ -217,6 +497,16 @@ def menu_interativo():
                 print(f"Erro: {e}")
                 
         elif escolha == '6':
+            try:
+                num_dispositivos = int(input("Número de dispositivos [100]: ").strip() or 100)
+                taxa = float(input("Taxa alvo em req/s [50]: ").strip() or 50)
+                duracao = float(input("Duração em segundos [60]: ").strip() or 60)
+            except ValueError:
+                print("Valor inválido")
+                continue
+            gerador.simular_frota_concorrente(num_dispositivos, taxa, duracao)
+            
+        elif escolha == '7':
             print("Saindo...")
             break
             
@@ -239,10 +529,7 @@ def exemplo_rapido():
     for i in range(10):
         dados = gerador.gerar_dados_realisticos()
         try:
-            response = requests.post(
-                f'{gerador.api_url}/dados',
-                json=dados
-            )
+            response = gerador.cliente.post('/dados', json=dados)
             if response.status_code == 201:
                 print(f"✓ Registro {i+1}: H:{dados['humidity']:.1f}% "
                       f"T:{dados['temperature']:.1f}°C Bomba:{dados['bomba_status']}")
@@ -258,5 +545,48 @@ if __name__ == "__main__":
     
     if len(sys.argv) > 1 and sys.argv[1] == 'rapido':
         exemplo_rapido()
+    elif len(sys.argv) > 2 and sys.argv[1] == 'exportar':
+        # Uso: python data_generator.py exportar <arquivo.ndjson> [quantidade] [dispositivos]
+        GeradorDadosIrrigacao().exportar_historico(
+            int(sys.argv[3]) if len(sys.argv) > 3 else 10000, sys.argv[2],
+            num_dispositivos=int(sys.argv[4]) if len(sys.argv) > 4 else None
+        )
+    elif len(sys.argv) > 1 and sys.argv[1] == 'dispositivos':
+        # Uso: python data_generator.py dispositivos [quantidade] [dispositivos]
+        # Histórico distribuído entre campos com solos diferentes (modelos por dispositivo)
+        gerador = GeradorDadosIrrigacao()
+        if not gerador.verificar_api():
+            print("API não está rodando!")
+        else:
+            gerador.inserir_dados_batch_inicial(
+                int(sys.argv[2]) if len(sys.argv) > 2 else 5000, tamanho_lote=500,
+                num_dispositivos=int(sys.argv[3]) if len(sys.argv) > 3 else 10
+            )
+    elif len(sys.argv) > 2 and sys.argv[1] == 'gravar':
+        # Uso: python data_generator.py gravar <arquivo.ndjson.gz> [quantidade] [taxa] [semente]
+        args = sys.argv[3:]
+        GeradorDadosIrrigacao().gravar_trafego(
+            sys.argv[2],
+            quantidade=int(args[0]) if len(args) > 0 else 1000,
+            taxa=float(args[1]) if len(args) > 1 else 10.0,
+            semente=int(args[2]) if len(args) > 2 else 42
+        )
+    elif len(sys.argv) > 2 and sys.argv[1] == 'reproduzir':
+        # Uso: python data_generator.py reproduzir <arquivo.ndjson.gz> [velocidade, 0 = máxima]
+        GeradorDadosIrrigacao().reproduzir_trafego(
+            sys.argv[2], velocidade=float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+        )
+    elif len(sys.argv) > 1 and sys.argv[1] == 'carga':
+        # Uso: python data_generator.py carga [dispositivos] [taxa] [duracao]
+        gerador = GeradorDadosIrrigacao()
+        if not gerador.verificar_api():
+            print("API não está rodando!")
+        else:
+            args = sys.argv[2:]
+            gerador.simular_frota_concorrente(
+                num_dispositivos=int(args[0]) if len(args) > 0 else 100,
+                taxa_alvo=float(args[1]) if len(args) > 1 else 50.0,
+                duracao=float(args[2]) if len(args) > 2 else 60
+            )
     else:
         menu_interativo()
\ No newline at end of file
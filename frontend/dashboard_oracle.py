@@ -3,9 +3,14 @@ import pandas as pd
 import plotly.express as px
 import requests
 import oracledb
-from datetime import datetime
+from datetime import datetime, timedelta
+import os
+import sys
 import time
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+from api_client import ClienteAPIIrrigacao
+
 # Configuração da página
 st.set_page_config(page_title="Dashboard Agrícola", layout="wide")
 
@@ -18,6 +23,13 @@ ORACLE_CONFIG = {
 
 TABELA = 'irrigacao_dados'
 
+API_URL = "http://localhost:5000"
+
+@st.cache_resource
+def obter_cliente_api(api_url=API_URL):
+    """Cliente HTTP compartilhado entre as execuções do script (mantém o pool de conexões)"""
+    return ClienteAPIIrrigacao(api_url, timeout=(3.05, 10))
+
 # Opção 1: Conectar diretamente ao banco
 def conectar_oracle():
     """Conecta ao Oracle com retry"""
@@ -35,27 +47,136 @@ def conectar_oracle():
             time.sleep(1)
     return None
 
+# Períodos do seletor de intervalo (None = todo o histórico)
+PERIODOS = {
+    "Últimas 24 horas": timedelta(days=1),
+    "Últimos 7 dias": timedelta(days=7),
+    "Últimos 30 dias": timedelta(days=30),
+    "Últimos 90 dias": timedelta(days=90),
+    "Último ano": timedelta(days=365),
+    "Todo o histórico": None,
+    "Personalizado": None,
+}
+
+# Agregações possíveis, da mais fina para a mais grossa: (nome, formato do TRUNC, segundos)
+GRANULARIDADES = [
+    ("leitura", None, 0),
+    ("hora", "HH24", 3600),
+    ("dia", "DD", 86400),
+    ("semana", "IW", 7 * 86400),
+]
+
+TAMANHO_BLOCO = 5000
+
+def intervalo_periodo(periodo, inicio=None, fim=None):
+    """Converte o período escolhido em (início, fim) para a consulta"""
+    if periodo == "Personalizado" and inicio and fim:
+        return (datetime.combine(inicio, datetime.min.time()),
+                datetime.combine(fim, datetime.min.time()) + timedelta(days=1))
+    agora = datetime.now()
+    duracao = PERIODOS.get(periodo)
+    return (agora - duracao if duracao else datetime(1900, 1, 1)), agora + timedelta(minutes=1)
+
+def escolher_granularidade(total, primeira, ultima, max_linhas):
+    """A agregação mais fina cujo número de pontos cabe em max_linhas"""
+    if total <= max_linhas:
+        return GRANULARIDADES[0]
+    segundos = max((ultima - primeira).total_seconds(), 1) if primeira and ultima else 0
+    for granularidade in GRANULARIDADES[1:]:
+        # Um ponto por intervalo e por estado da bomba
+        if (segundos // granularidade[2] + 1) * 2 <= max_linhas:
+            return granularidade
+    return GRANULARIDADES[-1]
+
+def ler_em_blocos(cursor, tamanho_bloco=TAMANHO_BLOCO):
+    """Lê o resultado do cursor em blocos de linhas, montando um DataFrame por bloco"""
+    colunas = [descricao[0] for descricao in cursor.description]
+    blocos = []
+    while True:
+        linhas = cursor.fetchmany(tamanho_bloco)
+        if not linhas:
+            break
+        blocos.append(pd.DataFrame(linhas, columns=colunas))
+    return pd.concat(blocos, ignore_index=True) if blocos else pd.DataFrame(columns=colunas)
+
 @st.cache_data(ttl=30)  # Cache por 30 segundos
-def load_data_from_oracle():
-    """Carrega dados diretamente do Oracle"""
+def load_data_from_oracle(periodo="Últimos 7 dias", max_linhas=20000, inicio=None, fim=None):
+    """
+    Carrega do Oracle apenas o intervalo escolhido, limitado a max_linhas.
+
+    Um resumo (contagem, médias e estado da bomba) é calculado no banco sobre
+    todo o intervalo; se as leituras não couberem em max_linhas, elas vêm
+    agregadas por hora, dia ou semana (média por intervalo e estado da bomba).
+
+    Returns:
+        tuple: (DataFrame, resumo do intervalo)
+    """
     try:
+        data_inicio, data_fim = intervalo_periodo(periodo, inicio, fim)
+        filtro = "WHERE data_coleta >= :inicio AND data_coleta < :fim"
+        params = {'inicio': data_inicio, 'fim': data_fim}
+
         conn = conectar_oracle()
-        
-        # Query para buscar os dados
-        query = f"""
-            SELECT 
-                humidity as "Humidity",
-                temperature as "Temperature", 
-                ph as "pH",
-                fosforo_presente as "FosforoPresente",
-                potassio_presente as "PotassioPresente",
-                bomba_status as "BOMBA LIGADA/DESLIGADA",
-                data_coleta
+        cur = conn.cursor()
+
+        cur.execute(f"""
+            SELECT COUNT(*), AVG(humidity), AVG(temperature), AVG(ph),
+                   MAX(fosforo_presente), MAX(potassio_presente),
+                   SUM(CASE WHEN bomba_status = 'LIGADA' THEN 1 ELSE 0 END),
+                   SUM(CASE WHEN bomba_status = 'DESLIGADA' THEN 1 ELSE 0 END),
+                   MIN(data_coleta), MAX(data_coleta)
             FROM {TABELA}
-            ORDER BY data_coleta DESC
-        """
-        
-        df = pd.read_sql(query, conn)
+            {filtro}
+        """, params)
+        (total, umidade, temperatura, ph, fosforo, potassio,
+         ligada, desligada, primeira, ultima) = cur.fetchone()
+        granularidade, formato, _ = escolher_granularidade(total or 0, primeira, ultima, max_linhas)
+        resumo = {
+            'total': total or 0, 'Humidity': umidade, 'Temperature': temperatura, 'pH': ph,
+            'FosforoPresente': fosforo, 'PotassioPresente': potassio,
+            'ligada': ligada or 0, 'desligada': desligada or 0,
+            'ultima_coleta': ultima, 'granularidade': granularidade
+        }
+
+        # Query para buscar os dados (o formato do TRUNC vem de GRANULARIDADES)
+        if formato is None:
+            query = f"""
+                SELECT 
+                    humidity as "Humidity",
+                    temperature as "Temperature", 
+                    ph as "pH",
+                    fosforo_presente as "FosforoPresente",
+                    potassio_presente as "PotassioPresente",
+                    bomba_status as "BOMBA LIGADA/DESLIGADA",
+                    data_coleta as "data_coleta"
+                FROM {TABELA}
+                {filtro}
+                ORDER BY data_coleta DESC
+                FETCH FIRST :limite ROWS ONLY
+            """
+        else:
+            query = f"""
+                SELECT 
+                    AVG(humidity) as "Humidity",
+                    AVG(temperature) as "Temperature", 
+                    AVG(ph) as "pH",
+                    AVG(fosforo_presente) as "FosforoPresente",
+                    AVG(potassio_presente) as "PotassioPresente",
+                    bomba_status as "BOMBA LIGADA/DESLIGADA",
+                    TRUNC(data_coleta, '{formato}') as "data_coleta",
+                    COUNT(*) as "Leituras"
+                FROM {TABELA}
+                {filtro}
+                GROUP BY TRUNC(data_coleta, '{formato}'), bomba_status
+                ORDER BY 7 DESC
+                FETCH FIRST :limite ROWS ONLY
+            """
+
+        cur.arraysize = TAMANHO_BLOCO
+        cur.prefetchrows = TAMANHO_BLOCO + 1
+        cur.execute(query, dict(params, limite=int(max_linhas)))
+        df = ler_em_blocos(cur)
+        cur.close()
         conn.close()
         
         # Converter status da bomba para o formato esperado
@@ -64,18 +185,23 @@ def load_data_from_oracle():
             "DESLIGADA": "DESLIGADA"
         })
         
-        return df
+        return df, resumo
         
     except Exception as e:
         st.error(f"Erro ao conectar ao banco: {e}")
-        return pd.DataFrame()  # Retorna DataFrame vazio em caso de erro
+        return pd.DataFrame(), None  # Retorna DataFrame vazio em caso de erro
 
 # Opção 2: Usar a API (caso a API esteja rodando)
 @st.cache_data(ttl=30)
-def load_data_from_api(api_url="http://localhost:5000"):
-    """Carrega dados através da API"""
+def load_data_from_api(api_url=API_URL, periodo="Últimos 7 dias", max_linhas=20000, inicio=None, fim=None):
+    """Carrega dados através da API (intervalo escolhido, até max_linhas leituras)"""
     try:
-        response = requests.get(f"{api_url}/dados/consulta", timeout=10)
+        data_inicio, data_fim = intervalo_periodo(periodo, inicio, fim)
+        response = obter_cliente_api(api_url).get("/dados/consulta", params={
+            'data_inicio': data_inicio.isoformat(),
+            'data_fim': data_fim.isoformat(),
+            'limite': int(max_linhas)
+        })
         if response.status_code == 200:
             data = response.json()
             df = pd.DataFrame(data['dados'])
@@ -107,16 +233,28 @@ fonte_dados = st.sidebar.selectbox(
     ["Banco Oracle Direto", "API (localhost:5000)"]
 )
 
+# Intervalo de tempo e limite de linhas (aplicados na consulta)
+periodo = st.sidebar.selectbox("Período:", list(PERIODOS), index=1)
+data_inicio = data_fim = None
+if periodo == "Personalizado":
+    hoje = datetime.now().date()
+    intervalo = st.sidebar.date_input("Intervalo:", value=(hoje - timedelta(days=7), hoje))
+    if len(intervalo) == 2:
+        data_inicio, data_fim = intervalo
+max_linhas = st.sidebar.number_input("Máximo de linhas:", min_value=1000, max_value=200000,
+                                     value=20000, step=1000)
+
 # Botão para atualizar dados
 if st.sidebar.button("🔄 Atualizar Dados"):
     st.cache_data.clear()
     st.rerun()
 
 # Carregar dados baseado na escolha
+resumo = None
 if fonte_dados == "Banco Oracle Direto":
-    df = load_data_from_oracle()
+    df, resumo = load_data_from_oracle(periodo, max_linhas, data_inicio, data_fim)
 else:
-    df = load_data_from_api()
+    df = load_data_from_api(API_URL, periodo, max_linhas, data_inicio, data_fim)
 
 # Verificar se há dados
 if df.empty:
@@ -129,6 +267,23 @@ df_filtered = df.copy()
 # Criar coluna binária para bomba ligada/desligada
 df_filtered["bomba_status_bin"] = df_filtered["BOMBA LIGADA/DESLIGADA"].map({"LIGADA": 1, "DESLIGADA": 0})
 
+# Com o resumo do banco, as métricas cobrem todo o intervalo (mesmo com os dados agregados)
+if resumo is not None:
+    medias = resumo
+    total_registros = resumo['total']
+    bomba_ligada, bomba_desligada = resumo['ligada'], resumo['desligada']
+else:
+    medias = {
+        'Temperature': df_filtered['Temperature'].mean(),
+        'Humidity': df_filtered['Humidity'].mean(),
+        'pH': df_filtered['pH'].mean(),
+        'FosforoPresente': df_filtered['FosforoPresente'].sum(),
+        'PotassioPresente': df_filtered['PotassioPresente'].sum()
+    }
+    total_registros = len(df_filtered)
+    bomba_ligada = (df_filtered['BOMBA LIGADA/DESLIGADA'] == "LIGADA").sum()
+    bomba_desligada = (df_filtered['BOMBA LIGADA/DESLIGADA'] == "DESLIGADA").sum()
+
 # Título
 st.title("Dashboard de Monitoramento Agrícola")
 
@@ -137,50 +292,53 @@ col_info1, col_info2, col_info3 = st.columns(3)
 with col_info1:
     st.info(f"📊 Fonte: {fonte_dados}")
 with col_info2:
-    st.info(f"📈 Total de registros: {len(df_filtered)}")
+    st.info(f"📈 Total de registros: {total_registros}")
 with col_info3:
     if 'data_coleta' in df_filtered.columns:
         ultima_atualizacao = df_filtered['data_coleta'].max()
         st.info(f"🕒 Última coleta: {ultima_atualizacao}")
+if resumo is not None and resumo['granularidade'] != "leitura":
+    st.caption(f"{resumo['total']} leituras no período, exibidas como médias por "
+               f"{resumo['granularidade']} ({len(df_filtered)} pontos, limite de {max_linhas} linhas)")
+elif total_registros >= max_linhas:
+    st.caption(f"Exibindo as {max_linhas} leituras mais recentes do período")
 
 # Métricas principais
 col1, col2, col3, col4, col5, col6 = st.columns(6)
 with col1:
     if len(df_filtered) > 0:
-        st.metric(label="Temperatura", value=f"{df_filtered['Temperature'].mean():.1f}°C")
+        st.metric(label="Temperatura", value=f"{medias['Temperature']:.1f}°C")
     else:
         st.metric(label="Temperatura", value="N/A")
 
 with col2:
     if len(df_filtered) > 0:
-        st.metric(label="Umidade", value=f"{df_filtered['Humidity'].mean():.1f}%")
+        st.metric(label="Umidade", value=f"{medias['Humidity']:.1f}%")
     else:
         st.metric(label="Umidade", value="N/A")
 
 with col3:
     if len(df_filtered) > 0:
-        st.metric(label="pH", value=f"{df_filtered['pH'].mean():.2f}")
+        st.metric(label="pH", value=f"{medias['pH']:.2f}")
     else:
         st.metric(label="pH", value="N/A")
 
 with col4:
     if len(df_filtered) > 0:
-        fosforo_presente = "SIM" if df_filtered['FosforoPresente'].sum() > 0 else "NÃO"
+        fosforo_presente = "SIM" if medias['FosforoPresente'] > 0 else "NÃO"
         st.metric(label="Fósforo presente", value=f"{fosforo_presente}")
     else:
         st.metric(label="Fósforo presente", value="N/A")
 
 with col5:
     if len(df_filtered) > 0:
-        potassio_presente = "SIM" if df_filtered['PotassioPresente'].sum() > 0 else "NÃO"
+        potassio_presente = "SIM" if medias['PotassioPresente'] > 0 else "NÃO"
         st.metric(label="Potássio presente", value=f"{potassio_presente}")
     else:
         st.metric(label="Potássio presente", value="N/A")
 
 with col6:
     if len(df_filtered) > 0:
-        bomba_ligada = (df_filtered['BOMBA LIGADA/DESLIGADA'] == "LIGADA").sum()
-        bomba_desligada = (df_filtered['BOMBA LIGADA/DESLIGADA'] == "DESLIGADA").sum()
         st.metric(label="Bomba Ligada", value=f"{bomba_ligada}")
         st.metric(label="Bomba Desligada", value=f"{bomba_desligada}")
     else:
@@ -280,13 +438,9 @@ st.sidebar.markdown("---")
 st.sidebar.markdown("### Status da Conexão")
 
 if fonte_dados == "API (localhost:5000)":
-    try:
-        health_response = requests.get("http://localhost:5000/health", timeout=5)
-        if health_response.status_code == 200:
-            st.sidebar.success("✅ API Online")
-        else:
-            st.sidebar.error("❌ API com problemas")
-    except:
+    if obter_cliente_api().verificar_saude():
+        st.sidebar.success("✅ API Online")
+    else:
         st.sidebar.error("❌ API Offline")
 else:
     try:
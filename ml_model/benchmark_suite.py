@@ -0,0 +1,328 @@
+"""
+Benchmark de treino e inferência do SistemaIrrigacaoML com dados sintéticos.
+
+Para cada tamanho de base, mede as fases preparar_dados, treinar, salvar,
+carregar, prever (uma leitura por chamada e em lote), otimizar_horarios e
+relatorio_completo do analisador. Tudo roda offline (sem API nem Oracle),
+em uma pasta temporária.
+
+Por fase são registrados tempo de parede, tempo de CPU, pico de memória
+alocada (tracemalloc) e RSS do processo, em um JSON que pode ser comparado
+entre commits. Com --perfil, cada fase também gera um .prof do cProfile
+(abrir com `python -m pstats` ou snakeviz); os tempos medidos então incluem
+o overhead do profiler.
+
+Uso:
+    python benchmark_suite.py                              # 1 mil, 10 mil e 100 mil linhas
+    python benchmark_suite.py 1000 50000 --motor boosting --saida bench.json
+    python benchmark_suite.py 10000 --perfil perfis/
+    python benchmark_suite.py --comparar antes.json depois.json
+"""
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+import contextlib
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from feature_pipeline import COLUNAS_ENTRADA
+from model_engines import MOTORES, gerar_leituras_sinteticas, pico_memoria_mb
+from ml_irrigation_system import SistemaIrrigacaoML
+from model_analyzer import AnalisadorModeloIrrigacao
+
+
+def gerar_dados_sinteticos(linhas, semente=0):
+    """
+    DataFrame no formato de /dados/consulta (com bomba_ligada), sem ausentes.
+    """
+    rng = np.random.default_rng(semente)
+    colunas, bomba = gerar_leituras_sinteticas(rng, linhas, fracao_ausentes=0)
+    df = pd.DataFrame(dict(zip(COLUNAS_ENTRADA[:5], colunas[:5])))
+    # 2024-01-01 é segunda-feira: hora e dia da semana voltam iguais em preparar_dados
+    semanas = rng.integers(0, 52, linhas)
+    df['DATA_COLETA'] = (pd.Timestamp('2024-01-01')
+                         + pd.to_timedelta(semanas * 7 + colunas[6].astype(np.int64), unit='D')
+                         + pd.to_timedelta(colunas[5].astype(np.int64), unit='h'))
+    df['ID'] = np.arange(1, linhas + 1)
+    df['BOMBA_STATUS'] = np.where(bomba == 1, 'LIGADA', 'DESLIGADA')
+    df['bomba_ligada'] = bomba.astype(int)
+    return df
+
+
+class _SistemaOffline(SistemaIrrigacaoML):
+    # Treina com um DataFrame em memória e grava tudo em `pasta`
+    def __init__(self, df, pasta):
+        super().__init__()
+        self.df = df
+        self.caminho_modelo = os.path.join(pasta, 'modelo_irrigacao.pkl')
+        self.diretorio_registro = os.path.join(pasta, 'modelos')
+        self.diretorio_feature_store = os.path.join(pasta, 'feature_store')
+
+    def obter_dados_treino(self, usar_feature_store=True, em_blocos=False):
+        return self.preparar_dados(self.df.copy())
+
+
+def _rss_atual_mb():
+    # RSS atual (Linux); em outros sistemas só o pico é informado
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError):
+        return None
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class BenchmarkIrrigacao:
+    """
+    Executa as fases para cada tamanho e acumula os resultados.
+    """
+
+    def __init__(self, motor='floresta', chamadas_unitarias=200, max_linhas_lote=100000,
+                 pasta_perfil=None, rastrear_alocacoes=True, silencioso=True, semente=0):
+        """
+        Args:
+            motor (str): Motor de modelo treinado (ver model_engines.MOTORES)
+            chamadas_unitarias (int): Chamadas de prever_irrigacao medidas por tamanho
+            max_linhas_lote (int): Linhas da predição em lote (limitadas ao tamanho da base)
+            pasta_perfil (str): Se informada, grava um .prof do cProfile por fase
+            rastrear_alocacoes (bool): Mede o pico com tracemalloc (deixa as fases mais lentas)
+            silencioso (bool): Suprime a saída das funções medidas
+        """
+        self.motor = motor
+        self.chamadas_unitarias = chamadas_unitarias
+        self.max_linhas_lote = max_linhas_lote
+        self.pasta_perfil = pasta_perfil
+        self.rastrear_alocacoes = rastrear_alocacoes
+        self.silencioso = silencioso
+        self.semente = semente
+        self.resultados = []
+
+    def _medir(self, nome, linhas, funcao):
+        """
+        Executa `funcao` medindo tempo, CPU e memória.
+
+        Returns:
+            tuple: (dict da fase, retorno de funcao)
+        """
+        perfil = None
+        if self.pasta_perfil:
+            import cProfile
+            perfil = cProfile.Profile()
+        if self.rastrear_alocacoes:
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+        try:
+            saida = contextlib.redirect_stdout(io.StringIO()) if self.silencioso else contextlib.nullcontext()
+            inicio_cpu = time.process_time()
+            inicio = time.perf_counter()
+            with saida:
+                if perfil is not None:
+                    perfil.enable()
+                try:
+                    retorno = funcao()
+                finally:
+                    if perfil is not None:
+                        perfil.disable()
+            tempo = time.perf_counter() - inicio
+            tempo_cpu = time.process_time() - inicio_cpu
+
+            fase = {'fase': nome, 'tempo_s': round(tempo, 4), 'cpu_s': round(tempo_cpu, 4)}
+            if self.rastrear_alocacoes:
+                fase['pico_alocado_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 2)
+        finally:
+            # Uma fase que falha não deixa o rastreamento ligado (e lento) nas seguintes
+            if self.rastrear_alocacoes:
+                tracemalloc.stop()
+        rss = _rss_atual_mb()
+        fase['rss_mb'] = round(rss, 1) if rss is not None else None
+        # Pico do processo inteiro desde o início (só cresce entre as fases)
+        fase['pico_rss_mb'] = round(pico_memoria_mb(), 1)
+
+        if perfil is not None:
+            os.makedirs(self.pasta_perfil, exist_ok=True)
+            caminho = os.path.join(self.pasta_perfil, f'{self.motor}_{linhas}_{nome}.prof')
+            perfil.dump_stats(caminho)
+            fase['perfil'] = caminho
+        return fase, retorno
+
+    def executar_tamanho(self, linhas):
+        """
+        Mede todas as fases para uma base de `linhas` leituras.
+
+        Returns:
+            dict: {'linhas', 'fases': [...]} ou com 'erro' se o treino falhar
+        """
+        df = gerar_dados_sinteticos(linhas, self.semente + linhas)
+        resultado = {'linhas': linhas, 'fases': []}
+        fases = resultado['fases']
+
+        with tempfile.TemporaryDirectory() as pasta:
+            sistema = _SistemaOffline(df, pasta)
+
+            fase, _ = self._medir('preparar_dados', linhas, lambda: sistema.preparar_dados(df.copy()))
+            fases.append(fase)
+
+            # treinar_modelo também salva; a fase salvar abaixo mede só a gravação
+            fase, ok = self._medir('treinar', linhas, lambda: sistema.treinar_modelo(motor=self.motor))
+            fase['tempo_ajuste_s'] = sistema.metadados_treino.get('tempo_ajuste_s')
+            fases.append(fase)
+            if not ok:
+                resultado['erro'] = "treinamento falhou"
+                return resultado
+
+            sistema.diretorio_registro = os.path.join(pasta, 'modelos_salvar')
+            fase, _ = self._medir('salvar', linhas, sistema.salvar_modelo)
+            fase['tamanho_mb'] = round(sum(
+                os.path.getsize(os.path.join(raiz, nome))
+                for raiz, _, nomes in os.walk(sistema.diretorio_registro) for nome in nomes) / 1024 ** 2, 2)
+            fases.append(fase)
+
+            carregado = _SistemaOffline(df, pasta)
+            carregado.diretorio_registro = sistema.diretorio_registro
+            fase, _ = self._medir('carregar', linhas, carregado.carregar_modelo)
+            fases.append(fase)
+
+            amostra = df[COLUNAS_ENTRADA[:5]].to_numpy(dtype=np.float64)[:self.chamadas_unitarias]
+            tempos = []
+
+            def prever_unitario():
+                for linha in amostra:
+                    inicio = time.perf_counter()
+                    carregado.prever_irrigacao(*linha, hora_atual=12)
+                    tempos.append(time.perf_counter() - inicio)
+
+            fase, _ = self._medir('prever_unitario', linhas, prever_unitario)
+            fase['chamadas'] = len(tempos)
+            tempos_us = np.array(tempos) * 1e6
+            fase['latencia_us'] = {nome: round(float(np.percentile(tempos_us, p)), 1)
+                                   for nome, p in [('p50', 50), ('p90', 90), ('p99', 99)]}
+            fases.append(fase)
+
+            lote = df.iloc[:self.max_linhas_lote]
+            fase, _ = self._medir('prever_lote', linhas, lambda: carregado.prever_irrigacao_lote(lote))
+            fase['linhas_lote'] = len(lote)
+            fase['linhas_por_s'] = round(len(lote) / fase['tempo_s']) if fase['tempo_s'] else None
+            fases.append(fase)
+
+            # Horizonte de uma semana (7×24 horas)
+            rng = np.random.default_rng(self.semente)
+            previsoes = list(zip(rng.uniform(20, 90, 168), rng.uniform(10, 40, 168), rng.uniform(5.5, 8, 168)))
+            fase, _ = self._medir('otimizar_horarios', linhas,
+                                  lambda: carregado.otimizar_horarios_irrigacao(previsoes))
+            fases.append(fase)
+
+            analisador = AnalisadorModeloIrrigacao(carregado.caminho_modelo, carregado.diretorio_registro)
+            fase, _ = self._medir('relatorio_completo', linhas, analisador.relatorio_completo)
+            fases.append(fase)
+
+        return resultado
+
+    def executar(self, tamanhos):
+        """
+        Returns:
+            dict: Ambiente (commit, versões) e resultados por tamanho, pronto para JSON
+        """
+        import sklearn
+
+        print(f"Benchmark do sistema de irrigação (motor {self.motor})")
+        for linhas in tamanhos:
+            print(f"\n{linhas} linhas:")
+            resultado = self.executar_tamanho(linhas)
+            self.resultados.append(resultado)
+            imprimir_fases(resultado)
+
+        return {
+            'gerado_em': datetime.now().isoformat(),
+            'commit': _commit_atual(),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'cpus': os.cpu_count(),
+            'versoes': {'numpy': np.__version__, 'pandas': pd.__version__, 'scikit-learn': sklearn.__version__},
+            'motor': self.motor,
+            'rastrear_alocacoes': self.rastrear_alocacoes,
+            'perfil': bool(self.pasta_perfil),
+            'resultados': self.resultados,
+        }
+
+
+def imprimir_fases(resultado):
+    print(f"  {'Fase':<20} | {'Tempo (s)':>10} | {'CPU (s)':>9} | {'Alocado (MB)':>12} | {'RSS (MB)':>9}")
+    print("  " + "-" * 72)
+    for fase in resultado['fases']:
+        alocado = fase.get('pico_alocado_mb')
+        rss = fase.get('rss_mb')
+        print(f"  {fase['fase']:<20} | {fase['tempo_s']:>10.4f} | {fase['cpu_s']:>9.4f} | "
+              f"{alocado if alocado is not None else '-':>12} | {rss if rss is not None else '-':>9}")
+    if 'erro' in resultado:
+        print(f"  ERRO: {resultado['erro']}")
+
+
+def comparar(caminho_antes, caminho_depois):
+    """
+    Imprime a razão de tempo e de memória alocada (depois / antes) por tamanho e fase.
+    """
+    with open(caminho_antes) as f:
+        antes = json.load(f)
+    with open(caminho_depois) as f:
+        depois = json.load(f)
+
+    fases_antes = {(r['linhas'], fase['fase']): fase for r in antes['resultados'] for fase in r['fases']}
+    print(f"Antes: {antes.get('commit')} ({antes['gerado_em']})  Depois: {depois.get('commit')} ({depois['gerado_em']})")
+    print(f"{'Linhas':>8} | {'Fase':<20} | {'Antes (s)':>10} | {'Depois (s)':>10} | {'Tempo':>7} | {'Memória':>7}")
+    print("-" * 80)
+    for resultado in depois['resultados']:
+        for fase in resultado['fases']:
+            anterior = fases_antes.get((resultado['linhas'], fase['fase']))
+            if anterior is None:
+                continue
+            razao_tempo = fase['tempo_s'] / anterior['tempo_s'] if anterior['tempo_s'] else float('nan')
+            if fase.get('pico_alocado_mb') and anterior.get('pico_alocado_mb'):
+                razao_memoria = f"{fase['pico_alocado_mb'] / anterior['pico_alocado_mb']:.2f}x"
+            else:
+                razao_memoria = '-'
+            print(f"{resultado['linhas']:>8} | {fase['fase']:<20} | {anterior['tempo_s']:>10.4f} | "
+                  f"{fase['tempo_s']:>10.4f} | {razao_tempo:>6.2f}x | {razao_memoria:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de treino e inferência com dados sintéticos")
+    parser.add_argument('tamanhos', nargs='*', type=int, default=[1000, 10000, 100000],
+                        help="Número de linhas de cada base sintética")
+    parser.add_argument('--motor', choices=MOTORES, default='floresta')
+    parser.add_argument('--saida', default=None, help="Arquivo JSON (padrão: benchmark_<data>.json)")
+    parser.add_argument('--perfil', default=None, metavar='PASTA', help="Grava um .prof do cProfile por fase")
+    parser.add_argument('--chamadas', type=int, default=200, help="Chamadas de prever_irrigacao medidas")
+    parser.add_argument('--sem-tracemalloc', action='store_true',
+                        help="Não mede alocações (tempos sem o overhead do tracemalloc)")
+    parser.add_argument('--verboso', action='store_true', help="Mostra a saída das funções medidas")
+    parser.add_argument('--comparar', nargs=2, metavar=('ANTES', 'DEPOIS'), help="Compara dois JSONs e sai")
+    args = parser.parse_args()
+
+    if args.comparar:
+        comparar(*args.comparar)
+        sys.exit(0)
+
+    benchmark = BenchmarkIrrigacao(args.motor, chamadas_unitarias=args.chamadas, pasta_perfil=args.perfil,
+                                   rastrear_alocacoes=not args.sem_tracemalloc, silencioso=not args.verboso)
+    relatorio = benchmark.executar(args.tamanhos)
+
+    saida = args.saida or f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(saida, 'w') as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados salvos em {saida}")
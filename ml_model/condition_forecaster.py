@@ -0,0 +1,255 @@
+"""
+Previsão das condições (umidade, temperatura e pH) das próximas horas a
+partir do histórico da feature store agregado por hora.
+
+O modelo é leve: para cada variável, um perfil por hora do dia (média dos
+agregados horários) somado à anomalia da última hora observada, que decai
+geometricamente com o horizonte (o fator é a autocorrelação de lag 1 das
+anomalias). Dispositivos com histórico próprio têm um perfil seu, puxado
+para o perfil global (mais o desvio médio do dispositivo) nas horas com
+poucas observações.
+
+Todo o horizonte sai de uma única operação vetorizada e as previsões ficam
+em cache até a feature store receber leituras novas.
+
+Uso:
+    python condition_forecaster.py [horas] [dispositivo_id]
+"""
+import os
+import sys
+import json
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+VARIAVEIS = ['HUMIDITY', 'TEMPERATURE', 'PH']
+
+# Faixas físicas e casas decimais das previsões (as mesmas da quantização do cache de predições)
+LIMITES = np.array([[0, 100], [-10, 60], [0, 14]], dtype=np.float64)
+CASAS_DECIMAIS = {'HUMIDITY': 1, 'TEMPERATURE': 1, 'PH': 2}
+
+# Horas observadas equivalentes do perfil global na média de cada hora de um dispositivo
+PESO_GLOBAL_HORAS = 3.0
+
+# Abaixo disto o decaimento da anomalia não é estimado (a previsão fica só no perfil)
+MINIMO_PARES_AUTOCORRELACAO = 24
+
+
+def _perfil_por_hora(agregados):
+    # Média por hora do dia (24 x variáveis); horas sem dados são interpoladas circularmente
+    perfil = agregados.groupby(agregados.index.hour).mean().reindex(range(24))
+    if perfil.isna().any().any():
+        circular = pd.concat([perfil, perfil, perfil], ignore_index=True).interpolate(limit_direction='both')
+        perfil = circular.iloc[24:48].set_axis(range(24))
+    return perfil.to_numpy(dtype=np.float64)
+
+
+def _autocorrelacao(anomalias, indice):
+    # Autocorrelação de lag 1 das anomalias horárias (só pares de horas consecutivas)
+    consecutivas = np.diff(indice.to_numpy()) == np.timedelta64(1, 'h')
+    if consecutivas.sum() < MINIMO_PARES_AUTOCORRELACAO:
+        return np.zeros(anomalias.shape[1])
+    anterior, atual = anomalias[:-1][consecutivas], anomalias[1:][consecutivas]
+    denominador = (anterior ** 2).sum(axis=0)
+    fator = np.divide((anterior * atual).sum(axis=0), denominador,
+                      out=np.zeros(anomalias.shape[1]), where=denominador > 0)
+    return np.clip(fator, 0.0, 0.99)
+
+
+class PrevisorCondicoes:
+    """
+    Previsor horário das condições do solo, ajustado no histórico local.
+    """
+
+    def __init__(self, diretorio_feature_store='feature_store', peso_global=PESO_GLOBAL_HORAS, max_previsoes=256):
+        """
+        Args:
+            diretorio_feature_store (str): Feature store com o histórico de leituras
+            peso_global (float): Peso do perfil global nas horas de cada dispositivo
+            max_previsoes (int): Horizontes mantidos no cache de previsões
+        """
+        self.diretorio_feature_store = diretorio_feature_store
+        self.peso_global = peso_global
+        self.max_previsoes = max_previsoes
+
+        self.ajuste = None
+        self.versao_dados = None
+        self._previsoes = OrderedDict()
+        self.ajustes = 0
+        self.acertos = 0
+        self.calculos = 0
+
+    def _versao_store(self):
+        # Último id e total de linhas da feature store: só mudam quando chegam dados novos
+        try:
+            with open(os.path.join(self.diretorio_feature_store, '_estado.json')) as f:
+                estado = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not estado.get('total_linhas'):
+            return None
+        return estado.get('ultimo_id'), estado.get('total_linhas')
+
+    def ajustar(self, df):
+        """
+        Ajusta os perfis horários a partir de leituras brutas.
+
+        Args:
+            df (DataFrame): DATA_COLETA, HUMIDITY, TEMPERATURE, PH e,
+                opcionalmente, DISPOSITIVO_ID
+
+        Returns:
+            bool: True se houve dados suficientes
+        """
+        dados = df[VARIAVEIS].astype('float64')
+        dados['instante'] = pd.to_datetime(df['DATA_COLETA']).dt.floor('h')
+        if 'DISPOSITIVO_ID' in df.columns:
+            dispositivos = df['DISPOSITIVO_ID']
+            if pd.api.types.is_float_dtype(dispositivos):
+                dispositivos = dispositivos.astype('Int64')
+            dados['dispositivo'] = dispositivos.astype('string')
+        dados = dados.dropna(subset=['instante'])
+        if dados.empty or dados[VARIAVEIS].isna().all().any():
+            return False
+
+        # Agregados horários de todas as leituras e perfil global
+        horarios = dados.groupby('instante')[VARIAVEIS].mean().sort_index()
+        perfil_global = _perfil_por_hora(horarios)
+        valores = horarios.to_numpy()
+        anomalias = valores - perfil_global[horarios.index.hour]
+        anomalias = np.where(np.isnan(anomalias), 0.0, anomalias)
+        fator = _autocorrelacao(anomalias, horarios.index)
+
+        perfis = {None: perfil_global}
+        ultimas = {None: (horarios.index[-1], anomalias[-1])}
+
+        if 'dispositivo' in dados.columns and dados['dispositivo'].notna().any():
+            por_dispositivo = (dados.dropna(subset=['dispositivo'])
+                               .groupby(['dispositivo', 'instante'])[VARIAVEIS].mean().sort_index())
+            instantes = por_dispositivo.index.get_level_values('instante')
+            hora = instantes.hour.to_numpy()
+            desvios = por_dispositivo.to_numpy() - perfil_global[hora]
+            codigos, nomes = pd.factorize(por_dispositivo.index.get_level_values('dispositivo'), sort=True)
+
+            # Soma e contagem por (dispositivo, hora do dia, variável) em uma passada
+            validos = ~np.isnan(desvios)
+            posicao = codigos * 24 + hora
+            soma = np.zeros((len(nomes) * 24, len(VARIAVEIS)))
+            contagem = np.zeros_like(soma)
+            np.add.at(soma, posicao, np.where(validos, desvios, 0.0))
+            np.add.at(contagem, posicao, validos)
+            soma = soma.reshape(len(nomes), 24, -1)
+            contagem = contagem.reshape(len(nomes), 24, -1)
+
+            # Desvio médio do dispositivo e média encolhida de cada hora
+            total = contagem.sum(axis=1, keepdims=True)
+            desvio_medio = np.divide(soma.sum(axis=1, keepdims=True), total,
+                                     out=np.zeros_like(total), where=total > 0)
+            desvio_hora = (soma + self.peso_global * desvio_medio) / (contagem + self.peso_global)
+            perfis_dispositivos = perfil_global[None] + desvio_hora
+
+            # Última hora observada de cada dispositivo
+            ultimos = np.r_[np.flatnonzero(np.diff(codigos)), len(codigos) - 1]
+            for i, nome in enumerate(nomes):
+                j = ultimos[i]
+                anomalia = por_dispositivo.iloc[j].to_numpy() - perfis_dispositivos[i, hora[j]]
+                perfis[nome] = perfis_dispositivos[i]
+                ultimas[nome] = (instantes[j], np.where(np.isnan(anomalia), 0.0, anomalia))
+
+        self.ajuste = {'perfis': perfis, 'ultimas': ultimas, 'fator': fator,
+                       'horas_observadas': len(horarios)}
+        self._previsoes.clear()
+        self.ajustes += 1
+        return True
+
+    def atualizar(self):
+        """
+        Reajusta a partir da feature store se ela recebeu dados desde o último ajuste.
+
+        Returns:
+            bool: True se há um ajuste disponível
+        """
+        versao = self._versao_store()
+        if versao is None or versao == self.versao_dados:
+            return self.ajuste is not None
+
+        from feature_store import FeatureStoreLocal
+        df = FeatureStoreLocal(self.diretorio_feature_store).carregar(
+            colunas=['ID', 'DATA_COLETA', 'DISPOSITIVO_ID'] + VARIAVEIS)
+        if df is None or not self.ajustar(df):
+            return self.ajuste is not None
+        self.versao_dados = versao
+        return True
+
+    def prever(self, horas=24, dispositivo_id=None, inicio=None):
+        """
+        Condições esperadas hora a hora a partir da próxima hora cheia.
+
+        Args:
+            horas (int): Horizonte (24 a 72 h, ou mais)
+            dispositivo_id: Usa o perfil do dispositivo, se houver histórico dele
+            inicio (datetime): Referência (padrão: agora)
+
+        Returns:
+            DataFrame: HUMIDITY, TEMPERATURE, PH, hora, dia_semana e DATA_HORA
+                (uma linha por hora), ou None sem histórico
+        """
+        if not self.atualizar():
+            return None
+
+        chave_dispositivo = None if dispositivo_id is None else str(dispositivo_id)
+        if chave_dispositivo not in self.ajuste['perfis']:
+            chave_dispositivo = None
+        primeira = pd.Timestamp(inicio if inicio is not None else pd.Timestamp.now()).ceil('h')
+        chave = (chave_dispositivo, int(horas), primeira)
+
+        previsao = self._previsoes.get(chave)
+        if previsao is not None:
+            self._previsoes.move_to_end(chave)
+            self.acertos += 1
+            return previsao.copy()
+
+        perfil = self.ajuste['perfis'][chave_dispositivo]
+        ultima, anomalia = self.ajuste['ultimas'][chave_dispositivo]
+        instantes = pd.date_range(primeira, periods=int(horas), freq='h')
+        hora = instantes.hour.to_numpy()
+        passos = np.maximum((instantes - ultima) / pd.Timedelta(hours=1), 0.0).to_numpy(dtype=np.float64)
+
+        valores = perfil[hora] + anomalia[None, :] * self.ajuste['fator'][None, :] ** passos[:, None]
+        valores = np.clip(valores, LIMITES[:, 0], LIMITES[:, 1])
+
+        previsao = pd.DataFrame(valores, columns=VARIAVEIS).round(CASAS_DECIMAIS)
+        previsao['hora'] = hora
+        previsao['dia_semana'] = instantes.dayofweek.to_numpy()
+        previsao['DATA_HORA'] = instantes
+
+        self._previsoes[chave] = previsao
+        while len(self._previsoes) > self.max_previsoes:
+            self._previsoes.popitem(last=False)
+        self.calculos += 1
+        return previsao.copy()
+
+    def metricas(self):
+        return {
+            'versao_dados': list(self.versao_dados) if self.versao_dados else None,
+            'horas_observadas': self.ajuste['horas_observadas'] if self.ajuste else 0,
+            'dispositivos': sum(chave is not None for chave in self.ajuste['perfis']) if self.ajuste else 0,
+            'ajustes': self.ajustes,
+            'previsoes_calculadas': self.calculos,
+            'previsoes_em_cache': self.acertos,
+        }
+
+
+if __name__ == "__main__":
+    horas = int(sys.argv[1]) if len(sys.argv) > 1 else 24
+    dispositivo = sys.argv[2] if len(sys.argv) > 2 else None
+
+    previsor = PrevisorCondicoes()
+    previsao = previsor.prever(horas, dispositivo)
+    if previsao is None:
+        print("Sem histórico na feature store; treine o modelo para sincronizá-la")
+    else:
+        for linha in previsao.itertuples(index=False):
+            print(f"{linha.DATA_HORA:%d/%m %H}:00  H:{linha.HUMIDITY:5.1f}%  "
+                  f"T:{linha.TEMPERATURE:4.1f}°C  pH:{linha.PH:.2f}")
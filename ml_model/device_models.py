@@ -0,0 +1,328 @@
+"""
+Modelos por dispositivo (campo), com o modelo global como reserva.
+
+Cada dispositivo com histórico suficiente ganha um registro de versões
+próprio em `<registro>/dispositivos/<id>/` (mesmo formato do registro
+global: promoção, rollback e carga leve). Dispositivos sem modelo próprio
+usam o modelo global.
+
+O PoolModelosDispositivo mantém em memória os modelos usados mais
+recentemente, até um limite em MB, e carrega os demais sob demanda.
+
+Uso:
+    python device_models.py treinar [minimo_registros] [workers] [motor]
+    python device_models.py listar
+"""
+import os
+import io
+import sys
+import time
+import threading
+from collections import OrderedDict
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from fast_predictor import PreditorLeve
+from forest_compiler import ARRAYS_FLORESTA
+from model_registry import RegistroModelos
+
+PASTA_DISPOSITIVOS = 'dispositivos'
+
+# Abaixo disto o dispositivo continua no modelo global
+MINIMO_REGISTROS_DISPOSITIVO = 300
+
+
+def pasta_dispositivo(diretorio_registro, dispositivo_id):
+    return os.path.join(diretorio_registro, PASTA_DISPOSITIVOS, str(dispositivo_id))
+
+
+def listar_dispositivos(diretorio_registro):
+    """
+    Returns:
+        dict: Versão promovida de cada dispositivo com modelo próprio
+    """
+    raiz = os.path.join(diretorio_registro, PASTA_DISPOSITIVOS)
+    if not os.path.isdir(raiz):
+        return {}
+    versoes = {}
+    for nome in sorted(os.listdir(raiz)):
+        versao = RegistroModelos(os.path.join(raiz, nome)).versao_atual()
+        if versao:
+            versoes[nome] = versao
+    return versoes
+
+
+def _tamanho_preditor(preditor, pasta):
+    # Memória estimada: arrays da floresta compilada, ou a versão inteira no disco
+    if preditor.floresta is not None:
+        return sum(np.asarray(getattr(preditor.floresta, nome)).nbytes for nome in ARRAYS_FLORESTA)
+    origem = RegistroModelos(pasta).pasta_versao(preditor.versao_modelo) if preditor.versao_modelo else pasta
+    return sum(os.path.getsize(os.path.join(raiz, nome))
+               for raiz, _, nomes in os.walk(origem) for nome in nomes)
+
+
+class PoolModelosDispositivo:
+    """
+    Cache LRU de modelos por dispositivo, limitado por memória e seguro entre threads.
+    """
+
+    def __init__(self, diretorio_registro='modelos', max_memoria_mb=256, intervalo_verificacao_s=60,
+                 caminho_modelo='modelo_irrigacao.pkl'):
+        """
+        Args:
+            diretorio_registro (str): Registro global (os dispositivos ficam em dispositivos/)
+            max_memoria_mb (float): Memória máxima dos modelos residentes
+            intervalo_verificacao_s (float): Por quanto tempo um dispositivo sem modelo
+                próprio não é procurado de novo no disco
+            caminho_modelo (str): .pkl do modelo global, usado se não houver registro
+        """
+        self.diretorio_registro = diretorio_registro
+        self.caminho_modelo = caminho_modelo
+        self.max_memoria = max_memoria_mb * 1024 ** 2
+        self.intervalo_verificacao_s = intervalo_verificacao_s
+
+        self._residentes = OrderedDict()
+        self._sem_modelo = {}
+        self._global = None
+        self._lock = threading.Lock()
+        self.memoria = 0
+        self.acertos = 0
+        self.carregamentos = 0
+        self.despejos = 0
+        self.usos_global = 0
+
+    def _carregar(self, dispositivo_id):
+        pasta = pasta_dispositivo(self.diretorio_registro, dispositivo_id)
+        if not RegistroModelos(pasta).versao_atual():
+            return None, 0
+        preditor = PreditorLeve(pasta, os.path.join(pasta, 'modelo_irrigacao.pkl'))
+        if not preditor.carregar_modelo():
+            return None, 0
+        return preditor, _tamanho_preditor(preditor, pasta)
+
+    def obter(self, dispositivo_id):
+        """
+        Modelo próprio do dispositivo, carregando-o se preciso.
+
+        Returns:
+            PreditorLeve ou None se o dispositivo não tiver modelo próprio
+        """
+        chave = str(dispositivo_id)
+        with self._lock:
+            item = self._residentes.get(chave)
+            if item is not None:
+                self._residentes.move_to_end(chave)
+                self.acertos += 1
+                return item[0]
+            verificado = self._sem_modelo.get(chave)
+            if verificado is not None and time.monotonic() - verificado < self.intervalo_verificacao_s:
+                self.usos_global += 1
+                return None
+
+        # Carrega fora do lock: outros dispositivos continuam sendo atendidos
+        preditor, tamanho = self._carregar(chave)
+
+        with self._lock:
+            if preditor is None:
+                self._sem_modelo[chave] = time.monotonic()
+                self.usos_global += 1
+                return None
+            if chave in self._residentes:
+                # Outra thread carregou o mesmo dispositivo ao mesmo tempo
+                return self._residentes[chave][0]
+            self._sem_modelo.pop(chave, None)
+            self._residentes[chave] = (preditor, tamanho)
+            self.memoria += tamanho
+            self.carregamentos += 1
+            # O mais recente fica mesmo se sozinho passar do limite
+            while self.memoria > self.max_memoria and len(self._residentes) > 1:
+                _, (_, tamanho_antigo) = self._residentes.popitem(last=False)
+                self.memoria -= tamanho_antigo
+                self.despejos += 1
+        return preditor
+
+    def modelo_global(self):
+        with self._lock:
+            if self._global is None:
+                preditor = PreditorLeve(self.diretorio_registro, self.caminho_modelo)
+                if not preditor.carregar_modelo():
+                    return None
+                self._global = preditor
+            return self._global
+
+    def prever_irrigacao_lote(self, dispositivo_id, leituras, hora=None, dia_semana=None):
+        """
+        Predição com o modelo do dispositivo (ou o global, se ele não tiver um).
+
+        Returns:
+            tuple: (dict de prever_irrigacao_lote + 'modelo' com o id do
+                dispositivo ou 'global'; mensagem de erro ou None)
+        """
+        if dispositivo_id is not None:
+            preditor = self.obter(dispositivo_id)
+        else:
+            preditor = None
+            with self._lock:
+                self.usos_global += 1
+        origem = str(dispositivo_id)
+        if preditor is None:
+            preditor = self.modelo_global()
+            origem = 'global'
+            if preditor is None:
+                return None, "Modelo não treinado"
+
+        lote, erro = preditor.prever_irrigacao_lote(leituras, hora, dia_semana)
+        if erro:
+            return None, erro
+        lote['modelo'] = origem
+        return lote, None
+
+    def verificar_versoes(self):
+        """
+        Descarta modelos residentes cuja versão promovida mudou (novo treino ou
+        rollback). Dispositivos sem modelo são procurados de novo no disco
+        quando vence o intervalo_verificacao_s.
+
+        Returns:
+            int: Número de modelos descartados
+        """
+        with self._lock:
+            residentes = [(chave, item[0].versao_modelo) for chave, item in self._residentes.items()]
+            modelo_global = self._global
+        desatualizados = [chave for chave, versao in residentes
+                          if RegistroModelos(pasta_dispositivo(self.diretorio_registro, chave)).versao_atual() != versao]
+        global_desatualizado = (modelo_global is not None and
+                                RegistroModelos(self.diretorio_registro).versao_atual() != modelo_global.versao_modelo)
+
+        with self._lock:
+            for chave in desatualizados:
+                item = self._residentes.pop(chave, None)
+                if item is not None:
+                    self.memoria -= item[1]
+            if global_desatualizado:
+                self._global = None
+        return len(desatualizados) + int(global_desatualizado)
+
+    def metricas(self):
+        with self._lock:
+            consultas = self.acertos + self.carregamentos
+            return {
+                'residentes': len(self._residentes),
+                'memoria_mb': round(self.memoria / 1024 ** 2, 2),
+                'max_memoria_mb': round(self.max_memoria / 1024 ** 2, 2),
+                'acertos': self.acertos,
+                'carregamentos': self.carregamentos,
+                'taxa_acerto': round(self.acertos / consultas, 4) if consultas else None,
+                'despejos': self.despejos,
+                'usos_modelo_global': self.usos_global,
+            }
+
+
+def _treinar_dispositivo(dispositivo_id, df, diretorio_registro, motor):
+    # Executado em um processo do pool: treina e registra o modelo de um dispositivo
+    from ml_irrigation_system import SistemaIrrigacaoML
+
+    pasta = pasta_dispositivo(diretorio_registro, dispositivo_id)
+    os.makedirs(pasta, exist_ok=True)
+    sistema = SistemaIrrigacaoML()
+    sistema.diretorio_registro = pasta
+    sistema.caminho_modelo = os.path.join(pasta, 'modelo_irrigacao.pkl')
+
+    inicio = time.perf_counter()
+    saida = io.StringIO()
+    with redirect_stdout(saida):
+        ok = sistema.treinar_modelo(motor=motor, dados=df)
+    linhas_saida = saida.getvalue().strip().splitlines()
+    return {
+        'dispositivo_id': dispositivo_id,
+        'ok': bool(ok),
+        'linhas': len(df),
+        'acuracia': sistema.historico_acuracia[-1] if ok and sistema.historico_acuracia else None,
+        'versao': sistema.versao_modelo if ok else None,
+        'tempo_s': round(time.perf_counter() - inicio, 2),
+        'erro': None if ok else (linhas_saida[-1] if linhas_saida else "falha no treinamento"),
+    }
+
+
+def treinar_dispositivos(sistema=None, minimo_registros=MINIMO_REGISTROS_DISPOSITIVO, workers=None,
+                         motor=None, dispositivos=None):
+    """
+    Treina em paralelo (um processo por worker) o modelo de cada dispositivo
+    com pelo menos `minimo_registros` leituras na feature store.
+
+    Args:
+        sistema (SistemaIrrigacaoML): Fornece feature store, API e registro global
+        dispositivos (list): Restringe o treino a estes ids
+
+    Returns:
+        list: Um dict por dispositivo treinado (ok, linhas, acurácia, versão, tempo)
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from feature_store import FeatureStoreLocal
+    from ml_irrigation_system import SistemaIrrigacaoML
+
+    sistema = sistema or SistemaIrrigacaoML()
+    store = FeatureStoreLocal(sistema.diretorio_feature_store)
+    try:
+        novas = store.sincronizar(sistema)
+    except Exception as e:
+        print(f"Erro ao sincronizar com a API: {e}")
+        novas = None
+    if novas is None:
+        print("Falha na sincronização; usando apenas os dados locais")
+    df = store.carregar()
+    if df is None or 'DISPOSITIVO_ID' not in df.columns or df['DISPOSITIVO_ID'].isna().all():
+        print("Nenhuma leitura com dispositivo_id na feature store")
+        return []
+
+    df = df[df['DISPOSITIVO_ID'].notna()]
+    contagens = df['DISPOSITIVO_ID'].value_counts()
+    if dispositivos is not None:
+        contagens = contagens[contagens.index.isin([str(d) for d in dispositivos])]
+    elegiveis = contagens[contagens >= minimo_registros].index.tolist()
+    poucos = contagens[contagens < minimo_registros]
+    print(f"{len(contagens)} dispositivos: {len(elegiveis)} com modelo próprio, "
+          f"{len(poucos)} com menos de {minimo_registros} leituras (usam o modelo global)")
+    if not elegiveis:
+        return []
+
+    workers = min(workers or os.cpu_count() or 1, len(elegiveis))
+    grupos = {chave: parte for chave, parte in df[df['DISPOSITIVO_ID'].isin(elegiveis)].groupby('DISPOSITIVO_ID')}
+    resultados = []
+    inicio = time.perf_counter()
+    with ProcessPoolExecutor(workers) as executor:
+        futuros = [executor.submit(_treinar_dispositivo, chave, grupos[chave], sistema.diretorio_registro, motor)
+                   for chave in elegiveis]
+        for futuro in as_completed(futuros):
+            resultado = futuro.result()
+            resultados.append(resultado)
+            if resultado['ok']:
+                print(f"  {resultado['dispositivo_id']:>10}: {resultado['linhas']} leituras, "
+                      f"acurácia {resultado['acuracia']:.3f}, versão {resultado['versao']} "
+                      f"({resultado['tempo_s']:.1f} s)")
+            else:
+                print(f"  {resultado['dispositivo_id']:>10}: falhou ({resultado['erro']})")
+
+    print(f"{sum(r['ok'] for r in resultados)} modelos treinados em {time.perf_counter() - inicio:.1f} s "
+          f"com {workers} processos")
+    return sorted(resultados, key=lambda r: r['dispositivo_id'])
+
+
+if __name__ == "__main__":
+    comando = sys.argv[1] if len(sys.argv) > 1 else 'listar'
+    if comando == 'treinar':
+        # python device_models.py treinar [minimo_registros] [workers] [motor]
+        treinar_dispositivos(
+            minimo_registros=int(sys.argv[2]) if len(sys.argv) > 2 else MINIMO_REGISTROS_DISPOSITIVO,
+            workers=int(sys.argv[3]) if len(sys.argv) > 3 else None,
+            motor=sys.argv[4] if len(sys.argv) > 4 else None
+        )
+    elif comando == 'listar':
+        versoes = listar_dispositivos(os.environ.get('REGISTRO_MODELOS', 'modelos'))
+        if not versoes:
+            print("Nenhum dispositivo com modelo próprio")
+        for dispositivo, versao in versoes.items():
+            print(f"{dispositivo:>10}  {versao}")
+    else:
+        print("Uso: python device_models.py [treinar [minimo] [workers] [motor] | listar]")
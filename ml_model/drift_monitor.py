@@ -0,0 +1,310 @@
+"""
+Monitor de deriva das features em relação aos dados de treino.
+
+No treino, cada feature (já derivada, antes da padronização) ganha um
+perfil compacto: pontos de corte (quantis, ou os próprios valores quando a
+feature é discreta) e a contagem de leituras de treino entre eles. O perfil
+é salvo junto com o modelo.
+
+O monitor mantém as mesmas contagens para as leituras novas, com
+decaimento exponencial (meia-vida em leituras): a memória é fixa e as
+leituras antigas perdem peso aos poucos. A cada consulta calcula, por
+feature, o PSI (índice de estabilidade da população, em faixas de ~10% do
+treino) e a estatística KS (maior distância entre as distribuições
+acumuladas). PSI acima de 0,25 em alguma feature (fora hora e dia da semana) indica
+retreino.
+
+atualizar() só soma as leituras às contagens (barato, pode ficar no
+caminho da predição); o relatório e o alerta ficam em verificar(), chamado
+na consulta ou a cada verificar_a_cada leituras.
+
+Uso:
+    python drift_monitor.py [caminho_modelo.pkl]
+"""
+import json
+import os
+import sys
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from feature_pipeline import PreprocessadorIrrigacao
+
+# Faixas usuais do PSI: abaixo de 0,1 estável; acima de 0,25 deriva significativa
+LIMITE_PSI_MODERADO = 0.1
+LIMITE_PSI_SIGNIFICATIVO = 0.25
+
+# Features com até MAX_CATEGORIAS valores distintos são tratadas como discretas
+MAX_CATEGORIAS = 32
+# Cortes por quantis das features contínuas (resolução da estatística KS)
+MAX_CORTES = 100
+# Faixas do PSI (agrupam os cortes em partes de ~10% do treino)
+FAIXAS_PSI = 10
+# Uma janela de leituras mais curta que o ciclo sempre difere do treino nestas
+# features: a deriva delas é mostrada, mas não entra na recomendação de retreino
+FEATURES_CICLICAS = ('hora', 'dia_semana')
+
+
+def calcular_perfil_treino(X, features, max_cortes=MAX_CORTES):
+    """
+    Perfil compacto da distribuição de treino de cada feature.
+
+    Args:
+        X: Dados de treino (DataFrame de preparar_dados ou matriz (N, 7) de leituras)
+        features (list): Features do modelo, na ordem do modelo
+        max_cortes (int): Cortes por quantis das features contínuas
+
+    Returns:
+        dict: features, linhas, criado_em e, por feature, cortes, contagens e ausentes
+    """
+    derivadas = PreprocessadorIrrigacao(features, preencher_ausentes=False).features_derivadas(X)
+    quantis = np.linspace(0, 1, max_cortes + 1)[1:-1]
+    cortes, contagens, ausentes = [], [], []
+    for j in range(derivadas.shape[1]):
+        coluna = derivadas[:, j]
+        valores = coluna[np.isfinite(coluna)]
+        unicos = np.unique(valores)
+        if len(unicos) <= MAX_CATEGORIAS:
+            # Discreta: um corte entre cada par de valores vizinhos
+            corte = (unicos[1:] + unicos[:-1]) / 2
+        else:
+            corte = np.unique(np.quantile(valores, quantis))
+        cortes.append(corte)
+        contagens.append(np.bincount(np.searchsorted(corte, valores, side='right'),
+                                     minlength=len(corte) + 1))
+        ausentes.append(int(len(coluna) - len(valores)))
+    return {
+        'features': list(features),
+        'linhas': int(len(derivadas)),
+        'criado_em': datetime.now().isoformat(timespec='seconds'),
+        'cortes': cortes,
+        'contagens': contagens,
+        'ausentes': ausentes,
+    }
+
+
+class MonitorDeriva:
+    """
+    Histogramas das leituras novas nos cortes do perfil de treino, com
+    decaimento exponencial, e pontuação de deriva por feature.
+    """
+
+    def __init__(self, perfil, meia_vida=5000, minimo_amostras=200, ao_detectar=None,
+                 verificar_a_cada=1000):
+        """
+        Args:
+            perfil (dict): Saída de calcular_perfil_treino (salvo com o modelo)
+            meia_vida (float): Leituras após as quais o peso de uma leitura cai pela metade
+            minimo_amostras (float): Peso mínimo das leituras novas para avaliar a deriva
+            ao_detectar (callable): Chamada com o relatório quando a deriva passa a
+                recomendar retreino (uma vez por episódio)
+            verificar_a_cada (int): Leituras entre verificações sugeridas por atualizar()
+        """
+        self.perfil = perfil
+        self.features = perfil['features']
+        self.meia_vida = meia_vida
+        self.minimo_amostras = minimo_amostras
+        self.ao_detectar = ao_detectar
+        self.verificar_a_cada = verificar_a_cada
+        self.pipeline = PreprocessadorIrrigacao(self.features, preencher_ausentes=False)
+
+        self._cortes = [np.asarray(c, dtype=np.float64) for c in perfil['cortes']]
+        self._referencia = []
+        self._faixas = []
+        for contagem in perfil['contagens']:
+            contagem = np.asarray(contagem, dtype=np.float64)
+            proporcao = contagem / max(contagem.sum(), 1)
+            self._referencia.append(proporcao)
+            # Faixa do PSI de cada intervalo, pela massa de treino acumulada antes dele
+            antes = np.concatenate([[0.0], np.cumsum(proporcao)[:-1]])
+            self._faixas.append(np.minimum((antes * FAIXAS_PSI).astype(np.int64), FAIXAS_PSI - 1))
+
+        self._lock = threading.Lock()
+        self._lock_verificacao = threading.Lock()
+        self.contagens = [np.zeros(len(c) + 1) for c in self._cortes]
+        self.ausentes = np.zeros(len(self.features))
+        self.peso = 0.0
+        self.leituras = 0
+        self.ultimo_id = perfil.get('ultimo_id')
+        self._alertado = False
+        self._desde_verificacao = 0
+
+    def atualizar(self, X, ultimo_id=None):
+        """
+        Acrescenta leituras novas (DataFrame ou matriz (N, 7), como na predição).
+        Só atualiza as contagens; o relatório e o alerta ficam em verificar().
+
+        Returns:
+            bool: True quando já passaram verificar_a_cada leituras desde a
+                última verificação (só para um dos chamadores simultâneos)
+        """
+        derivadas = self.pipeline.features_derivadas(X)
+        n = len(derivadas)
+        if n == 0:
+            return False
+        decaimento = 0.5 ** (n / self.meia_vida)
+        with self._lock:
+            for j, corte in enumerate(self._cortes):
+                coluna = derivadas[:, j]
+                presentes = np.isfinite(coluna)
+                self.contagens[j] *= decaimento
+                self.contagens[j] += np.bincount(np.searchsorted(corte, coluna[presentes], side='right'),
+                                                 minlength=len(corte) + 1)
+                self.ausentes[j] = self.ausentes[j] * decaimento + (n - presentes.sum())
+            self.peso = self.peso * decaimento + n
+            self.leituras += n
+            if ultimo_id is not None:
+                self.ultimo_id = int(ultimo_id)
+            self._desde_verificacao += n
+            if self._desde_verificacao < self.verificar_a_cada:
+                return False
+            self._desde_verificacao = 0
+            return True
+
+    def verificar(self):
+        """
+        Calcula o relatório e chama ao_detectar quando a deriva passa a
+        recomendar retreino (uma vez por episódio, mesmo com chamadas simultâneas).
+
+        Returns:
+            dict: Relatório atualizado
+        """
+        with self._lock_verificacao:
+            relatorio = self.relatorio()
+            disparar = relatorio['recomendar_retreino'] and not self._alertado
+            self._alertado = relatorio['recomendar_retreino']
+            if disparar and self.ao_detectar is not None:
+                self.ao_detectar(relatorio)
+        return relatorio
+
+    def relatorio(self):
+        """
+        PSI e KS de cada feature contra o perfil de treino.
+
+        Returns:
+            dict: amostras (peso efetivo das leituras novas), leituras, features
+                (psi, ks, ks_critico, ausentes, status), features_em_deriva e
+                recomendar_retreino
+        """
+        with self._lock:
+            contagens = [c.copy() for c in self.contagens]
+            ausentes = self.ausentes.copy()
+            peso, leituras = self.peso, self.leituras
+
+        linhas_treino = self.perfil['linhas']
+        por_feature = {}
+        for j, feature in enumerate(self.features):
+            referencia = self._referencia[j]
+            total = contagens[j].sum()
+            item = {'ausentes_treino': self.perfil['ausentes'][j] / max(linhas_treino, 1),
+                    'ausentes': float(ausentes[j] / peso) if peso else 0.0}
+            if total < self.minimo_amostras:
+                por_feature[feature] = dict(item, psi=None, ks=None, ks_critico=None, status='sem_dados')
+                continue
+
+            atual = contagens[j] / total
+            # PSI nas faixas de ~10% do treino (proporções mínimas evitam log de zero)
+            esperado = np.maximum(np.bincount(self._faixas[j], weights=referencia, minlength=FAIXAS_PSI), 1e-4)
+            observado = np.maximum(np.bincount(self._faixas[j], weights=atual, minlength=FAIXAS_PSI), 1e-4)
+            psi = float(np.sum((observado - esperado) * np.log(observado / esperado)))
+            ks = float(np.max(np.abs(np.cumsum(atual) - np.cumsum(referencia))))
+            # Valor crítico do KS de duas amostras a 5%, com o peso efetivo das leituras novas
+            ks_critico = float(1.36 * np.sqrt((total + linhas_treino) / (total * linhas_treino)))
+
+            if psi >= LIMITE_PSI_SIGNIFICATIVO:
+                status = 'significativa'
+            elif psi >= LIMITE_PSI_MODERADO:
+                status = 'moderada'
+            else:
+                status = 'estavel'
+            por_feature[feature] = dict(item, psi=round(psi, 4), ks=round(ks, 4),
+                                        ks_critico=round(ks_critico, 4), status=status)
+
+        em_deriva = [f for f, item in por_feature.items()
+                     if item['status'] == 'significativa' and f not in FEATURES_CICLICAS]
+        return {
+            'amostras': round(float(peso), 1),
+            'leituras': leituras,
+            'linhas_treino': linhas_treino,
+            'perfil_criado_em': self.perfil.get('criado_em'),
+            'ultimo_id': self.ultimo_id,
+            'features': por_feature,
+            'features_em_deriva': em_deriva,
+            'recomendar_retreino': bool(em_deriva),
+        }
+
+    def salvar(self, caminho):
+        """
+        Grava as contagens atuais (para continuar o monitoramento em outra execução).
+        """
+        with self._lock:
+            estado = {'perfil_criado_em': self.perfil.get('criado_em'),
+                      'contagens': [c.tolist() for c in self.contagens],
+                      'ausentes': self.ausentes.tolist(),
+                      'peso': self.peso, 'leituras': self.leituras, 'ultimo_id': self.ultimo_id}
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        temporario = f'{caminho}.tmp'
+        with open(temporario, 'w') as f:
+            json.dump(estado, f)
+        os.replace(temporario, caminho)
+
+    @classmethod
+    def restaurar(cls, perfil, caminho, **kwargs):
+        """
+        Cria o monitor e, se `caminho` existir e for do mesmo perfil, retoma as contagens.
+        """
+        monitor = cls(perfil, **kwargs)
+        if not os.path.exists(caminho):
+            return monitor
+        try:
+            with open(caminho) as f:
+                estado = json.load(f)
+            if estado.get('perfil_criado_em') != perfil.get('criado_em'):
+                return monitor
+            monitor.contagens = [np.asarray(c, dtype=np.float64) for c in estado['contagens']]
+            monitor.ausentes = np.asarray(estado['ausentes'], dtype=np.float64)
+            monitor.peso = estado['peso']
+            monitor.leituras = estado['leituras']
+            monitor.ultimo_id = estado.get('ultimo_id', monitor.ultimo_id)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Estado do monitor de deriva ignorado: {e}")
+        return monitor
+
+
+def imprimir_relatorio(relatorio):
+    """
+    Tabela legível do relatório de deriva.
+    """
+    print(f"Leituras novas: {relatorio['leituras']} (peso efetivo {relatorio['amostras']:.0f}) | "
+          f"treino: {relatorio['linhas_treino']} linhas")
+    print(f"{'Feature':20} | {'PSI':>7} | {'KS':>6} | {'KS crít.':>8} | Status")
+    print("-" * 62)
+    for feature, item in relatorio['features'].items():
+        if item['psi'] is None:
+            print(f"{feature:20} | {'-':>7} | {'-':>6} | {'-':>8} | {item['status']}")
+        else:
+            print(f"{feature:20} | {item['psi']:7.4f} | {item['ks']:6.4f} | {item['ks_critico']:8.4f} | {item['status']}")
+    if relatorio['recomendar_retreino']:
+        print(f"\nRETREINO RECOMENDADO: deriva significativa em {', '.join(relatorio['features_em_deriva'])}")
+    else:
+        print("\nSem deriva significativa")
+
+
+if __name__ == "__main__":
+    import joblib
+    from feature_pipeline import COLUNAS_ENTRADA
+    from feature_store import FeatureStoreLocal
+
+    caminho = sys.argv[1] if len(sys.argv) > 1 else 'modelo_irrigacao.pkl'
+    dados = joblib.load(caminho)
+    if not dados.get('perfil_treino'):
+        print("Modelo sem perfil de treino (treinado antes do monitor de deriva); treine novamente")
+        sys.exit(1)
+    historico = FeatureStoreLocal('feature_store').matriz(COLUNAS_ENTRADA, dtype=np.float64)
+    if historico is None:
+        print("Feature store vazia")
+        sys.exit(1)
+    monitor = MonitorDeriva(dados['perfil_treino'])
+    monitor.atualizar(historico)
+    imprimir_relatorio(monitor.relatorio())
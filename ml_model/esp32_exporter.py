@@ -0,0 +1,401 @@
+"""
+Gera um header C sem dependências com o modelo de irrigação para o ESP32.
+
+O header contém o pré-processamento (features derivadas + padronização)
+e a floresta em arrays constantes (ficam na flash), além de uma função
+prever() que reproduz bit a bit o predict_proba do scikit-learn.
+
+Uso:
+    python esp32_exporter.py                      # modelo completo
+    python esp32_exporter.py --arvores 20         # só as 20 primeiras árvores
+    python esp32_exporter.py --destilar 15 6      # floresta aluna de 15 árvores, profundidade 6
+
+A verificação compila o header com gcc no Linux e compara a saída com o
+modelo Python em um conjunto de teste.
+"""
+import argparse
+import copy
+import os
+import shutil
+import subprocess
+import tempfile
+
+import numpy as np
+
+from feature_pipeline import FEATURES_PADRAO
+from forest_compiler import FlorestaCompilada
+
+# Estimativa de custo no ESP32 (Xtensa LX6 a 240 MHz): operações em float têm
+# FPU, operações em double são emuladas em software
+CICLOS_POR_NO = 12          # 3 leituras da flash (cache), comparação float, desvio
+CICLOS_SOMA_DOUBLE = 80
+CICLOS_DIVISAO_DOUBLE = 350
+FREQUENCIA_ESP32_HZ = 240_000_000
+
+
+def gerar_entradas_teste(quantidade=5000, semente=0):
+    """
+    Leituras brutas sintéticas (N, 7) cobrindo a faixa dos sensores.
+    """
+    rng = np.random.default_rng(semente)
+    return np.column_stack([
+        np.round(rng.uniform(10, 100, quantidade), 1),    # HUMIDITY
+        np.round(rng.uniform(5, 45, quantidade), 1),      # TEMPERATURE
+        np.round(rng.uniform(5.5, 8.0, quantidade), 2),   # PH
+        rng.integers(0, 2, quantidade),                   # FOSFORO_PRESENTE
+        rng.integers(0, 2, quantidade),                   # POTASSIO_PRESENTE
+        rng.integers(0, 24, quantidade),                  # hora
+        rng.integers(0, 7, quantidade),                   # dia_semana
+    ]).astype(np.float64)
+
+
+def reduzir_floresta(modelo, max_arvores):
+    """
+    Cópia do modelo usando apenas as primeiras `max_arvores` árvores.
+    """
+    reduzido = copy.copy(modelo)
+    reduzido.estimators_ = modelo.estimators_[:max_arvores]
+    reduzido.n_estimators = len(reduzido.estimators_)
+    return reduzido
+
+
+def destilar_floresta(modelo, pipeline, n_arvores, profundidade, quantidade=50000, semente=0):
+    """
+    Treina uma floresta menor para imitar as decisões do modelo original.
+
+    Returns:
+        tuple: (floresta aluna, concordância com o modelo original em leituras
+            que não entraram no treino da aluna)
+    """
+    from sklearn.ensemble import RandomForestClassifier
+
+    X = pipeline.transform(gerar_entradas_teste(quantidade, semente + 1))
+    aluna = RandomForestClassifier(n_estimators=n_arvores, max_depth=profundidade,
+                                   random_state=semente)
+    aluna.fit(X, modelo.predict(X))
+    # Amostra separada: no próprio treino a concordância sairia otimista
+    X_validacao = pipeline.transform(gerar_entradas_teste(quantidade, semente + 2))
+    return aluna, float((aluna.predict(X_validacao) == modelo.predict(X_validacao)).mean())
+
+
+def _hex_double(valor):
+    return float(valor).hex()
+
+
+def _hex_float(valor):
+    return float(np.float32(valor)).hex() + 'f'
+
+
+def _tipo_inteiro(maximo):
+    return 'uint8_t' if maximo < 2 ** 8 else 'uint16_t' if maximo < 2 ** 16 else 'uint32_t'
+
+
+def _array_c(tipo, nome, valores, por_linha=8):
+    linhas = [', '.join(valores[i:i + por_linha]) for i in range(0, len(valores), por_linha)]
+    return f"static const {tipo} {nome}[{len(valores)}] = {{\n    " + ",\n    ".join(linhas) + "\n};\n"
+
+
+def gerar_header(modelo, pipeline):
+    """
+    Gera o código C do modelo.
+
+    Returns:
+        tuple: (código do header, dict com tamanhos em bytes das tabelas)
+    """
+    floresta = FlorestaCompilada.compilar(modelo)
+    if floresta is None or len(floresta.classes_) != 2:
+        raise ValueError("Exportação suporta apenas florestas de classificação binária")
+
+    n_nos = len(floresta.feature)
+    indices = np.arange(n_nos)
+    esquerda, direita = floresta.filhos[0::2], floresta.filhos[1::2]
+    folha = esquerda == indices
+
+    # Nós internos guardam os filhos; folhas guardam o índice na tabela de probabilidades
+    indice_folha = np.cumsum(folha) - 1
+    tabela_esquerda = np.where(folha, indice_folha, esquerda - floresta.raizes[np.searchsorted(floresta.raizes, indices, 'right') - 1])
+    tabela_direita = np.where(folha, 0, direita - floresta.raizes[np.searchsorted(floresta.raizes, indices, 'right') - 1])
+    tabela_feature = np.where(folha, -1, floresta.feature)
+    probabilidades = floresta.probabilidades[folha]
+
+    tipo_no = _tipo_inteiro(max(int(tabela_esquerda.max()), int(tabela_direita.max()), n_nos))
+    tipo_raiz = _tipo_inteiro(n_nos)
+    indices_features = [FEATURES_PADRAO.index(f) for f in pipeline.features]
+
+    tamanhos = {
+        'feature': n_nos,
+        'limiar': 4 * n_nos,
+        'filhos': 2 * n_nos * int(tipo_no[4:-2]) // 8,
+        'raizes': floresta.n_arvores * int(tipo_raiz[4:-2]) // 8,
+        'probabilidades': 16 * len(probabilidades),
+        'pre_processamento': 16 * len(indices_features) + len(indices_features),
+    }
+    tamanhos['total'] = sum(tamanhos.values())
+
+    partes = [
+        "/*\n",
+        " * Modelo de irrigação gerado por ml_model/esp32_exporter.py - não editar.\n",
+        f" * {floresta.n_arvores} árvores, {n_nos} nós, {len(probabilidades)} folhas, "
+        f"profundidade máxima {floresta.profundidade_maxima}.\n",
+        f" * Tabelas: {tamanhos['total']} bytes (flash).\n",
+        " * Entrada: leitura bruta dos sensores; saída idêntica ao predict_proba do Python.\n",
+        " */\n",
+        "#ifndef MODELO_IRRIGACAO_H\n#define MODELO_IRRIGACAO_H\n\n",
+        "#include <stdint.h>\n#include <math.h>\n\n",
+        f"#define MODELO_N_FEATURES {len(indices_features)}\n",
+        f"#define MODELO_N_ARVORES {floresta.n_arvores}\n",
+        f"#define MODELO_CLASSE_0 {int(floresta.classes_[0])}\n",
+        f"#define MODELO_CLASSE_1 {int(floresta.classes_[1])}\n\n",
+        "/* Posição de cada feature do modelo em: " + ", ".join(FEATURES_PADRAO) + " */\n",
+        _array_c('uint8_t', 'MODELO_INDICE_FEATURE', [str(i) for i in indices_features], 16),
+        _array_c('double', 'MODELO_MEDIA', [_hex_double(v) for v in pipeline.mean_], 4),
+        _array_c('double', 'MODELO_ESCALA', [_hex_double(v) for v in pipeline.scale_], 4),
+        _array_c(tipo_raiz, 'MODELO_RAIZ', [str(int(v)) for v in floresta.raizes], 16),
+        "/* -1 indica folha */\n",
+        _array_c('int8_t', 'MODELO_FEATURE', [str(int(v)) for v in tabela_feature], 24),
+        _array_c('float', 'MODELO_LIMIAR', [_hex_float(v) for v in np.where(folha, 0, floresta.limiar)], 4),
+        "/* Filhos relativos à raiz da árvore; em folhas, ESQUERDA é o índice da folha */\n",
+        _array_c(tipo_no, 'MODELO_ESQUERDA', [str(int(v)) for v in tabela_esquerda], 16),
+        _array_c(tipo_no, 'MODELO_DIREITA', [str(int(v)) for v in tabela_direita], 16),
+        _array_c('double', 'MODELO_PROBABILIDADE', [_hex_double(v) for v in probabilidades.ravel()], 4),
+        """
+/*
+ * Decide se deve irrigar.
+ *
+ * hora: 0-23; dia_semana: 0 = segunda ... 6 = domingo (datetime.weekday do Python).
+ * prob_irrigar (opcional): recebe a probabilidade da classe 1.
+ * Retorna a classe prevista (1 = irrigar).
+ */
+static inline int prever(double umidade, double temperatura, double ph, int fosforo,
+                         int potassio, int hora, int dia_semana, double *prob_irrigar)
+{
+    double derivadas[9];
+    float x[MODELO_N_FEATURES];
+    double soma0 = 0.0, soma1 = 0.0;
+    int i, t;
+
+    derivadas[0] = umidade;
+    derivadas[1] = temperatura;
+    derivadas[2] = ph;
+    derivadas[3] = (double)fosforo;
+    derivadas[4] = (double)potassio;
+    derivadas[5] = (double)hora;
+    derivadas[6] = (double)dia_semana;
+    derivadas[7] = derivadas[0] / (derivadas[1] + 1.0);
+    derivadas[8] = derivadas[2] * (derivadas[3] + derivadas[4]);
+
+    for (i = 0; i < MODELO_N_FEATURES; i++) {
+        double v = derivadas[MODELO_INDICE_FEATURE[i]];
+        if (!isfinite(v)) v = 0.0;
+        x[i] = (float)((v - MODELO_MEDIA[i]) / MODELO_ESCALA[i]);
+    }
+
+    for (t = 0; t < MODELO_N_ARVORES; t++) {
+        uint32_t raiz = MODELO_RAIZ[t];
+        uint32_t no = raiz;
+        while (MODELO_FEATURE[no] >= 0) {
+            no = raiz + ((x[MODELO_FEATURE[no]] <= MODELO_LIMIAR[no])
+                         ? MODELO_ESQUERDA[no] : MODELO_DIREITA[no]);
+        }
+        soma0 += MODELO_PROBABILIDADE[2 * MODELO_ESQUERDA[no]];
+        soma1 += MODELO_PROBABILIDADE[2 * MODELO_ESQUERDA[no] + 1];
+    }
+    soma0 /= MODELO_N_ARVORES;
+    soma1 /= MODELO_N_ARVORES;
+
+    if (prob_irrigar) *prob_irrigar = soma1;
+    return (soma1 > soma0) ? MODELO_CLASSE_1 : MODELO_CLASSE_0;
+}
+
+#endif /* MODELO_IRRIGACAO_H */
+""",
+    ]
+    return ''.join(partes), tamanhos
+
+
+PROGRAMA_VERIFICACAO = r"""
+#define _POSIX_C_SOURCE 199309L
+#include <stdio.h>
+#include <time.h>
+#include "modelo_irrigacao.h"
+
+int main(void)
+{
+    double h, t, ph, prob;
+    int f, k, hora, dia, classe;
+    struct timespec inicio, fim;
+    double total_ns = 0.0;
+    long n = 0;
+
+    while (scanf("%lf %lf %lf %d %d %d %d", &h, &t, &ph, &f, &k, &hora, &dia) == 7) {
+        clock_gettime(CLOCK_MONOTONIC, &inicio);
+        classe = prever(h, t, ph, f, k, hora, dia, &prob);
+        clock_gettime(CLOCK_MONOTONIC, &fim);
+        total_ns += (fim.tv_sec - inicio.tv_sec) * 1e9 + (fim.tv_nsec - inicio.tv_nsec);
+        printf("%d %a\n", classe, prob);
+        n++;
+    }
+    fprintf(stderr, "%.1f\n", n ? total_ns / n : 0.0);
+    return 0;
+}
+"""
+
+
+def verificar_com_gcc(header, modelo, pipeline, entradas):
+    """
+    Compila o header com gcc, roda no conjunto de teste e compara com o Python.
+
+    Returns:
+        dict: Concordância de decisões e probabilidades, tamanho do código
+            compilado e tempo por predição no host
+    """
+    if shutil.which('gcc') is None:
+        print("gcc não encontrado; verificação ignorada")
+        return None
+
+    X = pipeline.transform(entradas)
+    esperado_prob = modelo.predict_proba(X)
+    esperado_classe = modelo.classes_[np.argmax(esperado_prob, axis=1)]
+
+    with tempfile.TemporaryDirectory() as pasta:
+        with open(os.path.join(pasta, 'modelo_irrigacao.h'), 'w') as f:
+            f.write(header)
+        with open(os.path.join(pasta, 'verificar.c'), 'w') as f:
+            f.write(PROGRAMA_VERIFICACAO)
+
+        # Sem fast-math/contração de FMA: a aritmética precisa seguir o IEEE 754 à risca
+        flags = ['-std=c99', '-O2', '-ffp-contract=off', '-fno-fast-math']
+        executavel = os.path.join(pasta, 'verificar')
+        subprocess.run(['gcc', *flags, '-o', executavel, os.path.join(pasta, 'verificar.c'), '-lm'],
+                       check=True)
+
+        # Tamanho do código e das tabelas compilados (x86-64, -Os) como referência
+        objeto = os.path.join(pasta, 'prever.o')
+        with open(os.path.join(pasta, 'prever.c'), 'w') as f:
+            f.write('#include "modelo_irrigacao.h"\n'
+                    'int prever_exportado(double a, double b, double c, int d, int e, int g, int h, double *p)'
+                    '{ return prever(a, b, c, d, e, g, h, p); }\n')
+        subprocess.run(['gcc', '-std=c99', '-Os', '-c', '-o', objeto, os.path.join(pasta, 'prever.c')],
+                       check=True)
+        tamanho_objeto = os.path.getsize(objeto)
+        saida_size = subprocess.run(['size', objeto], capture_output=True, text=True).stdout.split('\n')
+        texto, dados = (int(v) for v in saida_size[1].split()[:2]) if len(saida_size) > 1 else (None, None)
+
+        linhas_entrada = '\n'.join(
+            f"{float(r[0]).hex()} {float(r[1]).hex()} {float(r[2]).hex()} {int(r[3])} {int(r[4])} {int(r[5])} {int(r[6])}" for r in entradas
+        )
+        execucao = subprocess.run([executavel], input=linhas_entrada, capture_output=True,
+                                  text=True, check=True)
+
+    classes_c, probs_c = [], []
+    for linha in execucao.stdout.strip().split('\n'):
+        classe, prob = linha.split()
+        classes_c.append(int(classe))
+        probs_c.append(float.fromhex(prob))
+    classes_c, probs_c = np.array(classes_c), np.array(probs_c)
+
+    return {
+        'amostras': len(entradas),
+        'decisoes_iguais': int((classes_c == esperado_classe).sum()),
+        'probabilidades_identicas': int((probs_c == esperado_prob[:, 1]).sum()),
+        'bit_a_bit': bool(np.array_equal(classes_c, esperado_classe)
+                          and np.array_equal(probs_c, esperado_prob[:, 1])),
+        'host_ns_por_predicao': float(execucao.stderr.strip() or 0),
+        'objeto_bytes': tamanho_objeto,
+        'objeto_text': texto,
+        'objeto_data': dados,
+    }
+
+
+def estimar_ciclos(modelo, pipeline, entradas):
+    """
+    Estima ciclos por predição no ESP32 a partir da profundidade média percorrida.
+    """
+    floresta = FlorestaCompilada.compilar(modelo)
+    X = pipeline.transform(entradas)
+    nos_visitados = 0.0
+    for estimador in modelo.estimators_:
+        # decision_path conta o nó folha; comparações = nós no caminho - 1
+        nos_visitados += (estimador.decision_path(X.astype(np.float32)).sum(axis=1).mean() - 1)
+
+    n_features = len(pipeline.features)
+    ciclos = (nos_visitados * CICLOS_POR_NO
+              + floresta.n_arvores * 2 * CICLOS_SOMA_DOUBLE
+              + n_features * (CICLOS_SOMA_DOUBLE + CICLOS_DIVISAO_DOUBLE)
+              + 2 * CICLOS_DIVISAO_DOUBLE)
+    return {
+        'comparacoes_por_predicao': round(float(nos_visitados), 1),
+        'ciclos_estimados': int(ciclos),
+        'microssegundos_estimados_240mhz': round(ciclos / FREQUENCIA_ESP32_HZ * 1e6, 1),
+    }
+
+
+def exportar(caminho_modelo='modelo_irrigacao.pkl', destino='../esp32/modelo_irrigacao.h',
+             max_arvores=None, destilar=None, amostras_teste=5000):
+    """
+    Exporta o modelo para C, verifica com gcc e imprime o relatório.
+
+    Args:
+        max_arvores (int): Usa apenas as primeiras N árvores
+        destilar (tuple): (n_arvores, profundidade) de uma floresta aluna
+
+    Returns:
+        dict: Relatório da exportação
+    """
+    import joblib
+    from feature_pipeline import PreprocessadorIrrigacao
+
+    dados = joblib.load(caminho_modelo)
+    modelo = dados['modelo']
+    pipeline = dados.get('pipeline') or PreprocessadorIrrigacao.de_scaler(dados['scaler'], dados['features'])
+    relatorio = {'arvores_originais': len(modelo.estimators_)}
+
+    if destilar:
+        modelo, concordancia = destilar_floresta(modelo, pipeline, *destilar)
+        relatorio['destilacao_concordancia'] = round(concordancia, 4)
+        print(f"Floresta destilada: {destilar[0]} árvores, profundidade {destilar[1]} "
+              f"(concordância com o original: {concordancia:.1%})")
+    elif max_arvores:
+        modelo = reduzir_floresta(modelo, max_arvores)
+        print(f"Floresta reduzida para {len(modelo.estimators_)} árvores")
+
+    header, tamanhos = gerar_header(modelo, pipeline)
+    os.makedirs(os.path.dirname(os.path.abspath(destino)), exist_ok=True)
+    with open(destino, 'w') as f:
+        f.write(header)
+
+    entradas = gerar_entradas_teste(amostras_teste)
+    relatorio['tabelas_bytes'] = tamanhos
+    relatorio['verificacao'] = verificar_com_gcc(header, modelo, pipeline, entradas)
+    relatorio['custo_esp32'] = estimar_ciclos(modelo, pipeline, entradas)
+
+    print(f"\nHeader gerado: {destino}")
+    print(f"Árvores exportadas: {len(modelo.estimators_)}")
+    print(f"Tabelas na flash: {tamanhos['total'] / 1024:.1f} KB "
+          f"(limiares {tamanhos['limiar'] / 1024:.1f} KB, folhas {tamanhos['probabilidades'] / 1024:.1f} KB)")
+    verificacao = relatorio['verificacao']
+    if verificacao:
+        print(f"Verificação gcc: {verificacao['decisoes_iguais']}/{verificacao['amostras']} decisões iguais, "
+              f"{verificacao['probabilidades_identicas']}/{verificacao['amostras']} probabilidades idênticas "
+              f"-> {'BIT A BIT' if verificacao['bit_a_bit'] else 'DIVERGENTE'}")
+        print(f"Objeto compilado (x86-64, -Os): text {verificacao['objeto_text']} B, "
+              f"data {verificacao['objeto_data']} B")
+        print(f"Tempo no host: {verificacao['host_ns_por_predicao']:.0f} ns por predição")
+    custo = relatorio['custo_esp32']
+    print(f"Estimativa ESP32: {custo['comparacoes_por_predicao']} comparações, "
+          f"~{custo['ciclos_estimados']:,} ciclos (~{custo['microssegundos_estimados_240mhz']} µs a 240 MHz)")
+
+    return relatorio
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Exporta o modelo de irrigação como header C para o ESP32')
+    parser.add_argument('--modelo', default='modelo_irrigacao.pkl')
+    parser.add_argument('--saida', default=os.path.join('..', 'esp32', 'modelo_irrigacao.h'))
+    parser.add_argument('--arvores', type=int, help='Exporta só as primeiras N árvores')
+    parser.add_argument('--destilar', type=int, nargs=2, metavar=('ARVORES', 'PROFUNDIDADE'),
+                        help='Treina uma floresta menor que imita o modelo e exporta ela')
+    parser.add_argument('--amostras', type=int, default=5000, help='Tamanho do conjunto de verificação')
+    args = parser.parse_args()
+
+    exportar(args.modelo, args.saida, args.arvores, args.destilar, args.amostras)
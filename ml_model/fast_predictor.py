@@ -0,0 +1,101 @@
+"""
+Predição com partida rápida, para jobs que fazem uma decisão e terminam.
+
+Carrega do registro só o pipeline e os arrays da floresta compilada, então
+importa apenas NumPy e joblib: nada de pandas, scikit-learn ou requests. Se
+a versão não tiver esses arquivos (versão antiga ou modelo_irrigacao.pkl),
+carrega o modelo completo e compila a floresta na hora; só um modelo que não
+é floresta (motor boosting) é avaliado pelo scikit-learn, e nele a
+explicação por feature devolve erro.
+
+Os resultados têm o mesmo formato de SistemaIrrigacaoML.prever_irrigacao e
+prever_irrigacao_lote.
+"""
+import joblib
+import numpy as np
+
+from feature_pipeline import PreprocessadorIrrigacao, montar_entrada
+from forest_compiler import FlorestaCompilada
+from model_registry import RegistroModelos
+
+
+class PreditorLeve:
+    """
+    Predição com o modelo promovido, sem as dependências de treino.
+    """
+
+    def __init__(self, diretorio_registro='modelos', caminho_modelo='modelo_irrigacao.pkl'):
+        self.diretorio_registro = diretorio_registro
+        self.caminho_modelo = caminho_modelo
+        self.pipeline = None
+        self.features = None
+        self.floresta = None
+        # Só preenchido quando não há floresta compilada
+        self.modelo = None
+        self.versao_modelo = None
+
+    def carregar_modelo(self, versao=None):
+        try:
+            registro = RegistroModelos(self.diretorio_registro)
+            if versao or registro.versao_atual():
+                leve = registro.carregar_leve(versao)
+                if leve is not None:
+                    self.pipeline, self.features, self.floresta, self.versao_modelo = leve
+                    return True
+                dados, self.floresta, self.versao_modelo = registro.carregar(versao)
+            else:
+                dados = joblib.load(self.caminho_modelo)
+            self.features = dados['features']
+            self.pipeline = dados.get('pipeline') or PreprocessadorIrrigacao.de_scaler(dados['scaler'], self.features)
+            self.floresta = self.floresta or FlorestaCompilada.compilar(dados['modelo'])
+            self.modelo = None if self.floresta is not None else dados['modelo']
+            return True
+        except Exception as e:
+            print(f"Erro ao carregar modelo: {e}")
+            return False
+
+    def prever_irrigacao_lote(self, leituras, hora=None, dia_semana=None, explicar=False):
+        """
+        Mesmos argumentos e retorno de SistemaIrrigacaoML.prever_irrigacao_lote.
+        """
+        if self.pipeline is None and not self.carregar_modelo():
+            return None, "Modelo não treinado"
+        if explicar and self.floresta is None:
+            return None, "Explicação por feature disponível só para modelos de floresta"
+
+        entrada = montar_entrada(leituras, hora, dia_semana)
+        X_scaled = self.pipeline.transform(entrada)
+        if self.floresta is not None:
+            probabilidades = self.floresta.predict_proba(X_scaled)
+            classes = np.asarray(self.floresta.classes_)
+        else:
+            probabilidades = self.modelo.predict_proba(X_scaled)
+            classes = self.modelo.classes_
+
+        lote = {
+            'deve_irrigar': classes[np.argmax(probabilidades, axis=1)].astype(bool),
+            'probabilidade_irrigar': probabilidades[:, 1],
+            'confianca': probabilidades.max(axis=1),
+            'entrada': entrada
+        }
+        if explicar:
+            lote['vies'], lote['contribuicoes'] = self.floresta.contribuicoes(X_scaled)
+        return lote, None
+
+    def prever_irrigacao(self, humidity, temperature, ph, fosforo, potassio, hora_atual=None, explicar=False):
+        lote, erro = self.prever_irrigacao_lote([[humidity, temperature, ph, fosforo, potassio]],
+                                                hora=hora_atual, explicar=explicar)
+        if erro:
+            return None, erro
+
+        dados = dict(zip(self.features, self.pipeline.features_derivadas(lote['entrada'])[0].tolist()))
+        resultado = {
+            'deve_irrigar': bool(lote['deve_irrigar'][0]),
+            'probabilidade_irrigar': float(lote['probabilidade_irrigar'][0]),
+            'confianca': float(lote['confianca'][0]),
+            'dados_entrada': dados
+        }
+        if explicar:
+            resultado['vies'] = float(lote['vies'][0])
+            resultado['contribuicoes'] = dict(zip(self.features, lote['contribuicoes'][0].tolist()))
+        return resultado, None
@@ -0,0 +1,205 @@
+import warnings
+from datetime import datetime
+
+import numpy as np
+
+# Colunas de entrada do pipeline, na ordem esperada quando a entrada é um array
+COLUNAS_ENTRADA = ['HUMIDITY', 'TEMPERATURE', 'PH', 'FOSFORO_PRESENTE', 'POTASSIO_PRESENTE',
+                   'hora', 'dia_semana']
+
+# Todas as features que o pipeline sabe gerar, na ordem usada pelo modelo
+FEATURES_PADRAO = COLUNAS_ENTRADA + ['humidity_temp_ratio', 'ph_nutrients']
+
+
+def derivar_features(entrada):
+    """
+    Calcula as features derivadas para N leituras de uma vez.
+
+    Args:
+        entrada (ndarray): Matriz (N, 7) com as colunas de COLUNAS_ENTRADA
+
+    Returns:
+        ndarray: Matriz (N, 9) com as colunas de FEATURES_PADRAO
+    """
+    entrada = np.asarray(entrada)
+    saida = np.empty((entrada.shape[0], len(FEATURES_PADRAO)), dtype=np.float64)
+    # A cópia já converte para float64 (entrada float32 não precisa de cópia intermediária)
+    saida[:, :7] = entrada
+    # humidity_temp_ratio = HUMIDITY / (TEMPERATURE + 1)
+    np.divide(saida[:, 0], saida[:, 1] + 1, out=saida[:, 7])
+    # ph_nutrients = PH * (FOSFORO + POTASSIO)
+    np.multiply(saida[:, 2], saida[:, 3] + saida[:, 4], out=saida[:, 8])
+    return saida
+
+
+def montar_entrada(leituras, hora=None, dia_semana=None):
+    """
+    Converte leituras (DataFrame ou array (N, 5)/(N, 7)) na matriz (N, 7) do pipeline.
+
+    hora e dia_semana (valor ou array) completam a entrada quando ela não traz
+    essas colunas; o padrão é o momento atual.
+    """
+    agora = datetime.now()
+    hora = agora.hour if hora is None else hora
+    dia_semana = agora.weekday() if dia_semana is None else dia_semana
+
+    if hasattr(leituras, 'columns'):
+        df = leituras.rename(columns=lambda c: c.upper() if c.upper() in COLUNAS_ENTRADA else c)
+        entrada = np.empty((len(df), len(COLUNAS_ENTRADA)), dtype=np.float64)
+        for i, coluna in enumerate(COLUNAS_ENTRADA[:5]):
+            entrada[:, i] = df[coluna].to_numpy(dtype=np.float64)
+        entrada[:, 5] = df['hora'].to_numpy(dtype=np.float64) if 'hora' in df.columns else hora
+        entrada[:, 6] = df['dia_semana'].to_numpy(dtype=np.float64) if 'dia_semana' in df.columns else dia_semana
+        return entrada
+
+    leituras = np.atleast_2d(np.asarray(leituras, dtype=np.float64))
+    if leituras.shape[1] == len(COLUNAS_ENTRADA):
+        return leituras
+    entrada = np.empty((len(leituras), len(COLUNAS_ENTRADA)), dtype=np.float64)
+    entrada[:, :5] = leituras[:, :5]
+    entrada[:, 5] = hora
+    entrada[:, 6] = dia_semana
+    return entrada
+
+
+class PreprocessadorIrrigacao:
+    """
+    Pipeline de pré-processamento usado igualmente no treino, na predição
+    online e no analisador.
+
+    Recebe as leituras brutas (DataFrame com as colunas de COLUNAS_ENTRADA ou
+    array na mesma ordem), calcula as features derivadas, substitui valores
+    ausentes por 0 e padroniza (média 0, desvio 1), tudo em operações
+    vetorizadas do NumPy. Depende apenas do NumPy para transformar, então
+    pode ser carregado sem o scikit-learn.
+
+    Com preencher_ausentes=False os valores ausentes (e infinitos) seguem
+    como NaN, para modelos que tratam ausência nativamente.
+    """
+
+    # Padrão de classe: pipelines salvos antes da opção continuam preenchendo
+    preencher_ausentes = True
+
+    def __init__(self, features=None, preencher_ausentes=True):
+        """
+        Args:
+            features (list): Features usadas pelo modelo, em ordem
+                (subconjunto de FEATURES_PADRAO; padrão: todas)
+            preencher_ausentes (bool): Substitui NaN/infinito por 0
+        """
+        self.features = list(features or FEATURES_PADRAO)
+        self.preencher_ausentes = preencher_ausentes
+        self.indices_ = np.array([FEATURES_PADRAO.index(f) for f in self.features])
+        self.mean_ = None
+        self.scale_ = None
+        self.var_ = None
+        self.n_amostras_ = 0
+
+    @classmethod
+    def de_scaler(cls, scaler, features):
+        """
+        Cria o pipeline a partir de um StandardScaler já ajustado
+        (modelos salvos antes do pipeline existir).
+        """
+        pipeline = cls(features)
+        pipeline.mean_ = np.asarray(scaler.mean_, dtype=np.float64)
+        pipeline.scale_ = np.asarray(scaler.scale_, dtype=np.float64)
+        return pipeline
+
+    def _matriz_entrada(self, X):
+        # Converte DataFrame/array/lista de leituras em matriz (N, 7)
+        if hasattr(X, 'columns'):
+            n = len(X)
+            matriz = np.zeros((n, len(COLUNAS_ENTRADA)), dtype=np.float64)
+            for i, coluna in enumerate(COLUNAS_ENTRADA):
+                if coluna in X.columns:
+                    matriz[:, i] = X[coluna].to_numpy(dtype=np.float64, na_value=np.nan)
+                elif coluna in self.features:
+                    raise ValueError(f"Coluna {coluna} ausente na entrada")
+            return matriz
+
+        matriz = np.asarray(X)
+        if not np.issubdtype(matriz.dtype, np.floating):
+            matriz = matriz.astype(np.float64)
+        if matriz.ndim == 1:
+            matriz = matriz.reshape(1, -1)
+        if matriz.shape[1] != len(COLUNAS_ENTRADA):
+            raise ValueError(f"Entrada deve ter {len(COLUNAS_ENTRADA)} colunas: {', '.join(COLUNAS_ENTRADA)}")
+        return matriz
+
+    def features_derivadas(self, X):
+        """
+        Retorna as features do modelo sem padronização (equivale a preparar_dados).
+        """
+        derivadas = derivar_features(self._matriz_entrada(X))
+        if len(self.indices_) != derivadas.shape[1] or np.any(self.indices_ != np.arange(derivadas.shape[1])):
+            derivadas = derivadas[:, self.indices_]
+        if not self.preencher_ausentes:
+            derivadas[np.isinf(derivadas)] = np.nan
+            return derivadas
+        return np.nan_to_num(derivadas, nan=0.0, posinf=0.0, neginf=0.0)
+
+    def _media_variancia(self, derivadas):
+        if self.preencher_ausentes:
+            return derivadas.mean(axis=0), derivadas.var(axis=0)
+        # Estatísticas só dos valores presentes; coluna toda ausente fica com média 0
+        with np.errstate(invalid='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            media, variancia = np.nanmean(derivadas, axis=0), np.nanvar(derivadas, axis=0)
+        return np.nan_to_num(media), np.nan_to_num(variancia)
+
+    def fit(self, X, y=None):
+        derivadas = self.features_derivadas(X)
+        self.mean_, self.var_ = self._media_variancia(derivadas)
+        self.n_amostras_ = len(derivadas)
+        self._atualizar_escala()
+        return self
+
+    def partial_fit(self, X, y=None):
+        """
+        Atualiza média e variância com mais um lote, sem rever os anteriores
+        (combinação das estatísticas dos dois conjuntos, Chan et al.).
+        """
+        derivadas = self.features_derivadas(X)
+        n_lote = len(derivadas)
+        if n_lote == 0:
+            return self
+
+        media_lote, var_lote = self._media_variancia(derivadas)
+        n = self.n_amostras_
+        if n == 0:
+            self.mean_, self.var_ = media_lote, var_lote
+        else:
+            total = n + n_lote
+            delta = media_lote - self.mean_
+            self.mean_ = self.mean_ + delta * (n_lote / total)
+            self.var_ = (self.var_ * n + var_lote * n_lote + delta ** 2 * (n * n_lote / total)) / total
+        self.n_amostras_ = n + n_lote
+        self._atualizar_escala()
+        return self
+
+    def _atualizar_escala(self):
+        escala = np.sqrt(self.var_)
+        escala[escala == 0] = 1.0
+        self.scale_ = escala
+
+    def transform(self, X):
+        """
+        Transforma N leituras brutas na matriz padronizada que o modelo recebe.
+        """
+        if self.mean_ is None:
+            raise ValueError("Pipeline não ajustado. Execute fit() primeiro.")
+        derivadas = self.features_derivadas(X)
+        derivadas -= self.mean_
+        derivadas /= self.scale_
+        return derivadas
+
+    def fit_transform(self, X, y=None):
+        # Calcula as features derivadas uma vez só (fit + transform as calcularia duas)
+        derivadas = self.features_derivadas(X)
+        self.mean_, self.var_ = self._media_variancia(derivadas)
+        self.n_amostras_ = len(derivadas)
+        self._atualizar_escala()
+        derivadas -= self.mean_
+        derivadas /= self.scale_
+        return derivadas
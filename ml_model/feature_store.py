@@ -0,0 +1,236 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+from feature_pipeline import COLUNAS_ENTRADA
+
+
+def ler_matriz_parquet(caminho, colunas, tamanho_bloco=500000, dtype=np.float32, coluna_id=None):
+    """
+    Lê colunas de um arquivo ou pasta Parquet para uma única matriz NumPy,
+    bloco a bloco, sem passar por DataFrame.
+
+    A matriz final é alocada uma vez (o total de linhas vem dos metadados) e
+    cada lote do Parquet é copiado direto para a sua fatia, então o pico de
+    memória fica perto do tamanho da matriz.
+
+    Args:
+        caminho (str): Arquivo .parquet ou pasta particionada (hive)
+        colunas (list): Colunas, na ordem da matriz
+        tamanho_bloco (int): Linhas por lote lido
+        dtype: Tipo da matriz (float32 usa metade da memória do float64)
+        coluna_id (str): Se informada, remove linhas com id repetido
+
+    Returns:
+        ndarray: Matriz (N, len(colunas)); ausentes viram NaN
+    """
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(caminho, format='parquet', partitioning='hive')
+    total = dataset.count_rows()
+    matriz = np.empty((total, len(colunas)), dtype=dtype)
+    ids = np.empty(total, dtype=np.int64) if coluna_id else None
+    lidas = colunas + [coluna_id] if coluna_id else colunas
+
+    inicio = 0
+    for lote in dataset.to_batches(columns=lidas, batch_size=tamanho_bloco):
+        fim = inicio + lote.num_rows
+        for j, coluna in enumerate(colunas):
+            matriz[inicio:fim, j] = lote.column(j).to_numpy(zero_copy_only=False)
+        if coluna_id:
+            ids[inicio:fim] = lote.column(len(colunas)).to_numpy(zero_copy_only=False)
+        inicio = fim
+
+    if coluna_id:
+        _, primeiras = np.unique(ids, return_index=True)
+        if len(primeiras) < total:
+            matriz = matriz[np.sort(primeiras)]
+    return matriz
+
+
+class FeatureStoreLocal:
+    """
+    Armazena localmente, em Parquet particionado por mês, as leituras da API
+    já com as features derivadas de preparar_dados.
+
+    A primeira sincronização percorre todo o histórico página a página; as
+    seguintes baixam apenas os registros com id maior que o último visto.
+    O treinamento lê o histórico do disco com memory-map, sem depender do
+    limite de /dados/consulta.
+    """
+
+    def __init__(self, diretorio='feature_store', tamanho_pagina=5000):
+        """
+        Args:
+            diretorio (str): Pasta raiz das partições Parquet
+            tamanho_pagina (int): Registros por requisição à API
+        """
+        self.diretorio = diretorio
+        self.tamanho_pagina = tamanho_pagina
+        self.caminho_estado = os.path.join(diretorio, '_estado.json')
+        self.estado = {'ultimo_id': None, 'ultima_data_coleta': None, 'total_linhas': 0}
+
+        if os.path.exists(self.caminho_estado):
+            with open(self.caminho_estado) as f:
+                self.estado.update(json.load(f))
+
+    def _salvar_estado(self):
+        # Grava o estado de forma atômica (arquivo temporário + rename)
+        temporario = f"{self.caminho_estado}.tmp"
+        with open(temporario, 'w') as f:
+            json.dump(self.estado, f)
+        os.replace(temporario, self.caminho_estado)
+
+    def _gravar_particoes(self, df):
+        # Grava um bloco de linhas novas, um arquivo por partição mensal
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        meses = df['DATA_COLETA'].dt.strftime('%Y-%m')
+        for mes, parte in df.groupby(meses):
+            pasta = os.path.join(self.diretorio, f'ano_mes={mes}')
+            os.makedirs(pasta, exist_ok=True)
+            nome = f"parte-{int(parte['ID'].min())}-{int(parte['ID'].max())}.parquet"
+            temporario = os.path.join(pasta, f'_{nome}.tmp')
+            pq.write_table(pa.Table.from_pandas(parte, preserve_index=False), temporario)
+            os.replace(temporario, os.path.join(pasta, nome))
+
+    def sincronizar(self, sistema):
+        """
+        Baixa da API os registros novos e grava suas features no disco.
+
+        Args:
+            sistema (SistemaIrrigacaoML): Fornece o cliente HTTP e preparar_dados
+
+        Returns:
+            int: Número de linhas novas, ou None se a API falhar
+        """
+        os.makedirs(self.diretorio, exist_ok=True)
+        novas = 0
+
+        while True:
+            params = {'limite': self.tamanho_pagina, 'ordem': 'asc'}
+            if self.estado['ultimo_id'] is not None:
+                params['id_minimo'] = self.estado['ultimo_id']
+
+            resultado = sistema.cliente.consultar(**params)
+            if resultado is None:
+                return None
+            dados = resultado.get('dados', [])
+            if not dados:
+                break
+
+            df = pd.DataFrame(dados)
+            df['bomba_ligada'] = (df['BOMBA_STATUS'] == 'LIGADA').astype(int)
+            X, y, features = sistema.preparar_dados(df)
+
+            bloco = X.astype('float64')
+            bloco['bomba_ligada'] = y.astype('int8').values
+            bloco['ID'] = df['ID'].astype('int64').values
+            bloco['DATA_COLETA'] = df['DATA_COLETA'].values
+            # Sempre gravada (nula sem dispositivo) para o esquema das partições ser o mesmo
+            if 'DISPOSITIVO_ID' in df.columns:
+                dispositivos = df['DISPOSITIVO_ID']
+                if pd.api.types.is_float_dtype(dispositivos):
+                    # Ids numéricos numa página com ausentes chegam como float
+                    dispositivos = dispositivos.astype('Int64')
+                bloco['DISPOSITIVO_ID'] = dispositivos.astype('string').values
+            else:
+                bloco['DISPOSITIVO_ID'] = pd.array([None] * len(df), dtype='string')
+            self._gravar_particoes(bloco)
+
+            novas += len(bloco)
+            self.estado['ultimo_id'] = int(bloco['ID'].max())
+            self.estado['ultima_data_coleta'] = bloco['DATA_COLETA'].max().isoformat()
+            self.estado['total_linhas'] += len(bloco)
+            self.estado['features'] = features
+            self.estado['sincronizado_em'] = datetime.now().isoformat()
+            self._salvar_estado()
+
+            print(f"Feature store: +{len(bloco)} linhas (último id {self.estado['ultimo_id']})")
+            if len(dados) < self.tamanho_pagina:
+                break
+
+        return novas
+
+    def _esquema(self):
+        # União dos esquemas das partições: arquivos gravados antes de uma coluna
+        # nova (ex.: DISPOSITIVO_ID) são lidos com ela nula em vez de escondê-la
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        dataset = ds.dataset(self.diretorio, format='parquet', partitioning='hive')
+        return pa.unify_schemas([dataset.schema] + [f.physical_schema for f in dataset.get_fragments()],
+                                promote_options='permissive')
+
+    def carregar(self, colunas=None):
+        """
+        Lê todas as partições com memory-map.
+
+        Args:
+            colunas (list): Restringe a leitura a estas colunas (as que não
+                existem no esquema são ignoradas)
+
+        Returns:
+            DataFrame: Features, alvo, ID, DATA_COLETA e DISPOSITIVO_ID; None se estiver vazio
+        """
+        import pyarrow.parquet as pq
+
+        if not self.estado['total_linhas']:
+            return None
+
+        esquema = self._esquema()
+        if colunas is not None:
+            colunas = [c for c in colunas if c in esquema.names]
+        tabela = pq.read_table(self.diretorio, columns=colunas, memory_map=True,
+                               partitioning='hive', schema=esquema)
+        if 'ano_mes' in tabela.column_names:
+            tabela = tabela.drop(['ano_mes'])
+        df = tabela.to_pandas()
+
+        # Uma sincronização interrompida pode ter gravado a última página duas vezes
+        if 'ID' in df.columns:
+            df = df.drop_duplicates('ID')
+        return df
+
+    def matriz(self, colunas, tamanho_bloco=500000, dtype=np.float32):
+        """
+        Lê colunas de todo o histórico em blocos para uma matriz compacta
+        (treino de grandes volumes, sem montar DataFrame).
+
+        Returns:
+            ndarray: Matriz (N, len(colunas)), ou None se estiver vazio
+        """
+        if not self.estado['total_linhas']:
+            return None
+        return ler_matriz_parquet(self.diretorio, colunas, tamanho_bloco, dtype, coluna_id='ID')
+
+    def obter_treino(self, sistema, em_blocos=False):
+        """
+        Sincroniza o delta e devolve (X, y, features) de todo o histórico.
+
+        Args:
+            em_blocos (bool): X como matriz float32 com as COLUNAS_ENTRADA,
+                lida em blocos (grandes volumes), em vez de DataFrame
+
+        Returns:
+            tuple: (X, y, features) ou (None, None, None) sem dados
+        """
+        if self.sincronizar(sistema) is None:
+            print("Falha na sincronização; usando apenas os dados locais")
+
+        features = self.estado.get('features')
+        if em_blocos and features and all(c in features for c in COLUNAS_ENTRADA):
+            dados = self.matriz(COLUNAS_ENTRADA + ['bomba_ligada'])
+            if dados is None:
+                return None, None, None
+            return dados[:, :-1], pd.Series(dados[:, -1].astype('int8')), features
+
+        df = self.carregar()
+        if df is None or not self.estado.get('features'):
+            return None, None, None
+
+        features = self.estado['features']
+        return df[features], df['bomba_ligada'], features
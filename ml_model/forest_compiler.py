@@ -0,0 +1,279 @@
+import os
+import json
+import time
+import numpy as np
+
+ARRAYS_FLORESTA = ('feature', 'limiar', 'filhos', 'probabilidades', 'raizes')
+
+
+class FlorestaCompilada:
+    """
+    Versão "achatada" de um RandomForestClassifier treinado.
+
+    Todas as árvores ficam em arrays contíguos (feature, limiar, filho
+    esquerdo, filho direito e probabilidades por nó). A avaliação percorre
+    todas as árvores para todas as amostras de uma vez, um nível por
+    iteração, sem a validação de entrada e o despacho por estimador do
+    scikit-learn. O resultado é idêntico ao de predict_proba.
+    """
+
+    def __init__(self, feature, limiar, filhos, probabilidades, raizes, profundidade_maxima, classes):
+        self.feature = feature
+        self.limiar = limiar
+        self.filhos = filhos
+        self.probabilidades = probabilidades
+        self.raizes = raizes
+        self.profundidade_maxima = profundidade_maxima
+        self.classes_ = classes
+        self.n_arvores = len(raizes)
+
+    @classmethod
+    def compilar(cls, modelo):
+        """
+        Exporta a floresta para arrays planos.
+
+        Args:
+            modelo: RandomForestClassifier (ou ExtraTreesClassifier) treinado
+
+        Returns:
+            FlorestaCompilada, ou None se o modelo não for uma floresta de árvores
+        """
+        estimadores = getattr(modelo, 'estimators_', None)
+        if not estimadores or not hasattr(estimadores[0], 'tree_') or getattr(modelo, 'n_outputs_', 1) != 1:
+            return None
+
+        import sklearn
+        normalizar = tuple(int(p) for p in sklearn.__version__.split('.')[:2]) < (1, 4)
+
+        features, limiares, filhos, probabilidades, raizes = [], [], [], [], []
+        deslocamento = 0
+        profundidade_maxima = 0
+
+        for estimador in estimadores:
+            arvore = estimador.tree_
+            n = arvore.node_count
+            folha = arvore.children_left == -1
+            indices = np.arange(n)
+
+            # Folhas apontam para si mesmas: a travessia pode rodar um número fixo de níveis
+            features.append(np.where(folha, 0, arvore.feature))
+            limiares.append(np.where(folha, np.inf, arvore.threshold))
+            # filhos[2*no] = esquerdo, filhos[2*no + 1] = direito
+            filhos.append(np.column_stack([
+                np.where(folha, indices, arvore.children_left),
+                np.where(folha, indices, arvore.children_right)
+            ]).ravel() + deslocamento)
+
+            # Mesmo cálculo de DecisionTreeClassifier.predict_proba: a partir do
+            # scikit-learn 1.4 value já guarda frações; antes era preciso normalizar
+            valores = arvore.value[:, 0, :].astype(np.float64)
+            if normalizar:
+                normalizador = valores.sum(axis=1)[:, np.newaxis]
+                normalizador[normalizador == 0.0] = 1.0
+                valores = valores / normalizador
+            probabilidades.append(valores)
+
+            raizes.append(deslocamento)
+            deslocamento += n
+            profundidade_maxima = max(profundidade_maxima, arvore.max_depth)
+
+        # O scikit-learn compara X em float32 com limiares em float64. Para x float32,
+        # x <= t equivale a x <= (maior float32 <= t), então os limiares podem ser
+        # guardados em float32 sem mudar nenhuma decisão.
+        limiar64 = np.concatenate(limiares)
+        limiar32 = limiar64.astype(np.float32)
+        acima = limiar32.astype(np.float64) > limiar64
+        limiar32[acima] = np.nextafter(limiar32[acima], np.float32(-np.inf))
+
+        return cls(
+            np.concatenate(features).astype(np.int32),
+            limiar32,
+            np.concatenate(filhos).astype(np.int32),
+            np.ascontiguousarray(np.concatenate(probabilidades)),
+            np.array(raizes, dtype=np.int32),
+            profundidade_maxima,
+            np.asarray(modelo.classes_)
+        )
+
+    def salvar(self, diretorio):
+        """
+        Grava cada array em um .npy (podem ser carregados com mmap).
+        """
+        os.makedirs(diretorio, exist_ok=True)
+        for nome in ARRAYS_FLORESTA:
+            np.save(os.path.join(diretorio, f'{nome}.npy'), getattr(self, nome))
+        with open(os.path.join(diretorio, 'floresta.json'), 'w') as f:
+            json.dump({'profundidade_maxima': int(self.profundidade_maxima),
+                       'classes': np.asarray(self.classes_).tolist()}, f)
+
+    @classmethod
+    def carregar(cls, diretorio, mmap_mode='r'):
+        """
+        Lê uma floresta gravada por salvar(). Com mmap_mode='r' os arrays ficam
+        no page cache do sistema e são compartilhados entre processos.
+        """
+        with open(os.path.join(diretorio, 'floresta.json')) as f:
+            info = json.load(f)
+        arrays = [np.load(os.path.join(diretorio, f'{nome}.npy'), mmap_mode=mmap_mode)
+                  for nome in ARRAYS_FLORESTA]
+        return cls(*arrays, info['profundidade_maxima'], np.array(info['classes']))
+
+    def aplicar(self, X):
+        """
+        Retorna o índice global da folha atingida em cada árvore.
+
+        Returns:
+            ndarray: Matriz (N, n_arvores) de índices de nó
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n, n_features = X.shape
+        X_plano = X.ravel()
+        base_linha = (np.arange(n, dtype=np.int32) * n_features)[:, np.newaxis]
+        nos = np.broadcast_to(self.raizes, (n, self.n_arvores)).copy()
+
+        for _ in range(self.profundidade_maxima):
+            posicao = np.take(self.feature, nos)
+            posicao += base_linha
+            vai_direita = np.take(X_plano, posicao) > np.take(self.limiar, nos)
+            nos *= 2
+            nos += vai_direita
+            nos = np.take(self.filhos, nos)
+        return nos
+
+    def predict_proba(self, X, tamanho_bloco=2000):
+        """
+        Probabilidades por classe, iguais às de RandomForestClassifier.predict_proba.
+        """
+        X = np.asarray(X)
+        saida = np.empty((X.shape[0], len(self.classes_)), dtype=np.float64)
+
+        for inicio in range(0, X.shape[0], tamanho_bloco):
+            folhas = self.aplicar(X[inicio:inicio + tamanho_bloco])
+            # cumsum soma árvore a árvore, na mesma ordem do scikit-learn
+            por_arvore = np.take(self.probabilidades, folhas, axis=0)
+            soma = np.cumsum(por_arvore, axis=1)[:, -1]
+            soma /= self.n_arvores
+            saida[inicio:inicio + tamanho_bloco] = soma
+
+        return saida
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def _contribuicoes_arvores(self, X, raizes, coluna):
+        # Soma, nas árvores de `raizes`, a variação da probabilidade em cada
+        # divisão do caminho, atribuída à feature que decidiu a divisão
+        n, n_features = X.shape
+        X_plano = X.ravel()
+        base_linha = (np.arange(n, dtype=np.int32) * n_features)[:, np.newaxis]
+        base_saida = (np.arange(n, dtype=np.int64) * n_features)[:, np.newaxis]
+        valor_no = self.probabilidades[:, coluna]
+        nos = np.broadcast_to(raizes, (n, len(raizes))).copy()
+        soma = np.zeros(n * n_features)
+
+        for _ in range(self.profundidade_maxima):
+            feature = np.take(self.feature, nos)
+            vai_direita = np.take(X_plano, feature + base_linha) > np.take(self.limiar, nos)
+            filhos = np.take(self.filhos, nos * 2 + vai_direita)
+            # Em folhas o nó aponta para si mesmo e a variação é zero
+            soma += np.bincount((feature + base_saida).ravel(),
+                                weights=(np.take(valor_no, filhos) - np.take(valor_no, nos)).ravel(),
+                                minlength=n * n_features)
+            nos = filhos
+        return soma.reshape(n, n_features)
+
+    def contribuicoes(self, X, classe=1, tamanho_bloco=2000, workers=None):
+        """
+        Contribuição exata de cada feature para a probabilidade de `classe`
+        em cada amostra (atribuição pelos caminhos das árvores).
+
+        Em cada nó do caminho até a folha, a diferença entre a probabilidade
+        do filho seguido e a do nó é somada à feature da divisão. A média
+        sobre as árvores mais o viés (média das raízes) reproduz
+        predict_proba: vies + contribuicoes.sum(axis=1) == probabilidade.
+
+        Args:
+            X: Entradas já transformadas pelo pipeline (N, n_features)
+            tamanho_bloco (int): Amostras por bloco
+            workers (int): Threads, cada uma com um grupo de árvores (padrão: núcleos)
+
+        Returns:
+            tuple: (viés (N,), contribuições (N, n_features))
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        coluna = list(self.classes_).index(classe)
+        grupos = np.array_split(self.raizes, min(workers or os.cpu_count() or 1, self.n_arvores))
+        saida = np.empty(X.shape, dtype=np.float64)
+
+        with ThreadPoolExecutor(len(grupos)) as executor:
+            for inicio in range(0, X.shape[0], tamanho_bloco):
+                bloco = X[inicio:inicio + tamanho_bloco]
+                partes = executor.map(lambda raizes: self._contribuicoes_arvores(bloco, raizes, coluna), grupos)
+                saida[inicio:inicio + tamanho_bloco] = sum(partes) / self.n_arvores
+
+        vies = float(np.take(self.probabilidades[:, coluna], self.raizes).mean())
+        return np.full(X.shape[0], vies), saida
+
+
+def benchmark(modelo, tamanhos=(1, 100, 100000), repeticoes=5, semente=0):
+    """
+    Compara scikit-learn e a floresta compilada em lotes de vários tamanhos.
+
+    Args:
+        modelo: RandomForestClassifier treinado
+        tamanhos (tuple): Números de linhas por lote
+        repeticoes (int): Execuções por medição (usa a melhor)
+
+    Returns:
+        list: Um dict por tamanho com tempos (ms), aceleração e se os resultados batem
+    """
+    compilada = FlorestaCompilada.compilar(modelo)
+    if compilada is None:
+        print("Modelo não é uma floresta de árvores")
+        return []
+
+    rng = np.random.default_rng(semente)
+    resultados = []
+
+    print(f"{'Linhas':>8} | {'sklearn (ms)':>12} | {'compilada (ms)':>14} | {'Aceleração':>10} | Idêntico")
+    print("-" * 66)
+    for tamanho in tamanhos:
+        # Entradas no espaço padronizado, como saem do pipeline
+        X = rng.normal(size=(tamanho, modelo.n_features_in_))
+        reps = repeticoes if tamanho < 10000 else max(1, repeticoes // 2)
+
+        tempos_sklearn, tempos_compilada = [], []
+        for _ in range(reps):
+            inicio = time.perf_counter()
+            esperado = modelo.predict_proba(X)
+            tempos_sklearn.append(time.perf_counter() - inicio)
+
+            inicio = time.perf_counter()
+            obtido = compilada.predict_proba(X)
+            tempos_compilada.append(time.perf_counter() - inicio)
+
+        identico = bool(np.array_equal(esperado, obtido))
+        t_sklearn, t_compilada = min(tempos_sklearn) * 1000, min(tempos_compilada) * 1000
+        resultados.append({
+            'linhas': tamanho,
+            'sklearn_ms': round(t_sklearn, 3),
+            'compilada_ms': round(t_compilada, 3),
+            'aceleracao': round(t_sklearn / t_compilada, 2) if t_compilada > 0 else None,
+            'identico': identico
+        })
+        print(f"{tamanho:>8} | {t_sklearn:>12.3f} | {t_compilada:>14.3f} | "
+              f"{t_sklearn / t_compilada:>9.1f}x | {'SIM' if identico else 'NÃO'}")
+
+    return resultados
+
+
+if __name__ == "__main__":
+    import joblib
+    import sys
+
+    caminho = sys.argv[1] if len(sys.argv) > 1 else 'modelo_irrigacao.pkl'
+    dados = joblib.load(caminho)
+    print(f"Benchmark da floresta compilada ({caminho})")
+    benchmark(dados['modelo'])
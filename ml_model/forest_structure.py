@@ -0,0 +1,210 @@
+"""
+Estatísticas de estrutura de toda a floresta, calculadas direto dos arrays
+de nós das árvores (children_left/right, feature, threshold,
+n_node_samples, value) concatenados, com operações vetorizadas por nível.
+
+Servem para decidir podas de tamanho e latência: distribuição de
+profundidade e folhas, profundidade média percorrida por amostra,
+histograma dos limiares de cada feature, folhas com poucas amostras e
+subárvores redundantes: todas as folhas com o mesmo vetor de probabilidades,
+que podem virar uma folha sem mudar o predict_proba da árvore (e, portanto,
+o voto suave da floresta). Folhas que só concordam na classe majoritária não
+contam, porque juntá-las muda as probabilidades médias da floresta.
+
+Uso:
+    python forest_structure.py [caminho_modelo.pkl]
+"""
+import sys
+import time
+
+import numpy as np
+
+# Folhas com menos amostras que isto são candidatas a min_samples_leaf maior
+MINIMO_AMOSTRAS_FOLHA = 5
+
+
+def _concatenar_arvores(modelo):
+    # Arrays de nós de todas as árvores com índices globais (filho -1 = folha)
+    esquerdo, direito, feature, limiar, amostras, probabilidade, inicios = [], [], [], [], [], [], []
+    deslocamento = 0
+    for estimador in modelo.estimators_:
+        arvore = estimador.tree_
+        folha = arvore.children_left == -1
+        esquerdo.append(np.where(folha, -1, arvore.children_left + deslocamento))
+        direito.append(np.where(folha, -1, arvore.children_right + deslocamento))
+        feature.append(arvore.feature)
+        limiar.append(arvore.threshold)
+        amostras.append(arvore.n_node_samples)
+        valor = arvore.value[:, 0, :]
+        probabilidade.append(valor / np.maximum(valor.sum(axis=1, keepdims=True), 1e-12))
+        inicios.append(deslocamento)
+        deslocamento += arvore.node_count
+    return (np.concatenate(esquerdo), np.concatenate(direito), np.concatenate(feature),
+            np.concatenate(limiar), np.concatenate(amostras), np.concatenate(probabilidade),
+            np.array(inicios, dtype=np.int64))
+
+
+def _codigo_linhas(matriz, casas=12):
+    # Mesmo código para linhas iguais (arredondadas para absorver ruído de ponto
+    # flutuante); uma coluna por vez, bem mais rápido que np.unique(axis=0)
+    quantizada = np.round(matriz * 10 ** casas).astype(np.int64)
+    codigo = np.zeros(len(quantizada), dtype=np.int64)
+    for k in range(quantizada.shape[1]):
+        _, coluna = np.unique(quantizada[:, k], return_inverse=True)
+        _, codigo = np.unique(codigo * (coluna.max() + 1) + coluna, return_inverse=True)
+    return codigo
+
+
+def _resumo(valores):
+    valores = np.asarray(valores, dtype=np.float64)
+    minimo, p10, mediana, p90, maximo = np.percentile(valores, [0, 10, 50, 90, 100])
+    return {'minimo': float(minimo), 'p10': float(p10), 'mediana': float(mediana),
+            'p90': float(p90), 'maximo': float(maximo), 'media': float(valores.mean())}
+
+
+def estatisticas_floresta(modelo, features=None, pipeline=None, bins=10):
+    """
+    Estrutura de todas as árvores de uma floresta do scikit-learn.
+
+    Args:
+        modelo: RandomForestClassifier (ou ExtraTreesClassifier) treinado
+        features (list): Nomes das features, na ordem do modelo
+        pipeline: PreprocessadorIrrigacao (ou StandardScaler) que converte os
+            limiares para as unidades originais (sem ele, ficam padronizados)
+        bins (int): Faixas do histograma de limiares de cada feature
+
+    Returns:
+        dict: Profundidades, folhas, amostras por folha, limiares por feature
+            e subárvores redundantes; None se o modelo não for uma floresta
+    """
+    if not getattr(modelo, 'estimators_', None) or not hasattr(modelo.estimators_[0], 'tree_'):
+        return None
+
+    inicio = time.perf_counter()
+    esquerdo, direito, feature, limiar, amostras, probabilidade, inicios = _concatenar_arvores(modelo)
+    total_nos = len(esquerdo)
+    n_arvores = len(inicios)
+    arvore_do_no = np.repeat(np.arange(n_arvores), np.diff(np.append(inicios, total_nos)))
+    folha = esquerdo == -1
+    internos = np.flatnonzero(~folha)
+
+    # Profundidade de cada nó, um nível por iteração (todas as árvores juntas)
+    profundidade = np.zeros(total_nos, dtype=np.int32)
+    nivel = inicios
+    d = 0
+    while len(nivel):
+        profundidade[nivel] = d
+        nivel = nivel[~folha[nivel]]
+        nivel = np.concatenate([esquerdo[nivel], direito[nivel]])
+        d += 1
+
+    # Vetor de probabilidades de cada folha como um código inteiro
+    codigo = _codigo_linhas(probabilidade[folha])
+
+    # Tamanho da subárvore e vetor único das folhas (-1 se diferem), das folhas para a raiz
+    tamanho = np.ones(total_nos, dtype=np.int64)
+    vetor_unico = np.full(total_nos, -1, dtype=np.int64)
+    vetor_unico[folha] = codigo
+    por_profundidade = internos[np.argsort(-profundidade[internos], kind='stable')]
+    limites = np.flatnonzero(np.diff(profundidade[por_profundidade])) + 1
+    for nos in np.split(por_profundidade, limites):
+        e, r = esquerdo[nos], direito[nos]
+        tamanho[nos] = 1 + tamanho[e] + tamanho[r]
+        vetor_unico[nos] = np.where(vetor_unico[e] == vetor_unico[r], vetor_unico[e], -1)
+
+    # Subárvores redundantes maximais: nó interno com vetor único cujo pai não tem
+    pai = np.full(total_nos, -1, dtype=np.int64)
+    pai[esquerdo[internos]] = internos
+    pai[direito[internos]] = internos
+    redundante = ~folha & (vetor_unico >= 0)
+    maximal = redundante & ((pai == -1) | ~redundante[np.maximum(pai, 0)])
+    nos_podaveis = int((tamanho[maximal] - 1).sum())
+
+    # Por árvore
+    folhas_por_arvore = np.bincount(arvore_do_no[folha], minlength=n_arvores)
+    profundidade_maxima = np.maximum.reduceat(profundidade, inicios)
+    # Profundidade média percorrida, ponderada pelas amostras de treino de cada folha
+    peso = np.bincount(arvore_do_no[folha], weights=amostras[folha], minlength=n_arvores)
+    percorrida = np.bincount(arvore_do_no[folha], weights=amostras[folha] * profundidade[folha],
+                             minlength=n_arvores) / np.maximum(peso, 1)
+
+    # Limiares por feature, nas unidades originais quando o pipeline está disponível
+    n_features = int(feature[internos].max()) + 1 if len(internos) else 0
+    nomes = list(features) if features is not None else [f'x{j}' for j in range(n_features)]
+    valores_limiar = limiar[internos].astype(np.float64)
+    feature_split = feature[internos]
+    if pipeline is not None and getattr(pipeline, 'scale_', None) is not None:
+        valores_limiar = valores_limiar * np.asarray(pipeline.scale_)[feature_split] + \
+            np.asarray(pipeline.mean_)[feature_split]
+    contagem_splits = np.bincount(feature_split, minlength=len(nomes))
+    limiares = {}
+    for j, nome in enumerate(nomes):
+        valores = valores_limiar[feature_split == j]
+        if len(valores) == 0:
+            limiares[nome] = {'splits': 0}
+            continue
+        contagens, bordas = np.histogram(valores, bins=bins)
+        limiares[nome] = dict(_resumo(valores), splits=int(len(valores)),
+                              histograma=contagens.tolist(), bordas=bordas.round(4).tolist())
+
+    amostras_folha = amostras[folha]
+    return {
+        'arvores': n_arvores,
+        'nos': int(total_nos),
+        'folhas': int(folha.sum()),
+        'profundidade_maxima': _resumo(profundidade_maxima),
+        'profundidade_percorrida': _resumo(percorrida),
+        'folhas_por_arvore': _resumo(folhas_por_arvore),
+        'distribuicao_profundidade_folhas': np.bincount(profundidade[folha]).tolist(),
+        'amostras_por_folha': _resumo(amostras_folha),
+        'folhas_poucas_amostras': int((amostras_folha < MINIMO_AMOSTRAS_FOLHA).sum()),
+        'splits_por_feature': dict(zip(nomes, contagem_splits.tolist())),
+        'limiares': limiares,
+        'subarvores_redundantes': int(maximal.sum()),
+        'nos_podaveis': nos_podaveis,
+        'fracao_podavel': nos_podaveis / total_nos,
+        'tempo_ms': round((time.perf_counter() - inicio) * 1000, 2),
+    }
+
+
+def imprimir_estatisticas(estatisticas):
+    """
+    Resumo legível de estatisticas_floresta.
+    """
+    e = estatisticas
+    print(f"Floresta: {e['arvores']} árvores, {e['nos']} nós, {e['folhas']} folhas "
+          f"(calculado em {e['tempo_ms']:.1f} ms)")
+    for chave, rotulo in [('profundidade_maxima', 'Profundidade máxima'),
+                          ('profundidade_percorrida', 'Profundidade percorrida (média por amostra)'),
+                          ('folhas_por_arvore', 'Folhas por árvore'),
+                          ('amostras_por_folha', 'Amostras de treino por folha')]:
+        r = e[chave]
+        print(f"{rotulo}: mín {r['minimo']:g} | p10 {r['p10']:.1f} | mediana {r['mediana']:.1f} | "
+              f"p90 {r['p90']:.1f} | máx {r['maximo']:g}")
+    print(f"Folhas por profundidade: {e['distribuicao_profundidade_folhas']}")
+    print(f"Folhas com menos de {MINIMO_AMOSTRAS_FOLHA} amostras: {e['folhas_poucas_amostras']} "
+          f"({e['folhas_poucas_amostras'] / e['folhas']:.1%})")
+
+    print("\nLimiares de divisão por feature (p10 | mediana | p90):")
+    for nome, r in sorted(e['limiares'].items(), key=lambda item: -item[1]['splits']):
+        if r['splits']:
+            print(f"  {nome:20} {r['splits']:6d} splits | {r['p10']:9.3f} | {r['mediana']:9.3f} | {r['p90']:9.3f}")
+        else:
+            print(f"  {nome:20} {0:6d} splits")
+
+    print(f"\nSubárvores redundantes (folhas com probabilidades idênticas): {e['subarvores_redundantes']}")
+    print(f"Nós removíveis sem mudar o predict_proba da floresta: {e['nos_podaveis']} "
+          f"({e['fracao_podavel']:.1%} da floresta)")
+
+
+if __name__ == "__main__":
+    import joblib
+
+    caminho = sys.argv[1] if len(sys.argv) > 1 else 'modelo_irrigacao.pkl'
+    dados = joblib.load(caminho)
+    estatisticas = estatisticas_floresta(dados['modelo'], dados['features'],
+                                         dados.get('pipeline') or dados.get('scaler'))
+    if estatisticas is None:
+        print("Modelo não é uma floresta de árvores")
+    else:
+        imprimir_estatisticas(estatisticas)
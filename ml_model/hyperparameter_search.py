@@ -0,0 +1,230 @@
+"""
+Busca de hiperparâmetros da Random Forest com validação cruzada.
+
+Usa successive halving: muitas configurações começam com poucas árvores,
+só a melhor fração (1/fator) passa para a rodada seguinte com `fator` vezes
+mais árvores. Cada (configuração, fold) é um ajuste independente executado
+em um pool de processos. Antes de cada rodada o tempo é estimado a partir da
+anterior; se não couber no orçamento, a busca para e usa o melhor resultado
+já medido. Ajustes ainda em execução quando o prazo vence são encerrados
+(Pool.terminate), para não ocupar os núcleos depois da busca.
+
+O modelo final usa arvores_max árvores; quando a busca parou antes da
+última rodada, a nota foi medida com menos árvores e o resultado registra
+isso em n_arvores_avaliadas e arvores_validadas. O orçamento cobre só a
+busca: o ajuste final com arvores_max árvores roda depois, fora dele.
+"""
+import os
+import time
+import queue
+import random
+import itertools
+import multiprocessing
+
+import numpy as np
+
+ESPACO_PADRAO = {
+    'max_depth': [6, 10, 14, None],
+    'min_samples_leaf': [1, 2, 5, 10],
+    'max_features': ['sqrt', 0.5, None],
+    'class_weight': ['balanced', None],
+}
+
+# Configuração usada por treinar_modelo sem busca; sempre entra na primeira rodada
+CONFIGURACAO_PADRAO = {'max_depth': 10, 'min_samples_leaf': 1, 'max_features': 'sqrt',
+                       'class_weight': 'balanced'}
+
+# Dados de treino de cada processo do pool (enviados uma vez, no initializer)
+_dados_worker = {}
+
+
+def _iniciar_worker(X, y, folds, features):
+    _dados_worker.update(X=X, y=y, folds=folds, features=features)
+
+
+def _avaliar(configuracao, fold, n_arvores, semente):
+    # Ajusta pipeline + floresta em um fold e devolve (acurácia, segundos de ajuste)
+    from sklearn.ensemble import RandomForestClassifier
+    from feature_pipeline import PreprocessadorIrrigacao
+
+    X, y = _dados_worker['X'], _dados_worker['y']
+    treino, validacao = _dados_worker['folds'][fold]
+
+    inicio = time.perf_counter()
+    pipeline = PreprocessadorIrrigacao(_dados_worker['features'])
+    X_treino = pipeline.fit_transform(X.iloc[treino])
+    modelo = RandomForestClassifier(n_estimators=n_arvores, random_state=semente, n_jobs=1,
+                                    **configuracao)
+    modelo.fit(X_treino, y[treino])
+    tempo_ajuste = time.perf_counter() - inicio
+
+    acuracia = float((modelo.predict(pipeline.transform(X.iloc[validacao])) == y[validacao]).mean())
+    return acuracia, tempo_ajuste
+
+
+class BuscaHiperparametros:
+    """
+    Successive halving com orçamento de tempo sobre um pool de processos.
+    """
+
+    def __init__(self, espaco=None, n_folds=3, orcamento_s=60, fator=3, arvores_min=20,
+                 arvores_max=200, n_candidatos=27, workers=None, semente=42):
+        """
+        Args:
+            espaco (dict): Valores possíveis de cada hiperparâmetro
+            n_folds (int): Folds da validação cruzada estratificada
+            orcamento_s (float): Tempo máximo (segundos) da busca; não inclui
+                o ajuste final do modelo
+            fator (int): Fração mantida (1/fator) e multiplicador de árvores por rodada
+            arvores_min (int): Árvores na primeira rodada
+            arvores_max (int): Árvores na última rodada (e no modelo final)
+            n_candidatos (int): Configurações sorteadas para a primeira rodada
+            workers (int): Processos do pool (padrão: todos os núcleos)
+        """
+        self.espaco = espaco or ESPACO_PADRAO
+        self.n_folds = n_folds
+        self.orcamento_s = orcamento_s
+        self.fator = fator
+        self.arvores_min = arvores_min
+        self.arvores_max = arvores_max
+        self.n_candidatos = n_candidatos
+        self.workers = workers or os.cpu_count() or 1
+        self.semente = semente
+
+    def _candidatos(self):
+        nomes = list(self.espaco)
+        todas = [dict(zip(nomes, valores)) for valores in itertools.product(*self.espaco.values())]
+        random.Random(self.semente).shuffle(todas)
+        candidatos = [CONFIGURACAO_PADRAO] if all(CONFIGURACAO_PADRAO.get(n) in self.espaco[n] for n in nomes) else []
+        candidatos += [c for c in todas if c != CONFIGURACAO_PADRAO]
+        return candidatos[:self.n_candidatos]
+
+    def _rodar_rodada(self, pool, candidatos, n_arvores, prazo):
+        # Executa todos os (candidato, fold); para de esperar se o prazo vencer
+        # (o que sobrar é descartado pelo terminate do pool em executar)
+        resultados = queue.SimpleQueue()
+        for i, candidato in enumerate(candidatos):
+            for fold in range(self.n_folds):
+                pool.apply_async(_avaliar, (candidato, fold, n_arvores, self.semente),
+                                 callback=lambda r, i=i, fold=fold: resultados.put((i, fold, r)),
+                                 error_callback=lambda e: resultados.put((None, None, e)))
+        notas = [[None] * self.n_folds for _ in candidatos]
+        tempos = [[None] * self.n_folds for _ in candidatos]
+
+        for _ in range(len(candidatos) * self.n_folds):
+            restante = prazo - time.perf_counter()
+            if restante <= 0:
+                break
+            try:
+                i, fold, resultado = resultados.get(timeout=restante)
+            except queue.Empty:
+                break
+            if i is None:
+                raise resultado
+            notas[i][fold], tempos[i][fold] = resultado
+
+        completos = all(None not in n for n in notas)
+        return notas, tempos, completos
+
+    def executar(self, X, y, features):
+        """
+        Roda a busca.
+
+        Args:
+            X (DataFrame): Dados de treino (colunas de preparar_dados)
+            y: Alvo (0/1)
+            features (list): Features do modelo
+
+        Returns:
+            dict: Melhor configuração, notas por fold, tempos de ajuste e resumo das rodadas
+        """
+        from sklearn.model_selection import StratifiedKFold
+
+        y = np.asarray(y)
+        folds = list(StratifiedKFold(self.n_folds, shuffle=True, random_state=self.semente)
+                     .split(np.zeros(len(y)), y))
+
+        inicio = time.perf_counter()
+        prazo = inicio + self.orcamento_s
+        candidatos = self._candidatos()
+        n_arvores = self.arvores_min
+        rodadas = []
+        melhor = None
+
+        print(f"Busca de hiperparâmetros: {len(candidatos)} configurações, {self.n_folds} folds, "
+              f"{self.workers} processos, orçamento {self.orcamento_s:.0f}s")
+
+        pool = multiprocessing.Pool(self.workers, initializer=_iniciar_worker,
+                                    initargs=(X.reset_index(drop=True), y, folds, features))
+        try:
+            while candidatos:
+                inicio_rodada = time.perf_counter()
+                notas, tempos, completos = self._rodar_rodada(pool, candidatos, n_arvores, prazo)
+                duracao = time.perf_counter() - inicio_rodada
+
+                # Só entram no ranking configurações com todos os folds avaliados
+                avaliados = [(float(np.mean(n)), i) for i, n in enumerate(notas) if None not in n]
+                if not avaliados:
+                    print(f"Rodada com {n_arvores} árvores não terminou dentro do orçamento")
+                    break
+                avaliados.sort(key=lambda a: -a[0])
+                if not completos and melhor is not None:
+                    # Rodada cortada pelo prazo: o ranking parcial não substitui o anterior
+                    print(f"Rodada com {n_arvores} árvores interrompida pelo orçamento "
+                          f"({len(avaliados)}/{len(candidatos)} configurações avaliadas)")
+                    break
+
+                rodadas.append({
+                    'n_arvores': n_arvores,
+                    'candidatos': len(candidatos),
+                    'avaliados': len(avaliados),
+                    'segundos': round(duracao, 2),
+                    'melhor_nota': round(avaliados[0][0], 4)
+                })
+                i = avaliados[0][1]
+                melhor = {
+                    'configuracao': candidatos[i],
+                    'n_arvores_avaliadas': n_arvores,
+                    'nota_media': avaliados[0][0],
+                    'notas_folds': notas[i],
+                    'tempos_ajuste_s': [round(t, 4) for t in tempos[i]],
+                }
+                print(f"  {n_arvores:>4} árvores | {len(candidatos):>3} configs | "
+                      f"melhor {avaliados[0][0]:.4f} | {duracao:.1f}s")
+
+                if not completos or len(avaliados) == 1 or n_arvores >= self.arvores_max:
+                    break
+
+                proximos = max(1, len(avaliados) // self.fator)
+                proximas_arvores = min(self.arvores_max, n_arvores * self.fator)
+                # Custo cresce com árvores e cai com candidatos
+                estimativa = duracao * (proximos / len(candidatos)) * (proximas_arvores / n_arvores)
+                if time.perf_counter() + estimativa > prazo:
+                    print(f"  Próxima rodada (~{estimativa:.1f}s) não cabe no orçamento; parando")
+                    break
+
+                candidatos = [candidatos[i] for _, i in avaliados[:proximos]]
+                n_arvores = proximas_arvores
+        finally:
+            # Após uma rodada completa os workers estão ociosos; após uma cortada
+            # pelo prazo, terminate encerra também os ajustes ainda em execução
+            pool.terminate()
+            pool.join()
+
+        if melhor is None:
+            return None
+
+        validadas = melhor['n_arvores_avaliadas'] >= self.arvores_max
+        if not validadas:
+            print(f"  Nota medida com {melhor['n_arvores_avaliadas']} árvores; o modelo final usa "
+                  f"{self.arvores_max} (não validado com esse número)")
+        melhor.update({
+            'n_arvores': self.arvores_max,
+            'arvores_validadas': validadas,
+            'rodadas': rodadas,
+            'n_folds': self.n_folds,
+            'workers': self.workers,
+            'orcamento_s': self.orcamento_s,
+            'tempo_total_s': round(time.perf_counter() - inicio, 2),
+        })
+        return melhor
@@ -0,0 +1,359 @@
+"""
+Linha de comando única do sistema de irrigação ML.
+
+As bibliotecas pesadas (pandas, scikit-learn, requests) só são importadas
+pelo comando que precisa delas: `--help` e `prever` partem em uma fração
+do tempo dos scripts antigos. `prever` usa o PreditorLeve (pipeline +
+floresta compilada, só NumPy); `prever --completo` usa o SistemaIrrigacaoML.
+
+Uso:
+    python irrigation_cli.py treinar [--motor boosting] [--buscar 120]
+    python irrigation_cli.py prever 45.5 25.3 6.8 1 0 [--hora 14] [--json] [--dispositivo 3]
+    python irrigation_cli.py dispositivos [--minimo 300] [--workers 4] [--motor boosting]
+    python irrigation_cli.py otimizar [--fosforo 1 --potassio 0] [--horas 72] [--dispositivo 3]
+    python irrigation_cli.py deriva [--retreinar] [--json] [--sem-sincronizar]
+    python irrigation_cli.py analisar [--versao <versao>] [--sem-cache]
+    python irrigation_cli.py completo
+    python irrigation_cli.py partida [--repeticoes 5]
+
+Com --tempo, o tempo de importações, carregamento do modelo e execução é
+mostrado no stderr ao final; `partida` mede a partida a frio de cada modo
+em processos novos.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from contextlib import contextmanager
+
+INICIO = time.perf_counter()
+
+
+def _segundos_desde_inicio_processo():
+    # Tempo desde a criação do processo (Linux), incluindo a partida do interpretador
+    try:
+        with open('/proc/self/stat') as f:
+            campos = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return uptime - int(campos[19]) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Cronometro:
+    """
+    Acumula o tempo de cada fase de um comando.
+    """
+
+    def __init__(self):
+        self.fases = {}
+
+    @contextmanager
+    def fase(self, nome):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.fases[nome] = self.fases.get(nome, 0.0) + time.perf_counter() - inicio
+
+    def relatorio(self):
+        partes = [f"{nome} {segundos:.3f} s" for nome, segundos in self.fases.items()]
+        partes.append(f"CLI {time.perf_counter() - INICIO:.3f} s")
+        processo = _segundos_desde_inicio_processo()
+        if processo is not None:
+            partes.append(f"processo {processo:.2f} s")
+        return "Tempo: " + ", ".join(partes)
+
+
+def comando_treinar(args, cronometro):
+    with cronometro.fase('importações'):
+        from ml_irrigation_system import SistemaIrrigacaoML
+    with cronometro.fase('execução'):
+        sistema = SistemaIrrigacaoML(args.api)
+        if args.buscar is not None:
+            ok = sistema.treinar_modelo(buscar_hiperparametros=True, orcamento_busca=args.buscar, motor=args.motor)
+        else:
+            ok = sistema.treinar_modelo(motor=args.motor)
+    return 0 if ok else 1
+
+
+def comando_prever(args, cronometro):
+    if args.dispositivo is not None:
+        return _prever_dispositivo(args, cronometro)
+    with cronometro.fase('importações'):
+        if args.completo:
+            from ml_irrigation_system import SistemaIrrigacaoML
+            preditor = SistemaIrrigacaoML()
+        else:
+            from fast_predictor import PreditorLeve
+            preditor = PreditorLeve()
+    with cronometro.fase('carregamento'):
+        carregado = preditor.carregar_modelo(args.versao)
+    if not carregado:
+        return 1
+
+    with cronometro.fase('execução'):
+        resultado, erro = preditor.prever_irrigacao(args.umidade, args.temperatura, args.ph,
+                                                    args.fosforo, args.potassio, hora_atual=args.hora,
+                                                    explicar=args.explicar)
+    if erro:
+        print(f"Erro: {erro}")
+        return 1
+
+    if args.json:
+        print(json.dumps(dict(resultado, versao_modelo=preditor.versao_modelo)))
+    else:
+        print(f"Deve irrigar: {'SIM' if resultado['deve_irrigar'] else 'NÃO'}")
+        print(f"Probabilidade: {resultado['probabilidade_irrigar']:.3f}")
+        print(f"Confiança: {resultado['confianca']:.3f}")
+        if 'contribuicoes' in resultado:
+            print(f"Contribuições (base {resultado['vies']:.3f}):")
+            for feature, valor in sorted(resultado['contribuicoes'].items(), key=lambda item: -abs(item[1])):
+                print(f"  {feature:20} {valor:+.3f}")
+    return 0
+
+
+def _prever_dispositivo(args, cronometro):
+    # Modelo próprio do dispositivo, ou o global se ele não tiver um
+    with cronometro.fase('importações'):
+        from device_models import PoolModelosDispositivo
+    with cronometro.fase('execução'):
+        lote, erro = PoolModelosDispositivo().prever_irrigacao_lote(
+            args.dispositivo, [[args.umidade, args.temperatura, args.ph, args.fosforo, args.potassio]],
+            hora=args.hora)
+    if erro:
+        print(f"Erro: {erro}")
+        return 1
+
+    resultado = {'deve_irrigar': bool(lote['deve_irrigar'][0]),
+                 'probabilidade_irrigar': float(lote['probabilidade_irrigar'][0]),
+                 'confianca': float(lote['confianca'][0])}
+    if args.json:
+        print(json.dumps(dict(resultado, modelo=lote['modelo'])))
+    else:
+        print(f"Modelo: {lote['modelo']}")
+        print(f"Deve irrigar: {'SIM' if resultado['deve_irrigar'] else 'NÃO'}")
+        print(f"Probabilidade: {resultado['probabilidade_irrigar']:.3f}")
+        print(f"Confiança: {resultado['confianca']:.3f}")
+    return 0
+
+
+def comando_dispositivos(args, cronometro):
+    with cronometro.fase('importações'):
+        from device_models import treinar_dispositivos
+        from ml_irrigation_system import SistemaIrrigacaoML
+    with cronometro.fase('execução'):
+        resultados = treinar_dispositivos(SistemaIrrigacaoML(args.api), minimo_registros=args.minimo,
+                                          workers=args.workers, motor=args.motor)
+    return 0 if all(r['ok'] for r in resultados) else 1
+
+
+def comando_otimizar(args, cronometro):
+    with cronometro.fase('importações'):
+        from ml_irrigation_system import SistemaIrrigacaoML
+    sistema = SistemaIrrigacaoML(args.api)
+    with cronometro.fase('carregamento'):
+        carregado = sistema.carregar_modelo()
+    if not carregado:
+        return 1
+
+    with cronometro.fase('execução'):
+        if args.sincronizar:
+            from feature_store import FeatureStoreLocal
+            if FeatureStoreLocal(sistema.diretorio_feature_store).sincronizar(sistema) is None:
+                print("Falha na sincronização; prevendo com o histórico local")
+        horarios = sistema.otimizar_horarios_irrigacao(fosforo=args.fosforo, potassio=args.potassio,
+                                                       horas=args.horas, dispositivo_id=args.dispositivo)
+    for horario in horarios[:args.top]:
+        status = "IRRIGAR" if horario['deve_irrigar'] else "OK"
+        quando = f"{horario['hora']:02d}:00"
+        if 'data_hora' in horario:
+            quando = f"{horario['data_hora'][:10]} {quando}"
+        print(f"- {quando} - {status} - Prob: {horario['probabilidade']:.3f} - "
+              f"Conf: {horario['confianca']:.3f} - {horario['condicoes']}")
+    return 0
+
+
+def comando_deriva(args, cronometro):
+    with cronometro.fase('importações'):
+        from ml_irrigation_system import SistemaIrrigacaoML
+        from drift_monitor import MonitorDeriva, imprimir_relatorio
+        from feature_pipeline import COLUNAS_ENTRADA
+        from feature_store import FeatureStoreLocal
+    sistema = SistemaIrrigacaoML(args.api)
+    with cronometro.fase('carregamento'):
+        carregado = sistema.carregar_modelo()
+    if not carregado:
+        return 1
+    if not sistema.perfil_treino:
+        print("Modelo sem perfil de treino (treinado antes do monitor de deriva); treine novamente")
+        return 1
+
+    with cronometro.fase('execução'):
+        store = FeatureStoreLocal(sistema.diretorio_feature_store)
+        if not args.sem_sincronizar and store.sincronizar(sistema) is None:
+            print("Falha na sincronização; usando o histórico local")
+        # As contagens continuam de uma execução para a outra, por versão do modelo
+        caminho = os.path.join(sistema.diretorio_registro, 'deriva', f"{sistema.versao_modelo or 'modelo'}.json")
+        monitor = MonitorDeriva.restaurar(sistema.perfil_treino, caminho, meia_vida=args.meia_vida)
+        novas = store.carregar(COLUNAS_ENTRADA + ['ID'])
+        if novas is not None and monitor.ultimo_id is not None:
+            novas = novas[novas['ID'] > monitor.ultimo_id]
+        if novas is not None and len(novas):
+            monitor.atualizar(novas.sort_values('ID'), ultimo_id=novas['ID'].max())
+            monitor.salvar(caminho)
+        relatorio = monitor.relatorio()
+
+    if args.json:
+        print(json.dumps(dict(relatorio, versao_modelo=sistema.versao_modelo), ensure_ascii=False))
+    else:
+        imprimir_relatorio(relatorio)
+    if relatorio['recomendar_retreino'] and args.retreinar:
+        print("\nRetreinando o modelo com o histórico atualizado...")
+        return 0 if sistema.treinar_modelo() else 1
+    return 0
+
+
+def comando_analisar(args, cronometro):
+    with cronometro.fase('importações'):
+        from model_analyzer import AnalisadorModeloIrrigacao
+    with cronometro.fase('execução'):
+        AnalisadorModeloIrrigacao(versao=args.versao).relatorio_completo(usar_cache=not args.sem_cache)
+    return 0
+
+
+def comando_completo(args, cronometro):
+    with cronometro.fase('importações'):
+        from ml_irrigation_system import teste_completo
+    with cronometro.fase('execução'):
+        teste_completo()
+    return 0
+
+
+def medir_partida(repeticoes=5):
+    """
+    Mede a partida a frio (processo novo até o fim) de cada modo.
+
+    Returns:
+        list: Um dict por modo com as durações mínima e mediana em segundos
+    """
+    import statistics
+
+    script = os.path.abspath(__file__)
+    exemplo = ['45.5', '25.3', '6.8', '1', '0', '--hora', '14']
+    modos = [
+        ('python vazio', ['-c', 'pass']),
+        ('--help', [script, '--help']),
+        ('prever (leve)', [script, 'prever'] + exemplo),
+        ('prever --completo', [script, 'prever', '--completo'] + exemplo),
+    ]
+
+    resultados = []
+    print(f"{'Modo':<20} | {'Mínimo (s)':>10} | {'Mediana (s)':>11}")
+    print("-" * 48)
+    for nome, argumentos in modos:
+        duracoes = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            processo = subprocess.run([sys.executable] + argumentos, stdout=subprocess.DEVNULL,
+                                      stderr=subprocess.DEVNULL)
+            duracoes.append(time.perf_counter() - inicio)
+        resultado = {'modo': nome, 'minimo_s': round(min(duracoes), 3),
+                     'mediana_s': round(statistics.median(duracoes), 3), 'codigo_saida': processo.returncode}
+        resultados.append(resultado)
+        falha = "" if processo.returncode == 0 else f"  (saiu com código {processo.returncode})"
+        print(f"{nome:<20} | {resultado['minimo_s']:>10.3f} | {resultado['mediana_s']:>11.3f}{falha}")
+    return resultados
+
+
+def comando_partida(args, cronometro):
+    medir_partida(args.repeticoes)
+    return 0
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(description="Sistema de irrigação inteligente (ML)")
+    parser.add_argument('--tempo', action='store_true', help="Mostra o tempo de cada fase no stderr")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    treinar = comandos.add_parser('treinar', help="Treina e registra um novo modelo")
+    treinar.add_argument('--motor', choices=('floresta', 'boosting'), default=None)
+    treinar.add_argument('--buscar', type=float, default=None, metavar='SEGUNDOS',
+                         help="Busca de hiperparâmetros com este orçamento antes do treino")
+    treinar.add_argument('--api', default='http://localhost:5000')
+    treinar.set_defaults(funcao=comando_treinar)
+
+    prever = comandos.add_parser('prever', help="Decide a irrigação para uma leitura")
+    prever.add_argument('umidade', type=float)
+    prever.add_argument('temperatura', type=float)
+    prever.add_argument('ph', type=float)
+    prever.add_argument('fosforo', type=int, choices=(0, 1))
+    prever.add_argument('potassio', type=int, choices=(0, 1))
+    prever.add_argument('--hora', type=int, default=None, help="Hora do dia (padrão: agora)")
+    prever.add_argument('--versao', default=None, help="Versão do registro (padrão: a promovida)")
+    prever.add_argument('--json', action='store_true', help="Saída em JSON")
+    prever.add_argument('--completo', action='store_true',
+                        help="Usa o SistemaIrrigacaoML em vez do caminho leve")
+    prever.add_argument('--explicar', action='store_true',
+                        help="Mostra a contribuição de cada feature para a decisão")
+    prever.add_argument('--dispositivo', default=None,
+                        help="Usa o modelo deste dispositivo (o global se ele não tiver um)")
+    prever.set_defaults(funcao=comando_prever)
+
+    dispositivos = comandos.add_parser('dispositivos', help="Treina em paralelo os modelos por dispositivo")
+    dispositivos.add_argument('--minimo', type=int, default=300,
+                              help="Leituras mínimas para o dispositivo ter modelo próprio")
+    dispositivos.add_argument('--workers', type=int, default=None)
+    dispositivos.add_argument('--motor', choices=('floresta', 'boosting'), default=None)
+    dispositivos.add_argument('--api', default='http://localhost:5000')
+    dispositivos.set_defaults(funcao=comando_dispositivos)
+
+    otimizar = comandos.add_parser('otimizar', help="Melhores horários de irrigação nas próximas horas")
+    otimizar.add_argument('--fosforo', type=int, choices=(0, 1), default=1)
+    otimizar.add_argument('--potassio', type=int, choices=(0, 1), default=1)
+    otimizar.add_argument('--top', type=int, default=5)
+    otimizar.add_argument('--horas', type=int, default=24, help="Horizonte da previsão de condições")
+    otimizar.add_argument('--dispositivo', default=None, help="Prevê com o histórico deste dispositivo")
+    otimizar.add_argument('--sincronizar', action='store_true',
+                          help="Baixa as leituras novas da API para a feature store antes de prever")
+    otimizar.add_argument('--api', default='http://localhost:5000')
+    otimizar.set_defaults(funcao=comando_otimizar)
+
+    deriva = comandos.add_parser('deriva', help="Deriva das leituras novas em relação aos dados de treino")
+    deriva.add_argument('--retreinar', action='store_true', help="Retreina se a deriva recomendar")
+    deriva.add_argument('--json', action='store_true', help="Saída em JSON")
+    deriva.add_argument('--sem-sincronizar', action='store_true',
+                        help="Usa só o histórico local, sem baixar as leituras novas da API")
+    deriva.add_argument('--meia-vida', type=float, default=5000,
+                        help="Leituras após as quais o peso de uma leitura cai pela metade")
+    deriva.add_argument('--api', default='http://localhost:5000')
+    deriva.set_defaults(funcao=comando_deriva)
+
+    analisar = comandos.add_parser('analisar', help="Relatório completo do modelo")
+    analisar.add_argument('--versao', default=None)
+    analisar.add_argument('--sem-cache', action='store_true', help="Refaz o relatório mesmo sem mudanças no modelo")
+    analisar.set_defaults(funcao=comando_analisar)
+
+    completo = comandos.add_parser('completo', help="Teste completo (carrega ou treina, prevê e otimiza)")
+    completo.set_defaults(funcao=comando_completo)
+
+    partida = comandos.add_parser('partida', help="Mede a partida a frio de cada modo")
+    partida.add_argument('--repeticoes', type=int, default=5)
+    partida.set_defaults(funcao=comando_partida)
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    cronometro = Cronometro()
+    codigo = args.funcao(args, cronometro)
+    if args.tempo:
+        print(cronometro.relatorio(), file=sys.stderr)
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main())
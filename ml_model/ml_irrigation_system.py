@@ -1,27 +1,58 @@
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import classification_report, accuracy_score
-import requests
 import joblib
+import os
+import sys
+import time
 from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
 
+# Acima deste número de linhas o predict_proba do scikit-learn (Cython) é mais
+# rápido que a floresta compilada; abaixo, a compilada evita o overhead por chamada
+LIMITE_LOTE_COMPILADO = 20000
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+from feature_pipeline import PreprocessadorIrrigacao, montar_entrada
+from forest_compiler import FlorestaCompilada
+from model_registry import RegistroModelos
+from model_engines import MOTORES, PARAMETROS_PADRAO, criar_modelo, criar_pipeline, importancias_features, motor_do_modelo
+from drift_monitor import calcular_perfil_treino
+
 class SistemaIrrigacaoML:
     def __init__(self, api_url='http://localhost:5000'):
         self.api_url = api_url
+        self._cliente = None
         self.modelo = None
-        self.scaler = None
+        self.pipeline = None
+        self.floresta_compilada = None
         self.historico_acuracia = []
-        
+        self.diretorio_feature_store = 'feature_store'
+        self.caminho_modelo = 'modelo_irrigacao.pkl'
+        self.diretorio_registro = 'modelos'
+        self.versao_modelo = None
+        self.metadados_treino = {}
+        # Distribuição de cada feature no treino (referência do monitor de deriva)
+        self.perfil_treino = None
+        # 'floresta' (Random Forest) ou 'boosting' (gradient boosting por histogramas)
+        self.motor = 'floresta'
+        # CachePredicoes opcional (ver ativar_cache)
+        self.cache_predicoes = None
+        # PrevisorCondicoes criado no primeiro uso (ver prever_condicoes)
+        self.previsor_condicoes = None
+        
+    @property
+    def cliente(self):
+        # Criado no primeiro uso: predição e análise não precisam do requests
+        if self._cliente is None:
+            from api_client import ClienteAPIIrrigacao
+            self._cliente = ClienteAPIIrrigacao(self.api_url)
+        return self._cliente
+    
     def obter_dados_api(self, limite=5000):
         # Obtém dados da API p treinamento
         try:
-            response = requests.get(f'{self.api_url}/dados/consulta', 
-                                  params={'limite': limite})
+            response = self.cliente.get('/dados/consulta', params={'limite': limite})
             
             if response.status_code == 200:
                 dados = response.json()['dados']
@@ -52,27 +83,64 @@ class SistemaIrrigacaoML:
             df['dia_semana'] = df['DATA_COLETA'].dt.dayofweek
             features.extend(['hora', 'dia_semana'])
         
-        # Features de interação
-        df['humidity_temp_ratio'] = df['HUMIDITY'] / (df['TEMPERATURE'] + 1)
-        df['ph_nutrients'] = df['PH'] * (df['FOSFORO_PRESENTE'] + df['POTASSIO_PRESENTE'])
+        # Features de interação (mesmo cálculo vetorizado usado na predição)
         features.extend(['humidity_temp_ratio', 'ph_nutrients'])
         
-        X = df[features].fillna(0)
+        # Ausentes seguem como NaN: o pipeline de cada motor decide como tratá-los
+        X = pd.DataFrame(
+            PreprocessadorIrrigacao(features, preencher_ausentes=False).features_derivadas(df),
+            columns=features, index=df.index
+        )
         y = df['bomba_ligada']
         
         return X, y, features
     
-    def treinar_modelo(self):
-        # TREina o ML
+    def obter_dados_treino(self, usar_feature_store=True, em_blocos=False):
+        # Retorna (X, y, features) para treino, pela feature store local ou direto da API
+        # em_blocos: X vem da feature store como matriz float32 (N, 7), lida em blocos
+        if usar_feature_store:
+            try:
+                from feature_store import FeatureStoreLocal
+                print("Sincronizando feature store local...")
+                X, y, features = FeatureStoreLocal(self.diretorio_feature_store).obter_treino(self, em_blocos)
+                if X is not None:
+                    return X, y, features
+            except ImportError as e:
+                print(f"Feature store indisponível ({e}); usando a API diretamente")
+        
         print("Obtendo dados da API...")
         df = self.obter_dados_api()
+        if df is None:
+            return None, None, None
+        return self.preparar_dados(df)
+    
+    def treinar_modelo(self, usar_feature_store=True, buscar_hiperparametros=False, orcamento_busca=60,
+                       motor=None, dados=None):
+        # TREina o ML
+        # buscar_hiperparametros: validação cruzada com successive halving em todos os
+        # núcleos, limitada a orcamento_busca segundos, antes do ajuste final
+        # (o ajuste final, com todas as árvores, roda depois e não entra no orçamento)
+        # motor: 'floresta' ou 'boosting' (padrão: self.motor)
+        # dados: DataFrame já carregado (formato de /dados/consulta com bomba_ligada),
+        # usado no lugar da feature store/API (ex.: treino por dispositivo)
+        # Um modelo online carregado do registro não é treinado de novo como online
+        self.motor = motor or (self.motor if self.motor in MOTORES else 'floresta')
+        if self.motor not in MOTORES:
+            print(f"Motor desconhecido: {self.motor} (opções: {', '.join(MOTORES)})")
+            return False
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import classification_report, accuracy_score
+        if dados is not None:
+            X, y, features = self.preparar_dados(dados)
+        else:
+            X, y, features = self.obter_dados_treino(usar_feature_store, em_blocos=self.motor == 'boosting')
         
-        if df is None or len(df) < 50:
+        if X is None or len(X) < 50:
             print("Dados insuficientes para treinamento (mínimo 50 registros)")
             return False
         
-        print(f"Preparando {len(df)} registros para treinamento...")
-        X, y, self.features = self.preparar_dados(df)
+        print(f"Preparando {len(X)} registros para treinamento...")
+        self.features = features
         distribuicao = y.value_counts()
         print(f"Distribuição das classes: {distribuicao.to_dict()}")
         if len(distribuicao) < 2:
@@ -84,21 +152,46 @@ class SistemaIrrigacaoML:
             X, y, test_size=0.2, random_state=42, stratify=y
         )
         
-        # Normalização
-        self.scaler = StandardScaler()
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
+        # Pré-processamento (features derivadas + normalização)
+        self.pipeline = criar_pipeline(self.motor, self.features)
+        X_train_scaled = self.pipeline.fit_transform(X_train)
+        X_test_scaled = self.pipeline.transform(X_test)
+        
+        # Perfil das features de treino, salvo com o modelo para o monitor de deriva
+        self.perfil_treino = calcular_perfil_treino(X_train, self.features)
+        if dados is None and usar_feature_store and os.path.exists(
+                os.path.join(self.diretorio_feature_store, '_estado.json')):
+            # Leituras com id maior que este chegaram depois do treino
+            from feature_store import FeatureStoreLocal
+            self.perfil_treino['ultimo_id'] = FeatureStoreLocal(self.diretorio_feature_store).estado.get('ultimo_id')
+        
+        parametros = {}
+        self.metadados_treino = {'motor': self.motor}
+        if buscar_hiperparametros and self.motor != 'floresta':
+            print("Busca de hiperparâmetros disponível apenas para o motor floresta; usando os padrões")
+        elif buscar_hiperparametros:
+            from hyperparameter_search import BuscaHiperparametros
+            busca = BuscaHiperparametros(orcamento_s=orcamento_busca).executar(X_train, y_train, self.features)
+            if busca:
+                parametros = dict(busca['configuracao'], n_estimators=busca['n_arvores'], n_jobs=-1)
+                self.metadados_treino['busca_hiperparametros'] = busca
+                print(f"Melhor configuração: {busca['configuracao']} "
+                      f"(acurácia CV {busca['nota_media']:.3f})")
         
         # Treinamento do modelo
-        print("Treinando modelo Random Forest...")
-        self.modelo = RandomForestClassifier(
-            n_estimators=100,
-            max_depth=10,
-            random_state=42,
-            class_weight='balanced'
-        )
+        if self.motor == 'boosting':
+            print("Treinando modelo de gradient boosting (histogramas)...")
+        else:
+            print("Treinando modelo Random Forest...")
+        self.modelo = criar_modelo(self.motor, parametros)
         
+        inicio = time.perf_counter()
         self.modelo.fit(X_train_scaled, y_train)
+        self.metadados_treino['parametros'] = {k: v for k, v in dict(PARAMETROS_PADRAO[self.motor], **parametros).items()
+                                               if k != 'n_jobs'}
+        self.metadados_treino['tempo_ajuste_s'] = round(time.perf_counter() - inicio, 3)
+        self.metadados_treino['linhas_treino'] = len(X_train)
+        self.floresta_compilada = FlorestaCompilada.compilar(self.modelo)
         
         # Avaliação
         y_pred = self.modelo.predict(X_test_scaled)
@@ -112,7 +205,7 @@ class SistemaIrrigacaoML:
         # Importância das features
         importancias = pd.DataFrame({
             'feature': self.features,
-            'importancia': self.modelo.feature_importances_
+            'importancia': importancias_features(self.modelo)
         }).sort_values('importancia', ascending=False)
         
         print("\nImportância das features:")
@@ -123,49 +216,169 @@ class SistemaIrrigacaoML:
         
         return True
     
-    def prever_irrigacao(self, humidity, temperature, ph, fosforo, potassio, hora_atual=None):
-        """Faz predição de necessidade de irrigação"""
+    def prever_irrigacao_lote(self, leituras, hora=None, dia_semana=None, explicar=False):
+        """
+        Faz a predição para N leituras com uma única chamada ao modelo.
+        
+        Args:
+            leituras: DataFrame com HUMIDITY, TEMPERATURE, PH, FOSFORO_PRESENTE e
+                POTASSIO_PRESENTE (opcionalmente hora e dia_semana), ou array
+                (N, 5) / (N, 7) nessa ordem
+            hora: Hora (valor ou array) usada quando a entrada não traz a coluna
+            dia_semana: Dia da semana usado quando a entrada não traz a coluna
+            explicar: Inclui vies e contribuicoes (N, features) de cada feature
+                para a probabilidade de irrigar (só Random Forest; nos demais devolve erro)
+        
+        Returns:
+            tuple: (dict com arrays deve_irrigar, probabilidade_irrigar,
+                confianca e entrada; mensagem de erro ou None)
+        """
         if self.modelo is None:
             if not self.carregar_modelo():
                 return None, "Modelo não treinado"
+        if explicar and self.floresta_compilada is None:
+            return None, f"Explicação por feature disponível só para modelos de floresta (motor {self.motor})"
         
-        # Prepara dados de entrada
-        if hora_atual is None:
-            hora_atual = datetime.now().hour
+        entrada = montar_entrada(leituras, hora, dia_semana)
+        cache = self.cache_predicoes
+        if cache is not None and len(entrada) <= cache.max_lote:
+            lote = self._prever_com_cache(entrada, cache)
+        else:
+            lote = self._avaliar_modelo(entrada)
+        if explicar:
+            lote['vies'], lote['contribuicoes'] = self.explicar_lote(lote['entrada'])
+        return lote, None
+    
+    def explicar_lote(self, entrada):
+        """
+        Contribuição de cada feature para a probabilidade de irrigar, pelos
+        caminhos das árvores (ver FlorestaCompilada.contribuicoes).
+        
+        Returns:
+            tuple: (viés (N,), contribuições (N, features)), ou (None, None)
+                se o modelo não for uma floresta
+        """
+        if self.floresta_compilada is None:
+            return None, None
+        return self.floresta_compilada.contribuicoes(self.pipeline.transform(entrada))
+    
+    def _avaliar_modelo(self, entrada):
+        X_scaled = self.pipeline.transform(entrada)
+        if self.floresta_compilada is not None and len(X_scaled) <= LIMITE_LOTE_COMPILADO:
+            probabilidades = self.floresta_compilada.predict_proba(X_scaled)
+        else:
+            probabilidades = self.modelo.predict_proba(X_scaled)
         
-        dados = {
-            'HUMIDITY': humidity,
-            'TEMPERATURE': temperature,
-            'PH': ph,
-            'FOSFORO_PRESENTE': fosforo,
-            'POTASSIO_PRESENTE': potassio,
-            'hora': hora_atual,
-            'dia_semana': datetime.now().weekday(),
-            'humidity_temp_ratio': humidity / (temperature + 1),
-            'ph_nutrients': ph * (fosforo + potassio)
-        }
+        # predict equivale ao argmax de predict_proba
+        classes = self.modelo.classes_[np.argmax(probabilidades, axis=1)]
         
-        # Converte para array
-        X = np.array([list(dados.values())])
-        X_scaled = self.scaler.transform(X)
+        return {
+            'deve_irrigar': classes.astype(bool),
+            'probabilidade_irrigar': probabilidades[:, 1],
+            'confianca': probabilidades.max(axis=1),
+            'entrada': entrada
+        }
+    
+    def _prever_com_cache(self, entrada, cache):
+        # Só as chaves ausentes no cache vão ao modelo, em uma única chamada
+        cache.validar(self.versao_modelo, self.modelo)
+        entrada, chaves = cache.quantizar(entrada)
+        valores = cache.obter(chaves)
+        
+        faltando = {}
+        for i, valor in enumerate(valores):
+            if valor is None:
+                faltando.setdefault(chaves[i], []).append(i)
+        if faltando:
+            primeiros = [indices[0] for indices in faltando.values()]
+            lote = self._avaliar_modelo(entrada[primeiros])
+            novos = list(zip(lote['deve_irrigar'].tolist(), lote['probabilidade_irrigar'].tolist(),
+                             lote['confianca'].tolist()))
+            cache.guardar(list(faltando), novos, self.modelo)
+            for indices, valor in zip(faltando.values(), novos):
+                for i in indices:
+                    valores[i] = valor
+        
+        deve_irrigar, probabilidades, confiancas = zip(*valores)
+        return {
+            'deve_irrigar': np.array(deve_irrigar, dtype=bool),
+            'probabilidade_irrigar': np.array(probabilidades),
+            'confianca': np.array(confiancas),
+            'entrada': entrada
+        }
+    
+    def ativar_cache(self, passos=None, max_itens=10000, ttl_s=300.0):
+        """
+        Ativa o cache de predições com entradas quantizadas (ver prediction_cache.py).
+        
+        Leituras que caem na mesma célula da grade `passos` reaproveitam a
+        decisão anterior sem consultar o modelo. O cache é limpo sozinho
+        quando o modelo ou a versão carregada mudam.
+        """
+        from prediction_cache import CachePredicoes
+        self.cache_predicoes = CachePredicoes(passos, max_itens, ttl_s)
+        return self.cache_predicoes
+    
+    def prever_irrigacao(self, humidity, temperature, ph, fosforo, potassio, hora_atual=None, explicar=False):
+        """Faz predição de necessidade de irrigação"""
+        lote, erro = self.prever_irrigacao_lote(
+            [[humidity, temperature, ph, fosforo, potassio]], hora=hora_atual, explicar=explicar
+        )
+        if erro:
+            return None, erro
         
-        # Predição
-        predicao = self.modelo.predict(X_scaled)[0]
-        probabilidade = self.modelo.predict_proba(X_scaled)[0]
+        dados = dict(zip(self.features, self.pipeline.features_derivadas(lote['entrada'])[0].tolist()))
         
         resultado = {
-            'deve_irrigar': bool(predicao),
-            'probabilidade_irrigar': float(probabilidade[1]),
-            'confianca': max(probabilidade),
+            'deve_irrigar': bool(lote['deve_irrigar'][0]),
+            'probabilidade_irrigar': float(lote['probabilidade_irrigar'][0]),
+            'confianca': float(lote['confianca'][0]),
             'dados_entrada': dados
         }
+        if explicar and lote['contribuicoes'] is not None:
+            resultado['vies'] = float(lote['vies'][0])
+            resultado['contribuicoes'] = dict(zip(self.features, lote['contribuicoes'][0].tolist()))
         
         return resultado, None
     
-    def otimizar_horarios_irrigacao(self, previsoes_24h=None):
-        # Otimiza horários de irrigação com base em previsões horárias
+    def prever_condicoes(self, horas=24, dispositivo_id=None):
+        """
+        Condições esperadas nas próximas horas, previstas a partir do
+        histórico da feature store (ver condition_forecaster.py).
+        
+        Returns:
+            DataFrame com HUMIDITY, TEMPERATURE, PH, hora, dia_semana e
+            DATA_HORA, ou None se não houver histórico local
+        """
+        if self.previsor_condicoes is None:
+            from condition_forecaster import PrevisorCondicoes
+            self.previsor_condicoes = PrevisorCondicoes(self.diretorio_feature_store)
+        return self.previsor_condicoes.prever(horas, dispositivo_id)
+    
+    def otimizar_horarios_irrigacao(self, previsoes_24h=None, fosforo=1, potassio=1, horas=24, dispositivo_id=None):
+        """
+        Otimiza horários de irrigação com base em previsões horárias.
+        
+        Args:
+            previsoes_24h: Lista de tuplas (humidity, temperature, ph), uma por
+                hora a partir de 00:00 (24 para um dia, 7×24 para uma semana), ou
+                DataFrame com essas colunas e, opcionalmente, hora, dia_semana,
+                DATA_HORA, FOSFORO_PRESENTE, POTASSIO_PRESENTE e campo (linhas
+                consecutivas, uma por hora). Sem previsões, usa as condições
+                previstas pelo histórico (prever_condicoes). Quando o horizonte
+                passa de um dia, cada horário traz `dia` (0 = dia da primeira
+                previsão), pela DATA_HORA ou pela hora da primeira linha
+            horas: Horizonte da previsão pelo histórico
+            dispositivo_id: Prevê as condições com o histórico deste dispositivo
+        
+        Returns:
+            list: Horários ordenados pela probabilidade de irrigação
+        """
+        if previsoes_24h is None:
+            previsoes_24h = self.prever_condicoes(horas, dispositivo_id)
+        
         if previsoes_24h is None:
-            # Gera previsões típicas para cada hora do dia
+            # Sem histórico local: perfil típico de cada hora do dia
             previsoes_24h = []
             for hora in range(24):
                 if 6 <= hora <= 10:  # Manhã
@@ -178,24 +391,51 @@ class SistemaIrrigacaoML:
                     humidity, temp, ph = 80, 18, 6.4
                 previsoes_24h.append((humidity, temp, ph))
         
-        horarios_otimos = []
+        if hasattr(previsoes_24h, 'columns'):
+            previsoes = previsoes_24h.rename(columns=str.upper).rename(
+                columns={'HORA': 'hora', 'DIA_SEMANA': 'dia_semana', 'CAMPO': 'campo'})
+        else:
+            previsoes = pd.DataFrame(list(previsoes_24h), columns=['HUMIDITY', 'TEMPERATURE', 'PH'])
+        
+        # Horizonte de vários dias: sem coluna hora, a posição i é a hora i % 24
+        posicao = np.arange(len(previsoes))
+        if 'hora' not in previsoes.columns:
+            previsoes['hora'] = posicao % 24
+        # Dia de cada linha contado a partir do dia da primeira previsão, que pode
+        # começar no meio do dia (o previsor de condições começa na próxima hora cheia)
+        if 'DATA_HORA' in previsoes.columns:
+            datas = pd.to_datetime(previsoes['DATA_HORA']).dt.normalize()
+            dia = ((datas - datas.iloc[0]) // pd.Timedelta(days=1)).to_numpy(dtype=np.int64)
+        else:
+            dia = (int(previsoes['hora'].iloc[0]) + posicao) // 24 if len(previsoes) else posicao
+        if 'dia_semana' not in previsoes.columns:
+            previsoes['dia_semana'] = (datetime.now().weekday() + dia) % 7
+        if 'FOSFORO_PRESENTE' not in previsoes.columns:
+            previsoes['FOSFORO_PRESENTE'] = fosforo
+        if 'POTASSIO_PRESENTE' not in previsoes.columns:
+            previsoes['POTASSIO_PRESENTE'] = potassio
+        
+        # Uma única chamada ao modelo para todo o horizonte
+        lote, erro = self.prever_irrigacao_lote(previsoes)
+        if erro:
+            return []
         
-        for i, previsao in enumerate(previsoes_24h):
-            hora = i
-            humidity, temperature, ph = previsao
-            
-            resultado, erro = self.prever_irrigacao(
-                humidity, temperature, ph, 1, 1, hora
-            )
-            
-            if resultado:
-                horarios_otimos.append({
-                    'hora': hora,
-                    'deve_irrigar': resultado['deve_irrigar'],
-                    'probabilidade': resultado['probabilidade_irrigar'],
-                    'confianca': resultado['confianca'],
-                    'condicoes': f"H:{humidity}% T:{temperature}°C pH:{ph}"
-                })
+        horarios_otimos = []
+        for i, linha in enumerate(previsoes.itertuples(index=False)):
+            horario = {
+                'hora': int(linha.hora),
+                'deve_irrigar': bool(lote['deve_irrigar'][i]),
+                'probabilidade': float(lote['probabilidade_irrigar'][i]),
+                'confianca': float(lote['confianca'][i]),
+                'condicoes': f"H:{linha.HUMIDITY:g}% T:{linha.TEMPERATURE:g}°C pH:{linha.PH:g}"
+            }
+            if dia[-1] > 0:
+                horario['dia'] = int(dia[i])
+            if 'DATA_HORA' in previsoes.columns:
+                horario['data_hora'] = linha.DATA_HORA.isoformat()
+            if 'campo' in previsoes.columns:
+                horario['campo'] = linha.campo
+            horarios_otimos.append(horario)
         
         # Ordena por probabilidade de irrigação
         horarios_otimos.sort(key=lambda x: x['probabilidade'], reverse=True)
@@ -207,8 +447,8 @@ class SistemaIrrigacaoML:
         data_inicio = (datetime.now() - timedelta(days=dias)).isoformat()
         
         try:
-            response = requests.get(f'{self.api_url}/dados/consulta', 
-                                  params={'data_inicio': data_inicio, 'limite': 1000})
+            response = self.cliente.get('/dados/consulta',
+                                        params={'data_inicio': data_inicio, 'limite': 1000})
             
             if response.status_code == 200:
                 dados = response.json()['dados']
@@ -232,28 +472,56 @@ class SistemaIrrigacaoML:
         
         return None
     
-    def salvar_modelo(self):
-        # Salva o modelo treinado em um arquivo
+    def salvar_modelo(self, promover=True):
+        # Registra uma nova versão do modelo e, por padrão, promove-a
+        dados = {
+            'modelo': self.modelo,
+            'pipeline': self.pipeline,
+            'features': self.features,
+            'historico_acuracia': self.historico_acuracia,
+            'metadados_treino': self.metadados_treino,
+            'perfil_treino': self.perfil_treino
+        }
         try:
-            joblib.dump({
-                'modelo': self.modelo,
-                'scaler': self.scaler,
-                'features': self.features,
-                'historico_acuracia': self.historico_acuracia
-            }, 'modelo_irrigacao.pkl')
-            print("Modelo salvo com sucesso")
+            registro = RegistroModelos(self.diretorio_registro)
+            versao = registro.registrar(dados, self.floresta_compilada, self.metadados_treino)
+            if promover:
+                registro.promover(versao)
+                self.versao_modelo = versao
+
+            # Cópia em arquivo único para as ferramentas que leem o .pkl
+            temporario = f"{self.caminho_modelo}.tmp"
+            joblib.dump(dados, temporario)
+            os.replace(temporario, self.caminho_modelo)
+            print(f"Modelo salvo com sucesso (versão {versao})")
+            return versao
         except Exception as e:
             print(f"Erro ao salvar modelo: {e}")
+            return None
     
-    def carregar_modelo(self):
-        # Carrega o modelo treinado de um arquivo
+    def carregar_modelo(self, versao=None):
+        # Carrega a versão promovida do registro (ou `versao`); sem registro, usa o .pkl
         try:
-            dados = joblib.load('modelo_irrigacao.pkl')
+            registro = RegistroModelos(self.diretorio_registro)
+            floresta = None
+            if versao or registro.versao_atual():
+                dados, floresta, self.versao_modelo = registro.carregar(versao)
+            else:
+                dados = joblib.load(self.caminho_modelo)
+                self.versao_modelo = None
             self.modelo = dados['modelo']
-            self.scaler = dados['scaler']
             self.features = dados['features']
+            # Modelos antigos guardavam só o StandardScaler
+            self.pipeline = dados.get('pipeline') or PreprocessadorIrrigacao.de_scaler(dados['scaler'], self.features)
+            self.floresta_compilada = floresta or FlorestaCompilada.compilar(self.modelo)
+            self.motor = motor_do_modelo(self.modelo)
             self.historico_acuracia = dados.get('historico_acuracia', [])
-            print("Modelo carregado com sucesso")
+            self.metadados_treino = dados.get('metadados_treino', {})
+            self.perfil_treino = dados.get('perfil_treino')
+            if self.versao_modelo:
+                print(f"Modelo carregado com sucesso (versão {self.versao_modelo})")
+            else:
+                print("Modelo carregado com sucesso")
             return True
         except Exception as e:
             print(f"Erro ao carregar modelo: {e}")
@@ -329,16 +597,16 @@ def teste_completo():
         {"nome": "Muito seco", "humidity": 20, "temperature": 40, "ph": 6.0, "fosforo": 0, "potassio": 0}
     ]
     
-    for cenario in cenarios:
-        resultado, _ = sistema.prever_irrigacao(
-            cenario['humidity'], cenario['temperature'], cenario['ph'],
-            cenario['fosforo'], cenario['potassio']
-        )
-        
-        if resultado:
-            irrigar = "SIM" if resultado['deve_irrigar'] else "NÃO"
+    # Todos os cenários em uma única predição em lote
+    lote, _ = sistema.prever_irrigacao_lote(
+        [[c['humidity'], c['temperature'], c['ph'], c['fosforo'], c['potassio']] for c in cenarios]
+    )
+    
+    if lote:
+        for cenario, deve_irrigar, prob in zip(cenarios, lote['deve_irrigar'], lote['probabilidade_irrigar']):
+            irrigar = "SIM" if deve_irrigar else "NÃO"
             print(f"{cenario['nome']:20} - Irrigar: {irrigar} - "
-                  f"Prob: {resultado['probabilidade_irrigar']:.3f}")
+                  f"Prob: {prob:.3f}")
     
     print("\n=== ANÁLISE DETALHADA DE HORÁRIOS ===")
     horarios = sistema.otimizar_horarios_irrigacao()
@@ -357,5 +625,12 @@ if __name__ == "__main__":
     
     if len(sys.argv) > 1 and sys.argv[1] == 'completo':
         teste_completo()
+    elif len(sys.argv) > 1 and sys.argv[1] == 'treinar':
+        # python ml_irrigation_system.py treinar [floresta|boosting]
+        SistemaIrrigacaoML().treinar_modelo(motor=sys.argv[2] if len(sys.argv) > 2 else None)
+    elif len(sys.argv) > 1 and sys.argv[1] == 'buscar':
+        # python ml_irrigation_system.py buscar [orcamento_segundos]
+        orcamento = float(sys.argv[2]) if len(sys.argv) > 2 else 60
+        SistemaIrrigacaoML().treinar_modelo(buscar_hiperparametros=True, orcamento_busca=orcamento)
     else:
         exemplo_uso()
\ No newline at end of file
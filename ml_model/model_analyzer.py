@@ -1,36 +1,156 @@
 import pandas as pd
 import numpy as np
 import joblib
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.metrics import confusion_matrix, classification_report
-from sklearn.tree import export_text
 import os
+import io
+import sys
+import json
+import html
+import hashlib
+import threading
 import warnings
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from feature_pipeline import PreprocessadorIrrigacao
+from model_registry import RegistroModelos
+from model_engines import descrever_modelo, importancias_features, motor_do_modelo
 
 # Suprimir warnings específicos do sklearn para uma saída mais limpa
 warnings.filterwarnings('ignore', category=UserWarning, module='sklearn')
 
+# Cenários de teste realísticos (simulação e explicação das decisões)
+CENARIOS_SIMULACAO = [
+    {
+        'nome': 'Solo muito seco, calor intenso',
+        'dados': {'HUMIDITY': 20, 'TEMPERATURE': 38, 'PH': 6.0,
+                 'FOSFORO_PRESENTE': 1, 'POTASSIO_PRESENTE': 1,
+                 'hora': 14, 'dia_semana': 2}
+    },
+    {
+        'nome': 'Solo úmido, temperatura amena',
+        'dados': {'HUMIDITY': 75, 'TEMPERATURE': 22, 'PH': 6.8,
+                 'FOSFORO_PRESENTE': 1, 'POTASSIO_PRESENTE': 0,
+                 'hora': 8, 'dia_semana': 1}
+    },
+    {
+        'nome': 'Condições médias, meio-dia',
+        'dados': {'HUMIDITY': 50, 'TEMPERATURE': 28, 'PH': 6.5,
+                 'FOSFORO_PRESENTE': 0, 'POTASSIO_PRESENTE': 1,
+                 'hora': 12, 'dia_semana': 3}
+    },
+    {
+        'nome': 'Madrugada, alta umidade',
+        'dados': {'HUMIDITY': 85, 'TEMPERATURE': 18, 'PH': 6.2,
+                 'FOSFORO_PRESENTE': 1, 'POTASSIO_PRESENTE': 1,
+                 'hora': 3, 'dia_semana': 0}
+    },
+    {
+        'nome': 'Solo ácido, sem nutrientes',
+        'dados': {'HUMIDITY': 40, 'TEMPERATURE': 30, 'PH': 5.5,
+                 'FOSFORO_PRESENTE': 0, 'POTASSIO_PRESENTE': 0,
+                 'hora': 16, 'dia_semana': 4}
+    }
+]
+
+# Muda quando o conteúdo das seções muda (invalida os relatórios em cache)
+VERSAO_RELATORIO = 2
+
+
+class _SaidaPorThread:
+    """
+    Substitui sys.stdout enquanto as seções rodam em paralelo: o que cada
+    thread imprime vai para o seu próprio buffer, e o resto segue para a
+    saída original.
+    """
+
+    def __init__(self, original):
+        self.original = original
+        self.local = threading.local()
+
+    def write(self, texto):
+        buffer = getattr(self.local, 'buffer', None)
+        return (buffer if buffer is not None else self.original).write(texto)
+
+    def flush(self):
+        self.original.flush()
+
+    def __getattr__(self, nome):
+        return getattr(self.original, nome)
+
+
+# Um único proxy, compartilhado por todas as execuções de seções em andamento:
+# instalado pela primeira e restaurado pela última (chamadas concorrentes)
+_trava_saida = threading.Lock()
+_saida_compartilhada = None
+_usos_saida = 0
+
+
+@contextmanager
+def _saida_por_thread():
+    global _saida_compartilhada, _usos_saida
+    with _trava_saida:
+        if _usos_saida == 0:
+            _saida_compartilhada = _SaidaPorThread(sys.stdout)
+            sys.stdout = _saida_compartilhada
+        _usos_saida += 1
+        saida = _saida_compartilhada
+    try:
+        yield saida
+    finally:
+        with _trava_saida:
+            _usos_saida -= 1
+            if _usos_saida == 0:
+                # Se outro código trocou sys.stdout nesse meio tempo, não sobrescreve
+                if sys.stdout is saida:
+                    sys.stdout = saida.original
+                _saida_compartilhada = None
+
+
+def _para_json(valor):
+    # Converte os resultados das seções (DataFrames, arrays, chaves em tupla) para JSON
+    if isinstance(valor, pd.DataFrame):
+        return _para_json(valor.to_dict(orient='records'))
+    if isinstance(valor, np.ndarray):
+        return valor.tolist()
+    if isinstance(valor, np.generic):
+        return valor.item()
+    if isinstance(valor, dict):
+        return {(' × '.join(chave) if isinstance(chave, tuple) else str(chave)): _para_json(v)
+                for chave, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_para_json(v) for v in valor]
+    return valor
+
+
 class AnalisadorModeloIrrigacao:
     """
     Classe para análise completa de modelos de irrigação baseados em ML.
     Permite carregar, analisar e visualizar características do modelo treinado.
     """
     
-    def __init__(self, caminho_modelo='modelo_irrigacao.pkl'):
+    def __init__(self, caminho_modelo='modelo_irrigacao.pkl', diretorio_registro='modelos', versao=None):
         """
         Inicializa o analisador de modelo.
         
         Args:
-            caminho_modelo (str): Caminho para o arquivo do modelo (.pkl)
+            caminho_modelo (str): Caminho para o arquivo do modelo (.pkl), usado sem registro
+            diretorio_registro (str): Pasta do registro de versões
+            versao (str): Versão do registro a analisar (padrão: a promovida)
         """
         self.caminho_modelo = caminho_modelo
+        self.registro = RegistroModelos(diretorio_registro)
+        self.versao = versao
+        self.diretorio_feature_store = 'feature_store'
         self.modelo_dados = None
         self.modelo = None
-        self.scaler = None
+        self.floresta = None
+        self.pipeline = None
+        self.motor_sensibilidade = None
         self.features = None
+        self.estrutura_floresta = None
         self.historico_acuracia = None
+        self.relatorio = None
         
     def carregar_modelo(self):
         """
@@ -40,19 +160,31 @@ class AnalisadorModeloIrrigacao:
             bool: True se carregado com sucesso, False caso contrário
         """
         try:
-            if not os.path.exists(self.caminho_modelo):
+            if self.versao or self.registro.versao_atual():
+                self.modelo_dados, self.floresta, self.versao = self.registro.carregar(self.versao)
+                origem = self.registro.pasta_versao(self.versao)
+                tamanho = sum(os.path.getsize(os.path.join(raiz, nome))
+                              for raiz, _, nomes in os.walk(origem) for nome in nomes)
+            elif os.path.exists(self.caminho_modelo):
+                self.modelo_dados = joblib.load(self.caminho_modelo)
+                origem = self.caminho_modelo
+                tamanho = os.path.getsize(self.caminho_modelo)
+            else:
                 print(f"ERRO: Arquivo {self.caminho_modelo} não encontrado.")
                 print("Certifique-se de que o modelo foi treinado e salvo.")
                 return False
             
-            self.modelo_dados = joblib.load(self.caminho_modelo)
             self.modelo = self.modelo_dados['modelo']
-            self.scaler = self.modelo_dados['scaler']
             self.features = self.modelo_dados['features']
+            # Modelos antigos guardavam só o StandardScaler
+            self.pipeline = (self.modelo_dados.get('pipeline')
+                             or PreprocessadorIrrigacao.de_scaler(self.modelo_dados['scaler'], self.features))
             self.historico_acuracia = self.modelo_dados.get('historico_acuracia', [])
             
-            print(f"Modelo carregado com sucesso de: {self.caminho_modelo}")
-            print(f"Tamanho do arquivo: {os.path.getsize(self.caminho_modelo) / 1024:.2f} KB")
+            print(f"Modelo carregado com sucesso de: {origem}")
+            if self.versao:
+                print(f"Versão: {self.versao}")
+            print(f"Tamanho do arquivo: {tamanho / 1024:.2f} KB")
             return True
             
         except Exception as e:
@@ -72,11 +204,9 @@ class AnalisadorModeloIrrigacao:
         print("="*60)
         
         print(f"Tipo de modelo: {type(self.modelo).__name__}")
-        print(f"Número de estimadores: {self.modelo.n_estimators}")
-        print(f"Profundidade máxima: {self.modelo.max_depth}")
-        print(f"Critério de divisão: {self.modelo.criterion}")
-        print(f"Balanceamento de classes: {self.modelo.class_weight}")
-        print(f"Estado aleatório: {self.modelo.random_state}")
+        descricao = descrever_modelo(self.modelo)
+        for nome, valor in descricao.items():
+            print(f"{nome}: {valor}")
         
         if self.historico_acuracia:
             print(f"Acurácia atual: {self.historico_acuracia[-1]:.4f}")
@@ -85,11 +215,20 @@ class AnalisadorModeloIrrigacao:
         print(f"Número de features: {len(self.features)}")
         print(f"Features utilizadas: {', '.join(self.features)}")
         
-        # Informações do scaler
-        if hasattr(self.scaler, 'mean_'):
-            print(f"Normalização: StandardScaler aplicado")
-            print(f"Médias das features: {np.round(self.scaler.mean_, 3)}")
-            print(f"Desvios padrão: {np.round(self.scaler.scale_, 3)}")
+        # Informações do pré-processamento
+        if self.pipeline is not None and self.pipeline.mean_ is not None:
+            print(f"Pré-processamento: {type(self.pipeline).__name__} (features derivadas + padronização)")
+            print(f"Médias das features: {np.round(self.pipeline.mean_, 3)}")
+            print(f"Desvios padrão: {np.round(self.pipeline.scale_, 3)}")
+        
+        return {
+            'tipo': type(self.modelo).__name__,
+            'descricao': {nome: str(valor) for nome, valor in descricao.items()},
+            'versao': self.versao,
+            'acuracia': self.historico_acuracia[-1] if self.historico_acuracia else None,
+            'treinamentos': len(self.historico_acuracia or []),
+            'features': list(self.features),
+        }
     
     def analise_importancia_features(self):
         """
@@ -103,10 +242,11 @@ class AnalisadorModeloIrrigacao:
         print("ANÁLISE DE IMPORTÂNCIA DAS FEATURES")
         print("="*60)
         
+        valores = importancias_features(self.modelo)
         importancias = pd.DataFrame({
             'Feature': self.features,
-            'Importancia': self.modelo.feature_importances_,
-            'Percentual': self.modelo.feature_importances_ * 100
+            'Importancia': valores,
+            'Percentual': valores * 100
         }).sort_values('Importancia', ascending=False)
         
         print("\nRanking de importância das características:")
@@ -144,9 +284,11 @@ class AnalisadorModeloIrrigacao:
         interpretacao = interpretacoes.get(feature, 'Feature customizada')
         print(f"  - {feature}: {interpretacao} ({percentual:.1f}%)")
     
-    def analise_arvores_decisao(self, num_arvores=3):
+    def analise_arvores_decisao(self, num_arvores=1):
         """
-        Analisa algumas árvores de decisão do Random Forest.
+        Analisa a estrutura de todas as árvores do Random Forest (profundidade,
+        folhas, limiares por feature e subárvores podáveis) e mostra as
+        primeiras regras de algumas delas.
         """
         if self.modelo is None:
             print("ERRO: Modelo não carregado.")
@@ -156,8 +298,15 @@ class AnalisadorModeloIrrigacao:
         print("ANÁLISE DE ÁRVORES DE DECISÃO")
         print("="*60)
         
-        print(f"Analisando {num_arvores} árvores do Random Forest...")
+        if motor_do_modelo(self.modelo) != 'floresta':
+            print("Análise de árvores individuais disponível apenas para Random Forest")
+            return
+        
+        from forest_structure import estatisticas_floresta, imprimir_estatisticas
+        self.estrutura_floresta = estatisticas_floresta(self.modelo, self.features, self.pipeline)
+        imprimir_estatisticas(self.estrutura_floresta)
         
+        from sklearn.tree import export_text
         for i in range(min(num_arvores, len(self.modelo.estimators_))):
             arvore = self.modelo.estimators_[i]
             print(f"\n--- ÁRVORE {i+1} ---")
@@ -168,72 +317,33 @@ class AnalisadorModeloIrrigacao:
             regras = export_text(arvore, feature_names=self.features, max_depth=3)
             print("Primeiras regras de decisão:")
             print(regras[:500] + "..." if len(regras) > 500 else regras)
+        
+        return self.estrutura_floresta
     
     def simular_predicoes(self, num_simulacoes=5):
         """
         Simula predições com diferentes cenários de entrada.
         """
-        if self.modelo is None or self.scaler is None:
-            print("ERRO: Modelo ou scaler não carregados.")
+        if self.modelo is None or self.pipeline is None:
+            print("ERRO: Modelo ou pipeline não carregados.")
             return
         
         print("\n" + "="*60)
         print("SIMULAÇÃO DE PREDIÇÕES")
         print("="*60)
         
-        # Cenários de teste realísticos
-        cenarios = [
-            {
-                'nome': 'Solo muito seco, calor intenso',
-                'dados': {'HUMIDITY': 20, 'TEMPERATURE': 38, 'PH': 6.0, 
-                         'FOSFORO_PRESENTE': 1, 'POTASSIO_PRESENTE': 1, 
-                         'hora': 14, 'dia_semana': 2}
-            },
-            {
-                'nome': 'Solo úmido, temperatura amena',
-                'dados': {'HUMIDITY': 75, 'TEMPERATURE': 22, 'PH': 6.8, 
-                         'FOSFORO_PRESENTE': 1, 'POTASSIO_PRESENTE': 0, 
-                         'hora': 8, 'dia_semana': 1}
-            },
-            {
-                'nome': 'Condições médias, meio-dia',
-                'dados': {'HUMIDITY': 50, 'TEMPERATURE': 28, 'PH': 6.5, 
-                         'FOSFORO_PRESENTE': 0, 'POTASSIO_PRESENTE': 1, 
-                         'hora': 12, 'dia_semana': 3}
-            },
-            {
-                'nome': 'Madrugada, alta umidade',
-                'dados': {'HUMIDITY': 85, 'TEMPERATURE': 18, 'PH': 6.2, 
-                         'FOSFORO_PRESENTE': 1, 'POTASSIO_PRESENTE': 1, 
-                         'hora': 3, 'dia_semana': 0}
-            },
-            {
-                'nome': 'Solo ácido, sem nutrientes',
-                'dados': {'HUMIDITY': 40, 'TEMPERATURE': 30, 'PH': 5.5, 
-                         'FOSFORO_PRESENTE': 0, 'POTASSIO_PRESENTE': 0, 
-                         'hora': 16, 'dia_semana': 4}
-            }
-        ]
-        
         print("Testando diferentes cenários de irrigação:")
         print("-" * 80)
         
-        for cenario in cenarios[:num_simulacoes]:
+        # Todos os cenários passam pelo pipeline e pelo modelo de uma vez
+        selecionados = CENARIOS_SIMULACAO[:num_simulacoes]
+        X_scaled = self.pipeline.transform(pd.DataFrame([c['dados'] for c in selecionados]))
+        todas_probabilidades = self.modelo.predict_proba(X_scaled)
+        
+        resultados = []
+        for cenario, probabilidades in zip(selecionados, todas_probabilidades):
             dados = cenario['dados']
-            
-            # Calcular features derivadas
-            dados['humidity_temp_ratio'] = dados['HUMIDITY'] / (dados['TEMPERATURE'] + 1)
-            dados['ph_nutrients'] = dados['PH'] * (dados['FOSFORO_PRESENTE'] + dados['POTASSIO_PRESENTE'])
-            
-            # Preparar dados para predição
-            X = np.array([[dados[feature] for feature in self.features]])
-            # Converter para DataFrame para evitar warnings do sklearn
-            X_df = pd.DataFrame(X, columns=self.features)
-            X_scaled = self.scaler.transform(X_df)
-            
-            # Fazer predição
-            predicao = self.modelo.predict(X_scaled)[0]
-            probabilidades = self.modelo.predict_proba(X_scaled)[0]
+            predicao = self.modelo.classes_[np.argmax(probabilidades)]
             
             decisao = "IRRIGAR" if predicao == 1 else "NÃO IRRIGAR"
             confianca = max(probabilidades) * 100
@@ -244,83 +354,190 @@ class AnalisadorModeloIrrigacao:
             print(f"Decisão: {decisao}")
             print(f"Probabilidade de irrigar: {probabilidades[1]:.3f}")
             print(f"Confiança: {confianca:.1f}%")
+            resultados.append({'cenario': cenario['nome'], 'deve_irrigar': bool(predicao == 1),
+                               'probabilidade': float(probabilidades[1])})
+        return resultados
     
-    def analise_sensibilidade(self):
+    def analise_contribuicoes(self, num_cenarios=5, top=3):
         """
-        Analisa a sensibilidade do modelo a mudanças nas features principais.
+        Explica decisões individuais: quanto cada feature somou ou tirou da
+        probabilidade de irrigar, pelos caminhos das árvores. Mostra os
+        cenários de simulação e o resumo sobre todo o histórico da feature store.
         """
-        if self.modelo is None or self.scaler is None:
-            print("ERRO: Modelo ou scaler não carregados.")
+        if self.modelo is None or self.pipeline is None:
+            print("ERRO: Modelo ou pipeline não carregados.")
             return
         
         print("\n" + "="*60)
-        print("ANÁLISE DE SENSIBILIDADE")
+        print("CONTRIBUIÇÕES POR DECISÃO")
         print("="*60)
         
-        # Valores base para teste
-        valores_base = {
-            'HUMIDITY': 50, 'TEMPERATURE': 25, 'PH': 6.5,
-            'FOSFORO_PRESENTE': 1, 'POTASSIO_PRESENTE': 1,
-            'hora': 12, 'dia_semana': 2,
-            'humidity_temp_ratio': 50/26, 'ph_nutrients': 6.5 * 2
-        }
+        floresta = self.floresta
+        if floresta is None and motor_do_modelo(self.modelo) == 'floresta':
+            from forest_compiler import FlorestaCompilada
+            floresta = self.floresta = FlorestaCompilada.compilar(self.modelo)
+        if floresta is None:
+            print("Contribuições por decisão disponíveis apenas para Random Forest")
+            return
         
-        # Testar variações nas features principais
-        features_teste = ['HUMIDITY', 'TEMPERATURE', 'PH']
+        selecionados = CENARIOS_SIMULACAO[:num_cenarios]
+        vies, contribuicoes = floresta.contribuicoes(
+            self.pipeline.transform(pd.DataFrame([c['dados'] for c in selecionados])))
+        print(f"Probabilidade base (média do treino): {vies[0]:.3f}")
+        for cenario, valores in zip(selecionados, contribuicoes):
+            ordem = np.argsort(-np.abs(valores))[:top]
+            partes = ", ".join(f"{self.features[j]} {valores[j]:+.3f}" for j in ordem)
+            print(f"  {cenario['nome']:32} -> {vies[0] + valores.sum():.3f} ({partes})")
+        
+        # Resumo sobre todo o histórico local
+        from feature_pipeline import COLUNAS_ENTRADA
+        from feature_store import FeatureStoreLocal
+        if not os.path.isdir(self.diretorio_feature_store):
+            return contribuicoes
+        historico = FeatureStoreLocal(self.diretorio_feature_store).matriz(COLUNAS_ENTRADA, dtype=np.float64)
+        if historico is None or len(historico) == 0:
+            return contribuicoes
+        
+        inicio = datetime.now()
+        _, todas = floresta.contribuicoes(self.pipeline.transform(historico))
+        segundos = (datetime.now() - inicio).total_seconds()
+        principal = np.bincount(np.argmax(np.abs(todas), axis=1), minlength=len(self.features)) / len(todas)
+        
+        print(f"\nHistórico: {len(todas)} leituras explicadas em {segundos:.2f} s")
+        print(f"{'Feature':20} | {'|contrib.| média':>16} | {'média':>7} | Principal em")
+        print("-" * 64)
+        for j in np.argsort(-np.abs(todas).mean(axis=0)):
+            print(f"{self.features[j]:20} | {np.abs(todas[:, j]).mean():16.4f} | "
+                  f"{todas[:, j].mean():+7.4f} | {principal[j]:6.1%}")
+        return contribuicoes
+    
+    def obter_motor_sensibilidade(self):
+        """
+        Motor de dependência parcial/ICE do modelo carregado (cache por versão).
+        """
+        if self.motor_sensibilidade is None or self.motor_sensibilidade.modelo is not self.modelo:
+            from sensitivity_engine import MotorSensibilidade
+            self.motor_sensibilidade = MotorSensibilidade(
+                self.pipeline, self.modelo, self.floresta, versao=self.versao,
+                diretorio_cache=os.path.join(self.registro.diretorio, 'analises'))
+        return self.motor_sensibilidade
+    
+    def analise_sensibilidade(self, features=None, pontos=5, fundo=None):
+        """
+        Analisa a sensibilidade do modelo a mudanças nas features principais.
+        
+        Com histórico na feature store, mostra a dependência parcial (média
+        sobre uma amostra de leituras) e a faixa das curvas ICE; sem ele, a
+        resposta a partir de uma leitura de referência.
         
-        for feature in features_teste:
+        Args:
+            features (list): Features de entrada variadas (padrão: umidade, temperatura e pH)
+            pontos (int): Pontos da grade das variáveis contínuas
+            fundo: Leituras de fundo (padrão: amostra da feature store)
+        """
+        if self.modelo is None or self.pipeline is None:
+            print("ERRO: Modelo ou pipeline não carregados.")
+            return
+        
+        print("\n" + "="*60)
+        print("ANÁLISE DE SENSIBILIDADE")
+        print("="*60)
+        
+        from sensitivity_engine import amostra_fundo
+        if fundo is None and os.path.isdir(self.diretorio_feature_store):
+            fundo = amostra_fundo(self.diretorio_feature_store)
+        motor = self.obter_motor_sensibilidade()
+        historico = fundo is not None and len(fundo) > 1
+        if historico:
+            print(f"Dependência parcial sobre {len(fundo)} leituras do histórico (faixa ICE p10-p90)")
+        
+        unidades = {'HUMIDITY': '%', 'TEMPERATURE': '°C'}
+        resultados = {}
+        for feature in features or ['HUMIDITY', 'TEMPERATURE', 'PH']:
             print(f"\nTeste de sensibilidade - {feature}:")
             print("-" * 40)
             
-            # Valores de teste para a feature
-            if feature == 'HUMIDITY':
-                valores_teste = [10, 30, 50, 70, 90]
-                unidade = "%"
-            elif feature == 'TEMPERATURE':
-                valores_teste = [15, 20, 25, 30, 35]
-                unidade = "°C"
-            elif feature == 'PH':
-                valores_teste = [5.5, 6.0, 6.5, 7.0, 7.5]
-                unidade = ""
-            
-            for valor in valores_teste:
-                dados_teste = valores_base.copy()
-                dados_teste[feature] = valor
-                
-                # Recalcular features derivadas se necessário
-                if feature in ['HUMIDITY', 'TEMPERATURE']:
-                    dados_teste['humidity_temp_ratio'] = dados_teste['HUMIDITY'] / (dados_teste['TEMPERATURE'] + 1)
-                if feature == 'PH':
-                    dados_teste['ph_nutrients'] = dados_teste['PH'] * (dados_teste['FOSFORO_PRESENTE'] + dados_teste['POTASSIO_PRESENTE'])
-                
-                X = np.array([[dados_teste[f] for f in self.features]])
-                # Converter para DataFrame para evitar warnings do sklearn
-                X_df = pd.DataFrame(X, columns=self.features)
-                X_scaled = self.scaler.transform(X_df)
-                
-                prob_irrigar = self.modelo.predict_proba(X_scaled)[0][1]
-                
-                print(f"  {feature}={valor}{unidade:2} -> Prob. irrigar: {prob_irrigar:.3f}")
+            resultado = motor.dependencia_parcial(feature, fundo, pontos=pontos, ice=historico)
+            resultados[feature] = resultado
+            unidade = unidades.get(feature, '')
+            for i, valor in enumerate(resultado['valores'][0]):
+                texto = np.format_float_positional(valor, trim='0' if feature == 'PH' else '-')
+                linha = f"  {feature}={texto}{unidade:2} -> Prob. irrigar: {resultado['media'][i]:.3f}"
+                if historico:
+                    p10, p90 = np.percentile(resultado['ice'][:, i], [10, 90])
+                    linha += f" (ICE {p10:.3f}-{p90:.3f})"
+                print(linha)
+        
+        # Interação entre umidade e temperatura (dependência parcial 2-D)
+        interacao = motor.dependencia_parcial(['HUMIDITY', 'TEMPERATURE'], fundo, pontos=pontos)
+        resultados[('HUMIDITY', 'TEMPERATURE')] = interacao
+        umidades, temperaturas = interacao['valores']
+        print("\nInteração HUMIDITY × TEMPERATURE (Prob. irrigar):")
+        print("-" * 40)
+        print("  H \\ T  " + "".join(f"{t:>7g}" for t in temperaturas))
+        for i, umidade in enumerate(umidades):
+            print(f"  {umidade:>6g}  " + "".join(f"{p:7.3f}" for p in interacao['media'][i]))
+        return resultados
     
-    def relatorio_completo(self):
+    def _chave_relatorio(self):
         """
-        Gera um relatório completo de análise do modelo.
-        """
-        print("\n" + "="*80)
-        print("RELATÓRIO COMPLETO DE ANÁLISE DO MODELO DE IRRIGAÇÃO")
-        print("="*80)
-        print(f"Data/Hora da análise: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
-        
-        if not self.carregar_modelo():
-            return
+        Identifica o relatório pelo hash do conteúdo do modelo (a versão do
+        registro ou o SHA-256 do .pkl) e pelo estado da feature store, usada
+        nas seções de contribuições e sensibilidade.
         
-        # Executar todas as análises
-        self.informacoes_gerais()
-        importancias = self.analise_importancia_features()
-        self.analise_arvores_decisao()
-        self.simular_predicoes()
-        self.analise_sensibilidade()
+        Returns:
+            tuple: (pasta do cache, nome do arquivo sem extensão), ou (None, None) sem modelo
+        """
+        versao = self.versao or self.registro.versao_atual()
+        if versao:
+            hash_modelo = versao
+        elif os.path.exists(self.caminho_modelo):
+            sha = hashlib.sha256()
+            with open(self.caminho_modelo, 'rb') as f:
+                for bloco in iter(lambda: f.read(1 << 20), b''):
+                    sha.update(bloco)
+            hash_modelo = sha.hexdigest()[:16]
+        else:
+            return None, None
+        
+        estado = {}
+        caminho_estado = os.path.join(self.diretorio_feature_store, '_estado.json')
+        if os.path.exists(caminho_estado):
+            with open(caminho_estado) as f:
+                estado = json.load(f)
+        dados = hashlib.sha1(repr((VERSAO_RELATORIO, estado.get('ultimo_id'),
+                                   estado.get('total_linhas'))).encode()).hexdigest()[:12]
+        return os.path.join(self.registro.diretorio, 'analises', hash_modelo), f'relatorio-{dados}'
+    
+    def _executar_secoes(self, secoes, workers=None):
+        """
+        Roda as seções em threads, cada uma imprimindo no seu próprio buffer.
         
+        Returns:
+            dict: {nome: {'titulo', 'texto', 'dados', 'segundos'}} na ordem de `secoes`
+        """
+        def executar(secao):
+            nome, titulo, funcao = secao
+            saida.local.buffer = io.StringIO()
+            inicio = datetime.now()
+            try:
+                dados = funcao()
+            except Exception as e:
+                print(f"ERRO na seção {titulo}: {str(e)}")
+                dados = None
+            finally:
+                texto, saida.local.buffer = saida.local.buffer.getvalue(), None
+            return nome, {'titulo': titulo, 'texto': texto, 'dados': _para_json(dados),
+                          'segundos': round((datetime.now() - inicio).total_seconds(), 3)}
+        
+        with _saida_por_thread() as saida, \
+                ThreadPoolExecutor(min(workers or os.cpu_count() or 1, len(secoes))) as executor:
+            return dict(executor.map(executar, secoes))
+    
+    def _recomendacoes(self, importancias):
+        """
+        Resumo e recomendações a partir da importância das features.
+        """
         print("\n" + "="*80)
         print("RESUMO E RECOMENDAÇÕES")
         print("="*80)
@@ -352,6 +569,116 @@ class AnalisadorModeloIrrigacao:
             print("   Implementação recomendada com monitoramento contínuo")
             print("5. Manutenção: Retreinamento periódico recomendado")
             print("   Frequência sugerida: mensal ou quando performance diminuir")
+            return {'feature_principal': feature_principal,
+                    'features_baixa_importancia': features_baixa_importancia['Feature'].tolist()}
+    
+    def _gravar_relatorio(self, relatorio, pasta, nome):
+        """
+        Grava o relatório em JSON (também é o cache) e em HTML.
+        """
+        os.makedirs(pasta, exist_ok=True)
+        caminho_json = os.path.join(pasta, f'{nome}.json')
+        temporario = f'{caminho_json}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(temporario, caminho_json)
+        
+        partes = [f"<h1>Relatório do modelo de irrigação</h1>",
+                  f"<p>Versão: {html.escape(str(relatorio['versao']))} | "
+                  f"Gerado em: {html.escape(relatorio['gerado_em'])}</p>"]
+        for secao in relatorio['secoes'].values():
+            partes.append(f"<h2>{html.escape(secao['titulo'])}</h2>")
+            partes.append(f"<pre>{html.escape(secao['texto'].strip())}</pre>")
+        pagina = ("<!DOCTYPE html>\n<html lang=\"pt-BR\"><head><meta charset=\"utf-8\">"
+                  "<title>Relatório do modelo de irrigação</title>"
+                  "<style>body{font-family:sans-serif;margin:2em}pre{background:#f4f4f4;padding:1em}</style>"
+                  "</head><body>\n" + "\n".join(partes) + "\n</body></html>\n")
+        caminho_html = os.path.join(pasta, f'{nome}.html')
+        with open(f'{caminho_html}.tmp', 'w', encoding='utf-8') as f:
+            f.write(pagina)
+        os.replace(f'{caminho_html}.tmp', caminho_html)
+        return caminho_json, caminho_html
+    
+    def relatorio_completo(self, usar_cache=True, workers=None):
+        """
+        Gera um relatório completo de análise do modelo.
+        
+        As seções rodam em paralelo e o resultado (texto e dados de cada
+        seção) fica em <registro>/analises/<hash do modelo>/ em JSON e HTML.
+        Com o mesmo modelo e a mesma feature store, o relatório em cache é
+        reaproveitado sem carregar o modelo.
+        
+        Args:
+            usar_cache (bool): Reaproveita o relatório já gerado, se houver
+            workers (int): Threads para as seções (padrão: núcleos)
+        
+        Returns:
+            dict: Relatório (versão, gerado_em, arquivos e seções), ou None sem modelo
+        """
+        print("\n" + "="*80)
+        print("RELATÓRIO COMPLETO DE ANÁLISE DO MODELO DE IRRIGAÇÃO")
+        print("="*80)
+        print(f"Data/Hora da análise: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
+        
+        pasta, nome = self._chave_relatorio()
+        if usar_cache and pasta and os.path.exists(os.path.join(pasta, f'{nome}.json')):
+            try:
+                with open(os.path.join(pasta, f'{nome}.json'), encoding='utf-8') as f:
+                    relatorio = json.load(f)
+                for secao in relatorio['secoes'].values():
+                    print(secao['texto'], end='')
+                print(f"\n(Relatório em cache, gerado em {relatorio['gerado_em']})")
+                self.relatorio = relatorio
+                return relatorio
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Cache do relatório ignorado: {str(e)}")
+        
+        inicio = datetime.now()
+        carregamento = self._executar_secoes([('carregamento', 'Carregamento', self.carregar_modelo)], 1)
+        print(carregamento['carregamento']['texto'], end='')
+        if not carregamento['carregamento']['dados']:
+            return None
+        
+        # Compilada antes das threads para as seções compartilharem a mesma floresta
+        if self.floresta is None and motor_do_modelo(self.modelo) == 'floresta':
+            from forest_compiler import FlorestaCompilada
+            self.floresta = FlorestaCompilada.compilar(self.modelo)
+        
+        def sensibilidade():
+            # As curvas ICE completas ficam fora do JSON
+            resultados = self.analise_sensibilidade()
+            return {chave: {k: v for k, v in r.items() if k != 'ice'}
+                    for chave, r in (resultados or {}).items()}
+        
+        secoes = self._executar_secoes([
+            ('informacoes_gerais', 'Informações gerais', self.informacoes_gerais),
+            ('importancia_features', 'Importância das features', self.analise_importancia_features),
+            ('arvores_decisao', 'Árvores de decisão', self.analise_arvores_decisao),
+            ('simulacao', 'Simulação de predições', self.simular_predicoes),
+            ('contribuicoes', 'Contribuições por decisão', self.analise_contribuicoes),
+            ('sensibilidade', 'Sensibilidade', sensibilidade),
+        ], workers)
+        importancias = pd.DataFrame(secoes['importancia_features']['dados'] or None)
+        secoes.update(self._executar_secoes(
+            [('recomendacoes', 'Resumo e recomendações',
+              lambda: self._recomendacoes(importancias if len(importancias) else None))], 1))
+        for secao in secoes.values():
+            print(secao['texto'], end='')
+        
+        relatorio = {
+            'versao': self.versao,
+            'gerado_em': inicio.isoformat(timespec='seconds'),
+            'segundos': round((datetime.now() - inicio).total_seconds(), 3),
+            'secoes': dict(carregamento, **secoes),
+        }
+        if pasta:
+            try:
+                arquivos = self._gravar_relatorio(relatorio, pasta, nome)
+                print(f"\nRelatório salvo em: {arquivos[0]} e {arquivos[1]}")
+            except OSError as e:
+                print(f"ERRO ao salvar o relatório: {str(e)}")
+        self.relatorio = relatorio
+        return relatorio
 
 def main():
     """
@@ -371,7 +698,7 @@ def main():
     
     # Executar análise completa
     try:
-        analisador.relatorio_completo()
+        analisador.relatorio_completo(usar_cache='--sem-cache' not in sys.argv)
         
         print("\n" + "="*80)
         print("Análise concluída com sucesso!")
@@ -0,0 +1,283 @@
+"""
+Motores de modelo disponíveis para o SistemaIrrigacaoML.
+
+- 'floresta': RandomForestClassifier (divisões exatas), o motor original.
+- 'boosting': HistGradientBoostingClassifier. Discretiza cada feature em até
+  255 faixas antes de treinar, então o custo por árvore cresce pouco com o
+  número de linhas, e trata valores ausentes (NaN) nativamente.
+
+Modelos do aprendiz incremental (online_learner.py, SGDClassifier) também
+podem estar no registro: são reconhecidos como motor 'online', com
+importâncias pelos coeficientes, mas não são criados por criar_modelo.
+
+Uso do benchmark:
+    python model_engines.py                       # 10 mil, 1 milhão e 10 milhões de linhas
+    python model_engines.py 10000 100000
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+
+import numpy as np
+
+from feature_pipeline import COLUNAS_ENTRADA, PreprocessadorIrrigacao
+
+MOTORES = ('floresta', 'boosting')
+# Motor dos modelos lineares do aprendiz incremental (só carregados, nunca treinados aqui)
+MOTOR_ONLINE = 'online'
+
+PARAMETROS_PADRAO = {
+    'floresta': {'n_estimators': 100, 'max_depth': 10, 'class_weight': 'balanced'},
+    'boosting': {'max_iter': 300, 'learning_rate': 0.1, 'max_leaf_nodes': 31,
+                 'early_stopping': True, 'n_iter_no_change': 10, 'class_weight': 'balanced'},
+}
+
+
+def criar_modelo(motor='floresta', parametros=None, random_state=42):
+    """
+    Cria o classificador do motor escolhido.
+
+    Args:
+        motor (str): Um de MOTORES
+        parametros (dict): Substitui os PARAMETROS_PADRAO do motor
+    """
+    if motor not in MOTORES:
+        raise ValueError(f"Motor desconhecido: {motor} (opções: {', '.join(MOTORES)})")
+
+    configuracao = dict(PARAMETROS_PADRAO[motor], **(parametros or {}))
+    if motor == 'boosting':
+        from sklearn.ensemble import HistGradientBoostingClassifier
+        return HistGradientBoostingClassifier(random_state=random_state, **configuracao)
+
+    from sklearn.ensemble import RandomForestClassifier
+    return RandomForestClassifier(random_state=random_state, **configuracao)
+
+
+def motor_do_modelo(modelo):
+    if hasattr(modelo, '_predictors'):
+        return 'boosting'
+    if hasattr(modelo, 'coef_'):
+        return MOTOR_ONLINE
+    return 'floresta'
+
+
+def criar_pipeline(motor, features):
+    # O boosting recebe os ausentes como NaN; a floresta continua com 0
+    return PreprocessadorIrrigacao(features, preencher_ausentes=(motor != 'boosting'))
+
+
+def importancias_features(modelo):
+    """
+    Importância normalizada de cada feature.
+
+    Floresta: feature_importances_ (redução de impureza). Boosting: soma do
+    ganho das divisões de cada feature em todas as árvores. Online: módulo
+    dos coeficientes (as features chegam padronizadas, então são comparáveis).
+    """
+    if hasattr(modelo, 'feature_importances_'):
+        return np.asarray(modelo.feature_importances_)
+    if hasattr(modelo, 'coef_'):
+        peso = np.abs(np.asarray(modelo.coef_, dtype=np.float64)).sum(axis=0)
+        total = peso.sum()
+        return peso / total if total > 0 else peso
+
+    ganho = np.zeros(modelo.n_features_in_)
+    for iteracao in modelo._predictors:
+        for arvore in iteracao:
+            nos = arvore.nodes[~arvore.nodes['is_leaf'].astype(bool)]
+            np.add.at(ganho, nos['feature_idx'], nos['gain'])
+    total = ganho.sum()
+    return ganho / total if total > 0 else ganho
+
+
+def descrever_modelo(modelo):
+    """
+    Principais parâmetros do modelo, para exibição.
+    """
+    motor = motor_do_modelo(modelo)
+    if motor == MOTOR_ONLINE:
+        return {
+            'Motor': 'online (linear, SGD incremental)',
+            'Perda': modelo.loss,
+            'Regularização (alpha)': modelo.alpha,
+            'Atualizações': int(modelo.t_ - 1) if hasattr(modelo, 't_') else None,
+            'Balanceamento de classes': modelo.class_weight,
+            'Estado aleatório': modelo.random_state,
+        }
+    if motor == 'boosting':
+        return {
+            'Motor': 'boosting (histogramas)',
+            'Iterações': modelo.n_iter_,
+            'Taxa de aprendizado': modelo.learning_rate,
+            'Folhas por árvore (máx.)': modelo.max_leaf_nodes,
+            'Parada antecipada': modelo.early_stopping,
+            'Balanceamento de classes': modelo.class_weight,
+            'Estado aleatório': modelo.random_state,
+        }
+    return {
+        'Número de estimadores': modelo.n_estimators,
+        'Profundidade máxima': modelo.max_depth,
+        'Critério de divisão': modelo.criterion,
+        'Balanceamento de classes': modelo.class_weight,
+        'Estado aleatório': modelo.random_state,
+    }
+
+
+# --- Benchmark -------------------------------------------------------------
+
+def gerar_leituras_sinteticas(rng, n, fracao_ausentes=0.01):
+    """
+    Gera n leituras sintéticas (colunas de COLUNAS_ENTRADA em float32) e o alvo.
+
+    O alvo segue a lógica de irrigação do firmware com ruído, e uma fração
+    das leituras de umidade/temperatura fica ausente (sensor sem resposta).
+
+    Returns:
+        tuple: (lista de arrays na ordem de COLUNAS_ENTRADA, bomba_ligada int8)
+    """
+    umidade = rng.uniform(10, 100, n)
+    temperatura = rng.uniform(5, 45, n)
+    ph = rng.uniform(5.5, 8.0, n)
+    fosforo = rng.integers(0, 2, n)
+    potassio = rng.integers(0, 2, n)
+    hora = rng.integers(0, 24, n)
+    dia = rng.integers(0, 7, n)
+
+    pontuacao = ((40 - umidade) / 6 + (temperatura - 25) / 10 + 0.8 * (fosforo & potassio)
+                 - 1.5 * np.abs(ph - 6.75) + 0.3 * np.sin(hora / 24 * 2 * np.pi))
+    bomba = (rng.random(n) < 1 / (1 + np.exp(-pontuacao))).astype(np.int8)
+
+    colunas = [umidade, temperatura, ph, fosforo, potassio, hora, dia]
+    colunas = [c.astype(np.float32) for c in colunas]
+    if fracao_ausentes:
+        for c in colunas[:2]:
+            c[rng.random(n) < fracao_ausentes] = np.nan
+    return colunas, bomba
+
+
+def gerar_parquet_sintetico(caminho, linhas, semente=0, tamanho_bloco=1000000, fracao_ausentes=0.01):
+    """
+    Grava leituras sintéticas (COLUNAS_ENTRADA + bomba_ligada) em Parquet, bloco a bloco.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rng = np.random.default_rng(semente)
+    escritor = None
+    try:
+        for inicio in range(0, linhas, tamanho_bloco):
+            n = min(tamanho_bloco, linhas - inicio)
+            colunas, bomba = gerar_leituras_sinteticas(rng, n, fracao_ausentes)
+            tabela = pa.table(dict(zip(COLUNAS_ENTRADA, colunas), bomba_ligada=bomba))
+            if escritor is None:
+                escritor = pq.ParquetWriter(caminho, tabela.schema)
+            escritor.write_table(tabela)
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+def pico_memoria_mb():
+    """
+    Pico de memória residente (RSS) do processo desde o início, em MB.
+    """
+    import resource
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    return pico / 1024 if sys.platform != 'darwin' else pico / 1024 ** 2
+
+
+def _medir_motor(motor, caminho_treino, caminho_teste, saida):
+    # Executado em um processo novo para o pico de memória ser só deste treino
+    # Bibliotecas importadas antes da medição: o pico conta só dados e treino
+    import pyarrow.dataset
+    import sklearn.ensemble
+    from feature_store import ler_matriz_parquet
+
+    memoria_base = pico_memoria_mb()
+    inicio = time.perf_counter()
+    dados = ler_matriz_parquet(caminho_treino, COLUNAS_ENTRADA + ['bomba_ligada'])
+    X, y = dados[:, :-1], dados[:, -1].astype(np.int8)
+    del dados
+    tempo_leitura = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    pipeline = criar_pipeline(motor, None)
+    X_treino = pipeline.fit_transform(X)
+    del X
+    modelo = criar_modelo(motor, {'n_jobs': -1} if motor == 'floresta' else None)
+    modelo.fit(X_treino, y)
+    tempo_ajuste = time.perf_counter() - inicio
+
+    teste = ler_matriz_parquet(caminho_teste, COLUNAS_ENTRADA + ['bomba_ligada'])
+    acuracia = float((modelo.predict(pipeline.transform(teste[:, :-1])) == teste[:, -1]).mean())
+
+    with open(saida, 'w') as f:
+        json.dump({
+            'leitura_s': round(tempo_leitura, 2),
+            'ajuste_s': round(tempo_ajuste, 2),
+            'pico_memoria_mb': round(pico_memoria_mb() - memoria_base, 1),
+            'acuracia': round(acuracia, 4),
+        }, f)
+
+
+def benchmark(tamanhos=(10000, 1000000, 10000000), max_linhas_floresta=2000000, linhas_teste=100000):
+    """
+    Compara floresta e boosting (tempo de ajuste, pico de memória e acurácia).
+
+    Cada combinação roda em um processo separado (spawn). A floresta é
+    ignorada acima de `max_linhas_floresta` linhas.
+
+    Returns:
+        list: Um dict por (tamanho, motor)
+    """
+    import multiprocessing
+
+    contexto = multiprocessing.get_context('spawn')
+    resultados = []
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho_teste = os.path.join(pasta, 'teste.parquet')
+        gerar_parquet_sintetico(caminho_teste, linhas_teste, semente=999)
+
+        print(f"{'Linhas':>10} | {'Motor':>9} | {'Leitura (s)':>11} | {'Ajuste (s)':>10} | "
+              f"{'Memória (MB)':>12} | Acurácia")
+        print("-" * 78)
+        for tamanho in tamanhos:
+            caminho_treino = os.path.join(pasta, f'treino_{tamanho}.parquet')
+            gerar_parquet_sintetico(caminho_treino, tamanho, semente=tamanho)
+
+            for motor in MOTORES:
+                resultado = {'linhas': tamanho, 'motor': motor}
+                if motor == 'floresta' and tamanho > max_linhas_floresta:
+                    resultado['ignorado'] = True
+                    print(f"{tamanho:>10} | {motor:>9} | {'ignorado (acima de ' + str(max_linhas_floresta) + ' linhas)':>50}")
+                    resultados.append(resultado)
+                    continue
+
+                saida = os.path.join(pasta, f'{motor}_{tamanho}.json')
+                processo = contexto.Process(target=_medir_motor,
+                                            args=(motor, caminho_treino, caminho_teste, saida))
+                processo.start()
+                processo.join()
+                if processo.exitcode != 0 or not os.path.exists(saida):
+                    resultado['erro'] = f"processo terminou com código {processo.exitcode}"
+                    print(f"{tamanho:>10} | {motor:>9} | erro ({resultado['erro']})")
+                else:
+                    with open(saida) as f:
+                        resultado.update(json.load(f))
+                    print(f"{tamanho:>10} | {motor:>9} | {resultado['leitura_s']:>11.2f} | "
+                          f"{resultado['ajuste_s']:>10.2f} | {resultado['pico_memoria_mb']:>12.1f} | "
+                          f"{resultado['acuracia']:.4f}")
+                resultados.append(resultado)
+            os.remove(caminho_treino)
+
+    return resultados
+
+
+if __name__ == "__main__":
+    tamanhos = [int(t) for t in sys.argv[1:]] or [10000, 1000000, 10000000]
+    print("Benchmark dos motores de modelo (dados sintéticos com 1% de umidade/temperatura ausentes)")
+    benchmark(tamanhos)
@@ -0,0 +1,296 @@
+"""
+Registro local de versões do modelo de irrigação.
+
+Cada versão fica em uma pasta própria, nomeada pelo hash do conteúdo, e
+nunca é sobrescrita. O modelo promovido é indicado em registro.json, que é
+trocado de forma atômica; rollback volta para a promoção anterior. Promoções
+e rollbacks de processos diferentes são serializados por uma trava de
+arquivo (registro.lock), então nenhuma atualização da pilha se perde.
+
+Estrutura:
+    modelos/
+        registro.json          # versão atual, pilha de promoções e eventos
+        registro.lock          # trava das alterações de registro.json
+        versoes/<hash>/
+            modelo.joblib      # dict de salvar_modelo, sem compressão (carrega com mmap)
+            pipeline.joblib    # só pipeline e features (predição sem o scikit-learn)
+            floresta/*.npy     # arrays da FlorestaCompilada (carregados com mmap)
+            metadados.json
+
+Uso:
+    python model_registry.py listar
+    python model_registry.py promover <versao>
+    python model_registry.py rollback
+"""
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import joblib
+
+from forest_compiler import FlorestaCompilada
+
+TAMANHO_HASH = 16
+
+
+class RegistroModelos:
+    """
+    Versões imutáveis do modelo com promoção atômica e rollback.
+    """
+
+    def __init__(self, diretorio='modelos'):
+        """
+        Args:
+            diretorio (str): Pasta raiz do registro
+        """
+        self.diretorio = diretorio
+        self.diretorio_versoes = os.path.join(diretorio, 'versoes')
+        self.caminho_registro = os.path.join(diretorio, 'registro.json')
+        self.caminho_trava = os.path.join(diretorio, 'registro.lock')
+
+    def _ler_registro(self):
+        if not os.path.exists(self.caminho_registro):
+            return {'atual': None, 'pilha': [], 'eventos': []}
+        with open(self.caminho_registro) as f:
+            return json.load(f)
+
+    @contextmanager
+    def _travado(self):
+        # Trava exclusiva entre processos para ler, alterar e gravar o registro
+        os.makedirs(self.diretorio, exist_ok=True)
+        with open(self.caminho_trava, 'a+') as trava:
+            if fcntl is not None:
+                fcntl.flock(trava.fileno(), fcntl.LOCK_EX)
+            else:
+                trava.seek(0)
+                msvcrt.locking(trava.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(trava.fileno(), fcntl.LOCK_UN)
+                else:
+                    trava.seek(0)
+                    msvcrt.locking(trava.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _gravar_registro(self, registro):
+        # Arquivo temporário + rename: leitores veem o registro antigo ou o novo, nunca parcial
+        temporario = f"{self.caminho_registro}.tmp"
+        with open(temporario, 'w') as f:
+            json.dump(registro, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, self.caminho_registro)
+
+    @staticmethod
+    def _hash_pasta(pasta):
+        # Hash de todos os arquivos (caminho relativo + conteúdo), em ordem fixa
+        sha = hashlib.sha256()
+        for raiz, subpastas, arquivos in os.walk(pasta):
+            subpastas.sort()
+            for nome in sorted(arquivos):
+                caminho = os.path.join(raiz, nome)
+                sha.update(os.path.relpath(caminho, pasta).encode())
+                with open(caminho, 'rb') as f:
+                    for bloco in iter(lambda: f.read(1 << 20), b''):
+                        sha.update(bloco)
+        return sha.hexdigest()
+
+    def pasta_versao(self, versao):
+        return os.path.join(self.diretorio_versoes, versao)
+
+    def registrar(self, dados, floresta=None, metadados=None):
+        """
+        Grava uma nova versão (sem promovê-la).
+
+        Args:
+            dados (dict): Conteúdo salvo por salvar_modelo (modelo, pipeline, features...)
+            floresta (FlorestaCompilada): Arrays achatados da floresta, se houver
+            metadados (dict): Informações extras guardadas em metadados.json
+
+        Returns:
+            str: Identificador da versão (prefixo do hash do conteúdo)
+        """
+        os.makedirs(self.diretorio_versoes, exist_ok=True)
+        temporaria = tempfile.mkdtemp(prefix='_nova-', dir=self.diretorio_versoes)
+        try:
+            joblib.dump(dados, os.path.join(temporaria, 'modelo.joblib'))
+            if dados.get('pipeline') is not None:
+                joblib.dump({'pipeline': dados['pipeline'], 'features': dados['features']},
+                            os.path.join(temporaria, 'pipeline.joblib'))
+            if floresta is not None:
+                floresta.salvar(os.path.join(temporaria, 'floresta'))
+
+            versao = self._hash_pasta(temporaria)[:TAMANHO_HASH]
+            destino = self.pasta_versao(versao)
+            if os.path.exists(destino):
+                # Mesmo conteúdo já registrado
+                shutil.rmtree(temporaria)
+                return versao
+
+            historico = dados.get('historico_acuracia') or []
+            info = {
+                'versao': versao,
+                'criado_em': datetime.now().isoformat(),
+                'features': list(dados.get('features', [])),
+                'acuracia': float(historico[-1]) if historico else None,
+                'n_arvores': floresta.n_arvores if floresta is not None else None,
+            }
+            info.update(metadados or {})
+            with open(os.path.join(temporaria, 'metadados.json'), 'w') as f:
+                json.dump(info, f, indent=2, default=str)
+
+            try:
+                os.rename(temporaria, destino)
+            except OSError:
+                # Outro processo registrou o mesmo conteúdo entre a verificação e o rename
+                if not os.path.isdir(destino):
+                    raise
+                shutil.rmtree(temporaria)
+            return versao
+        except Exception:
+            shutil.rmtree(temporaria, ignore_errors=True)
+            raise
+
+    def promover(self, versao, motivo='promocao'):
+        """
+        Torna `versao` a versão atual.
+        """
+        if not os.path.isdir(self.pasta_versao(versao)):
+            raise ValueError(f"Versão {versao} não existe no registro")
+
+        with self._travado():
+            registro = self._ler_registro()
+            if registro['atual'] == versao:
+                return
+            registro['atual'] = versao
+            registro['pilha'].append(versao)
+            registro['eventos'].append({'versao': versao, 'motivo': motivo,
+                                        'em': datetime.now().isoformat()})
+            self._gravar_registro(registro)
+
+    def rollback(self):
+        """
+        Volta para a versão promovida antes da atual.
+
+        Returns:
+            str: Versão restaurada, ou None se não houver anterior
+        """
+        with self._travado():
+            registro = self._ler_registro()
+            if len(registro['pilha']) < 2:
+                return None
+
+            registro['pilha'].pop()
+            registro['atual'] = registro['pilha'][-1]
+            registro['eventos'].append({'versao': registro['atual'], 'motivo': 'rollback',
+                                        'em': datetime.now().isoformat()})
+            self._gravar_registro(registro)
+            return registro['atual']
+
+    def versao_atual(self):
+        try:
+            return self._ler_registro()['atual']
+        except (OSError, ValueError):
+            return None
+
+    def metadados(self, versao):
+        with open(os.path.join(self.pasta_versao(versao), 'metadados.json')) as f:
+            return json.load(f)
+
+    def listar(self):
+        """
+        Returns:
+            list: Metadados de todas as versões, da mais recente para a mais antiga
+        """
+        if not os.path.isdir(self.diretorio_versoes):
+            return []
+        versoes = [self.metadados(v) for v in os.listdir(self.diretorio_versoes)
+                   if not v.startswith('_') and os.path.isdir(self.pasta_versao(v))]
+        return sorted(versoes, key=lambda m: m['criado_em'], reverse=True)
+
+    def carregar(self, versao=None, mmap_mode='r'):
+        """
+        Carrega uma versão (padrão: a atual).
+
+        Os arrays NumPy são mapeados em memória em vez de copiados: vários
+        processos com a mesma versão compartilham as páginas do arquivo.
+
+        Returns:
+            tuple: (dados, floresta compilada ou None, versão)
+        """
+        versao = versao or self.versao_atual()
+        if versao is None:
+            raise FileNotFoundError(f"Nenhuma versão promovida em {self.diretorio}")
+
+        pasta = self.pasta_versao(versao)
+        dados = joblib.load(os.path.join(pasta, 'modelo.joblib'), mmap_mode=mmap_mode)
+        floresta = None
+        if os.path.isdir(os.path.join(pasta, 'floresta')):
+            floresta = FlorestaCompilada.carregar(os.path.join(pasta, 'floresta'), mmap_mode=mmap_mode)
+        return dados, floresta, versao
+
+    def carregar_leve(self, versao=None, mmap_mode='r'):
+        """
+        Carrega só o necessário para prever com a floresta compilada.
+
+        Lê pipeline.joblib e os arrays da floresta, sem desserializar o
+        modelo do scikit-learn (que importaria a biblioteca inteira).
+
+        Returns:
+            tuple: (pipeline, features, floresta, versão) ou None se a versão
+                não tiver esses arquivos (boosting ou registrada antes deles)
+        """
+        versao = versao or self.versao_atual()
+        if versao is None:
+            raise FileNotFoundError(f"Nenhuma versão promovida em {self.diretorio}")
+
+        pasta = self.pasta_versao(versao)
+        caminho_pipeline = os.path.join(pasta, 'pipeline.joblib')
+        if not (os.path.exists(caminho_pipeline) and os.path.isdir(os.path.join(pasta, 'floresta'))):
+            return None
+        dados = joblib.load(caminho_pipeline)
+        floresta = FlorestaCompilada.carregar(os.path.join(pasta, 'floresta'), mmap_mode=mmap_mode)
+        return dados['pipeline'], dados['features'], floresta, versao
+
+
+def main():
+    registro = RegistroModelos(os.environ.get('REGISTRO_MODELOS', 'modelos'))
+    comando = sys.argv[1] if len(sys.argv) > 1 else 'listar'
+
+    if comando == 'listar':
+        atual = registro.versao_atual()
+        versoes = registro.listar()
+        if not versoes:
+            print("Nenhuma versão registrada")
+        for info in versoes:
+            marcador = '*' if info['versao'] == atual else ' '
+            acuracia = f"{info['acuracia']:.4f}" if info.get('acuracia') is not None else '-'
+            print(f"{marcador} {info['versao']}  {info['criado_em'][:19]}  acurácia {acuracia}  "
+                  f"árvores {info.get('n_arvores') or '-'}")
+    elif comando == 'promover' and len(sys.argv) > 2:
+        try:
+            registro.promover(sys.argv[2])
+            print(f"Versão {sys.argv[2]} promovida")
+        except ValueError as e:
+            print(f"Erro: {e}")
+    elif comando == 'rollback':
+        versao = registro.rollback()
+        print(f"Rollback para {versao}" if versao else "Não há versão anterior para restaurar")
+    else:
+        print("Uso: python model_registry.py [listar | promover <versao> | rollback]")
+
+
+if __name__ == "__main__":
+    main()
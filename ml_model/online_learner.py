@@ -0,0 +1,211 @@
+"""
+Aprendizado incremental: o modelo é atualizado a cada lote de leituras novas,
+sem refazer o treino completo.
+
+Cada lote é primeiro avaliado com o modelo atual e só depois usado no treino
+(avaliação prequencial), então a acurácia da janela mede sempre dados que o
+modelo ainda não viu. O custo por lote depende só do tamanho do lote.
+
+Uso:
+    python online_learner.py [intervalo_segundos] [api_url]
+"""
+import os
+import sys
+import time
+from collections import deque
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from feature_pipeline import PreprocessadorIrrigacao
+from model_engines import MOTOR_ONLINE
+
+
+class AprendizOnline:
+    """
+    Classificador linear (SGD, perda logística) treinado com partial_fit.
+
+    A padronização é estimada incrementalmente nas primeiras
+    `amostras_aquecimento` leituras e depois congelada, para que os pesos
+    aprendidos continuem valendo para a mesma escala.
+    """
+
+    def __init__(self, sistema, caminho_checkpoint='modelo_online.pkl', tamanho_lote=500,
+                 janela_acuracia=2000, checkpoint_lotes=20, amostras_aquecimento=2000,
+                 registrar=False):
+        """
+        Args:
+            sistema (SistemaIrrigacaoML): Fornece cliente da API, preparar_dados e o registro
+            caminho_checkpoint (str): Arquivo do modelo incremental
+            tamanho_lote (int): Leituras pedidas à API por lote
+            janela_acuracia (int): Leituras consideradas na acurácia da janela
+            checkpoint_lotes (int): Lotes entre dois checkpoints
+            amostras_aquecimento (int): Leituras usadas para estimar a padronização
+            registrar (bool): Também registra e promove cada checkpoint no registro
+                de versões (a API passa a servir o modelo incremental)
+        """
+        self.sistema = sistema
+        self.caminho_checkpoint = caminho_checkpoint
+        self.tamanho_lote = tamanho_lote
+        self.checkpoint_lotes = checkpoint_lotes
+        self.amostras_aquecimento = amostras_aquecimento
+        self.registrar = registrar
+
+        self.modelo = None
+        self.pipeline = None
+        self.features = None
+        self.historico_acuracia = []
+        self.ultimo_id = None
+        self.lotes = 0
+        self.amostras = 0
+        # (acertos, total) de cada lote recente
+        self.janela = deque()
+        self.janela_acuracia = janela_acuracia
+        self._acertos_janela = 0
+        self._total_janela = 0
+
+        if os.path.exists(caminho_checkpoint):
+            self._restaurar()
+
+    def _restaurar(self):
+        dados = joblib.load(self.caminho_checkpoint)
+        estado = dados.get('metadados_treino', {}).get('online', {})
+        self.modelo = dados['modelo']
+        self.pipeline = dados['pipeline']
+        self.features = dados['features']
+        self.historico_acuracia = dados.get('historico_acuracia', [])
+        self.ultimo_id = estado.get('ultimo_id')
+        self.lotes = estado.get('lotes', 0)
+        self.amostras = estado.get('amostras', 0)
+        print(f"Checkpoint restaurado: {self.amostras} leituras, último id {self.ultimo_id}")
+
+    def acuracia_janela(self):
+        return self._acertos_janela / self._total_janela if self._total_janela else None
+
+    def _atualizar_janela(self, acertos, total):
+        self.janela.append((acertos, total))
+        self._acertos_janela += acertos
+        self._total_janela += total
+        while self._total_janela - self.janela[0][1] >= self.janela_acuracia:
+            antigos, total_antigo = self.janela.popleft()
+            self._acertos_janela -= antigos
+            self._total_janela -= total_antigo
+
+    def processar_lote(self, df):
+        """
+        Avalia e depois treina com um lote de leituras (formato de /dados/consulta).
+
+        Returns:
+            float: Acurácia do lote antes do treino, ou None no primeiro lote
+        """
+        from sklearn.linear_model import SGDClassifier
+
+        if 'bomba_ligada' not in df.columns:
+            df = df.assign(bomba_ligada=(df['BOMBA_STATUS'] == 'LIGADA').astype(int))
+        X, y, features = self.sistema.preparar_dados(df)
+        y = y.to_numpy()
+
+        if self.pipeline is None:
+            self.features = features
+            self.pipeline = PreprocessadorIrrigacao(features)
+        if self.pipeline.n_amostras_ < self.amostras_aquecimento:
+            self.pipeline.partial_fit(X)
+        X_scaled = self.pipeline.transform(X)
+
+        acuracia = None
+        if self.modelo is None:
+            self.modelo = SGDClassifier(loss='log_loss', alpha=1e-4, random_state=42)
+        elif len(y):
+            acertos = int((self.modelo.predict(X_scaled) == y).sum())
+            self._atualizar_janela(acertos, len(y))
+            acuracia = acertos / len(y)
+
+        self.modelo.partial_fit(X_scaled, y, classes=np.array([0, 1]))
+        self.lotes += 1
+        self.amostras += len(y)
+        if 'ID' in df.columns:
+            self.ultimo_id = int(df['ID'].max())
+
+        if self.lotes % self.checkpoint_lotes == 0:
+            self.salvar_checkpoint()
+        return acuracia
+
+    def salvar_checkpoint(self):
+        # Grava o modelo no mesmo formato de salvar_modelo (arquivo temporário + rename)
+        acuracia = self.acuracia_janela()
+        if acuracia is not None:
+            self.historico_acuracia.append(acuracia)
+
+        dados = {
+            'modelo': self.modelo,
+            'pipeline': self.pipeline,
+            'features': self.features,
+            'historico_acuracia': self.historico_acuracia,
+            'metadados_treino': {
+                'motor': MOTOR_ONLINE,
+                'online': {
+                    'ultimo_id': self.ultimo_id,
+                    'lotes': self.lotes,
+                    'amostras': self.amostras,
+                    'acuracia_janela': acuracia,
+                    'checkpoint_em': datetime.now().isoformat()
+                }
+            }
+        }
+        temporario = f"{self.caminho_checkpoint}.tmp"
+        joblib.dump(dados, temporario)
+        os.replace(temporario, self.caminho_checkpoint)
+
+        if self.registrar:
+            from model_registry import RegistroModelos
+            registro = RegistroModelos(self.sistema.diretorio_registro)
+            registro.promover(registro.registrar(dados, metadados=dados['metadados_treino']))
+
+        texto = f"{acuracia:.3f}" if acuracia is not None else "-"
+        print(f"Checkpoint: {self.amostras} leituras, acurácia da janela {texto}")
+
+    def buscar_lote(self):
+        """
+        Pede à API as próximas leituras depois de `ultimo_id`.
+
+        Returns:
+            DataFrame (possivelmente vazio) ou None se a API falhar
+        """
+        params = {'limite': self.tamanho_lote, 'ordem': 'asc'}
+        if self.ultimo_id is not None:
+            params['id_minimo'] = self.ultimo_id
+        resultado = self.sistema.cliente.consultar(**params)
+        if resultado is None:
+            return None
+        return pd.DataFrame(resultado.get('dados', []))
+
+    def executar(self, intervalo=5.0, max_lotes=None):
+        """
+        Consome a API continuamente. Quando não há leituras novas, espera `intervalo` segundos.
+        """
+        processados = 0
+        try:
+            while max_lotes is None or processados < max_lotes:
+                df = self.buscar_lote()
+                if df is None or df.empty:
+                    time.sleep(intervalo)
+                    continue
+                acuracia = self.processar_lote(df)
+                processados += 1
+                if acuracia is not None:
+                    print(f"Lote {self.lotes}: {len(df)} leituras, acurácia {acuracia:.3f}, "
+                          f"janela {self.acuracia_janela():.3f}")
+        except KeyboardInterrupt:
+            print("\nInterrompido pelo usuário")
+        if self.lotes % self.checkpoint_lotes:
+            self.salvar_checkpoint()
+
+
+if __name__ == "__main__":
+    from ml_irrigation_system import SistemaIrrigacaoML
+
+    intervalo = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    api_url = sys.argv[2] if len(sys.argv) > 2 else 'http://localhost:5000'
+    AprendizOnline(SistemaIrrigacaoML(api_url)).executar(intervalo)
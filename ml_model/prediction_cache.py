@@ -0,0 +1,149 @@
+"""
+Cache de predições com entradas quantizadas.
+
+As leituras dos sensores se repetem muito (umidade e temperatura com uma
+casa decimal, fósforo/potássio binários), então a mesma decisão é
+recalculada o tempo todo. O cache arredonda cada entrada para a grade
+configurada em `passos` e guarda a decisão por chave, com despejo LRU,
+validade (TTL) e limpeza automática quando a versão do modelo muda.
+
+A predição de uma entrada que falta no cache é feita já sobre o valor
+arredondado, então o resultado de uma chave não depende de qual leitura
+chegou primeiro. Com passos iguais à precisão dos sensores o arredondamento
+não altera as leituras.
+"""
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from feature_pipeline import COLUNAS_ENTRADA
+
+# Passo de quantização por coluna de entrada
+PASSOS_PADRAO = {
+    'HUMIDITY': 0.1,
+    'TEMPERATURE': 0.1,
+    'PH': 0.01,
+    'FOSFORO_PRESENTE': 1,
+    'POTASSIO_PRESENTE': 1,
+    'hora': 1,
+    'dia_semana': 1,
+}
+
+# Valor da chave para entradas ausentes (NaN não pode virar inteiro)
+_CHAVE_AUSENTE = np.iinfo(np.int64).min
+
+
+class CachePredicoes:
+    """
+    Memoização LRU/TTL de (deve_irrigar, probabilidade_irrigar, confianca).
+    """
+
+    def __init__(self, passos=None, max_itens=10000, ttl_s=300.0, max_lote=256):
+        """
+        Args:
+            passos (dict): Passo de quantização por coluna (sobrepõe PASSOS_PADRAO)
+            max_itens (int): Entradas mantidas antes de despejar a menos usada
+            ttl_s (float): Validade de cada entrada em segundos (None = sem validade)
+            max_lote (int): Lotes maiores passam direto pelo modelo (cargas em massa
+                não devem expulsar as entradas quentes)
+        """
+        passos = dict(PASSOS_PADRAO, **(passos or {}))
+        self.passos = np.array([passos[c] for c in COLUNAS_ENTRADA], dtype=np.float64)
+        self.max_itens = max_itens
+        self.ttl_s = ttl_s
+        self.max_lote = max_lote
+
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.versao = None
+        self._modelo = None
+        self.acertos = 0
+        self.falhas = 0
+        self.expirados = 0
+        self.despejados = 0
+        self.invalidacoes = 0
+
+    def quantizar(self, entrada):
+        """
+        Arredonda a matriz (N, 7) para a grade e gera a chave de cada linha.
+
+        Returns:
+            tuple: (entrada arredondada, lista de chaves em bytes)
+        """
+        indices = np.round(np.asarray(entrada, dtype=np.float64) / self.passos)
+        ausentes = np.isnan(indices)
+        chaves = np.where(ausentes, 0, indices).astype(np.int64)
+        chaves[ausentes] = _CHAVE_AUSENTE
+        return indices * self.passos, [linha.tobytes() for linha in chaves]
+
+    def validar(self, versao, modelo=None):
+        # Limpa o cache se a versão ou o objeto do modelo mudaram desde a última consulta
+        # (um modelo retreinado sem registro mantém a versão antiga)
+        with self._lock:
+            if versao != self.versao or modelo is not self._modelo:
+                if self._itens:
+                    self.invalidacoes += 1
+                self._itens.clear()
+                self.versao = versao
+                self._modelo = modelo
+
+    def limpar(self):
+        with self._lock:
+            if self._itens:
+                self.invalidacoes += 1
+            self._itens.clear()
+
+    def obter(self, chaves):
+        """
+        Returns:
+            list: Valor guardado para cada chave, ou None se ausente/expirado
+        """
+        agora = time.monotonic()
+        valores = []
+        with self._lock:
+            for chave in chaves:
+                item = self._itens.get(chave)
+                if item is not None and self.ttl_s is not None and agora - item[0] > self.ttl_s:
+                    del self._itens[chave]
+                    self.expirados += 1
+                    item = None
+                if item is None:
+                    self.falhas += 1
+                    valores.append(None)
+                else:
+                    self._itens.move_to_end(chave)
+                    self.acertos += 1
+                    valores.append(item[1])
+        return valores
+
+    def guardar(self, chaves, valores, modelo=None):
+        # Resultados de um modelo que já foi trocado (lote em andamento durante a
+        # recarga) são descartados
+        agora = time.monotonic()
+        with self._lock:
+            if modelo is not self._modelo:
+                return
+            for chave, valor in zip(chaves, valores):
+                self._itens[chave] = (agora, valor)
+                self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+                self.despejados += 1
+
+    def metricas(self):
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                'itens': len(self._itens),
+                'max_itens': self.max_itens,
+                'ttl_s': self.ttl_s,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'taxa_acerto': round(self.acertos / consultas, 4) if consultas else None,
+                'expirados': self.expirados,
+                'despejados': self.despejados,
+                'invalidacoes': self.invalidacoes,
+                'versao_modelo': self.versao,
+            }
@@ -0,0 +1,215 @@
+"""
+Dependência parcial (PDP) e curvas ICE do modelo de irrigação.
+
+Para cada ponto da grade, a feature variada substitui o valor de todas as
+leituras de um fundo (amostra do histórico ou uma leitura de referência) e
+o pipeline recalcula as features derivadas (humidity_temp_ratio,
+ph_nutrients) a partir das leituras alteradas. A média das probabilidades
+no fundo é a dependência parcial; cada leitura isolada é uma curva ICE.
+
+A grade inteira (1-D ou 2-D) é avaliada em blocos de linhas, com os blocos
+distribuídos entre threads quando são muitos. Os resultados ficam em cache
+por versão do modelo, em memória e em <registro>/analises/<versao>/.
+"""
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from feature_pipeline import COLUNAS_ENTRADA, montar_entrada
+from ml_irrigation_system import LIMITE_LOTE_COMPILADO
+
+# Faixas das grades padrão das variáveis contínuas
+FAIXAS_PADRAO = {'HUMIDITY': (10, 90), 'TEMPERATURE': (15, 35), 'PH': (5.5, 7.5)}
+
+# Grades completas das variáveis discretas
+GRADES_DISCRETAS = {
+    'FOSFORO_PRESENTE': np.array([0.0, 1.0]),
+    'POTASSIO_PRESENTE': np.array([0.0, 1.0]),
+    'hora': np.arange(24, dtype=np.float64),
+    'dia_semana': np.arange(7, dtype=np.float64),
+}
+
+# Leitura de referência usada como fundo quando não há histórico
+LEITURA_REFERENCIA = {
+    'HUMIDITY': 50, 'TEMPERATURE': 25, 'PH': 6.5,
+    'FOSFORO_PRESENTE': 1, 'POTASSIO_PRESENTE': 1,
+    'hora': 12, 'dia_semana': 2
+}
+
+
+def amostra_fundo(diretorio_feature_store='feature_store', linhas=500, semente=0):
+    """
+    Amostra de leituras do histórico local para servir de fundo.
+
+    Returns:
+        ndarray: Matriz (N, 7) nas COLUNAS_ENTRADA, ou None sem histórico
+    """
+    from feature_store import FeatureStoreLocal
+
+    store = FeatureStoreLocal(diretorio_feature_store)
+    if not (store.estado.get('features') and all(c in store.estado['features'] for c in COLUNAS_ENTRADA)):
+        return None
+    matriz = store.matriz(COLUNAS_ENTRADA, dtype=np.float64)
+    if matriz is None or len(matriz) == 0:
+        return None
+    if len(matriz) > linhas:
+        matriz = matriz[np.random.default_rng(semente).choice(len(matriz), linhas, replace=False)]
+    return matriz
+
+
+class MotorSensibilidade:
+    """
+    Avalia grades de dependência parcial e ICE em lote, com cache por versão.
+    """
+
+    def __init__(self, pipeline, modelo, floresta=None, versao=None, diretorio_cache=None,
+                 tamanho_bloco=50000, workers=None):
+        """
+        Args:
+            pipeline (PreprocessadorIrrigacao): Pré-processamento do modelo
+            modelo: Classificador com predict_proba
+            floresta (FlorestaCompilada): Usada nos blocos pequenos, se houver
+            versao (str): Versão do registro (sem ela, o cache fica só em memória)
+            diretorio_cache (str): Pasta dos resultados por versão (ex.: modelos/analises)
+            tamanho_bloco (int): Linhas avaliadas por chamada ao modelo
+            workers (int): Threads para grades com vários blocos (padrão: núcleos)
+        """
+        self.pipeline = pipeline
+        self.modelo = modelo
+        self.floresta = floresta
+        self.versao = versao
+        self.diretorio_cache = diretorio_cache
+        self.tamanho_bloco = tamanho_bloco
+        self.workers = workers or os.cpu_count() or 1
+
+        self._cache = {}
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.calculos = 0
+        self.linhas_avaliadas = 0
+
+    def _probabilidades(self, entrada):
+        X = self.pipeline.transform(entrada)
+        if self.floresta is not None and len(X) <= LIMITE_LOTE_COMPILADO:
+            probabilidades = self.floresta.predict_proba(X)
+        else:
+            probabilidades = self.modelo.predict_proba(X)
+        return probabilidades[:, list(self.modelo.classes_).index(1)]
+
+    def grade(self, feature, pontos=5):
+        """
+        Valores padrão da grade de uma feature de entrada.
+        """
+        if feature in GRADES_DISCRETAS:
+            return GRADES_DISCRETAS[feature]
+        minimo, maximo = FAIXAS_PADRAO[feature]
+        return np.round(np.linspace(minimo, maximo, pontos), 4)
+
+    def _caminho_cache(self, chave):
+        if self.versao is None or self.diretorio_cache is None:
+            return None
+        return os.path.join(self.diretorio_cache, self.versao, f'pdp-{chave}.npz')
+
+    def dependencia_parcial(self, features, fundo=None, valores=None, pontos=5, ice=False):
+        """
+        Dependência parcial de uma ou duas features de entrada.
+
+        Args:
+            features (str ou list): Uma feature (1-D) ou duas (2-D), entre as COLUNAS_ENTRADA
+            fundo: Leituras (DataFrame ou array (N, 5)/(N, 7)); padrão: LEITURA_REFERENCIA
+            valores (list): Grade de cada feature (padrão: grade())
+            pontos (int): Pontos das grades padrão das variáveis contínuas
+            ice (bool): Devolve também a curva de cada leitura do fundo
+
+        Returns:
+            dict: features, valores (uma grade por feature), media (forma da
+                grade) e, com ice=True, ice (N, forma da grade)
+        """
+        features = [features] if isinstance(features, str) else list(features)
+        if not 1 <= len(features) <= 2:
+            raise ValueError("Informe uma ou duas features")
+        for feature in features:
+            if feature not in COLUNAS_ENTRADA:
+                raise ValueError(f"{feature} não é uma entrada do modelo; as features derivadas "
+                                 f"são recalculadas ao variar {', '.join(COLUNAS_ENTRADA[:3])}")
+
+        if fundo is None:
+            fundo = np.array([[LEITURA_REFERENCIA[c] for c in COLUNAS_ENTRADA]], dtype=np.float64)
+        fundo = montar_entrada(fundo)
+        if valores is None:
+            valores = [self.grade(feature, pontos) for feature in features]
+        valores = [np.asarray(v, dtype=np.float64) for v in valores]
+
+        # Cache pela versão do modelo, features, grade, fundo e modo
+        sha = hashlib.sha1()
+        sha.update(repr((features, bool(ice))).encode())
+        for v in valores + [fundo]:
+            sha.update(np.ascontiguousarray(v).tobytes())
+        chave = sha.hexdigest()[:16]
+        with self._lock:
+            resultado = self._cache.get((self.versao, chave))
+        if resultado is None:
+            caminho = self._caminho_cache(chave)
+            if caminho and os.path.exists(caminho):
+                with np.load(caminho) as arquivo:
+                    resultado = self._montar_resultado(features, valores, arquivo['media'],
+                                                       arquivo['ice'] if ice else None)
+        if resultado is not None:
+            with self._lock:
+                self._cache[(self.versao, chave)] = resultado
+                self.acertos += 1
+            return resultado
+
+        probabilidades = self._avaliar_grade(features, valores, fundo)
+        forma = tuple(len(v) for v in valores)
+        media = probabilidades.mean(axis=1).reshape(forma)
+        curvas = probabilidades.T.reshape((len(fundo),) + forma) if ice else None
+        resultado = self._montar_resultado(features, valores, media, curvas)
+
+        caminho = self._caminho_cache(chave)
+        if caminho:
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            temporario = caminho[:-len('.npz')] + '.tmp.npz'
+            np.savez(temporario, media=media, ice=curvas if ice else np.empty(0))
+            os.replace(temporario, caminho)
+        with self._lock:
+            self._cache[(self.versao, chave)] = resultado
+            self.calculos += 1
+            self.linhas_avaliadas += probabilidades.size
+        return resultado
+
+    @staticmethod
+    def _montar_resultado(features, valores, media, curvas):
+        resultado = {'features': features, 'valores': valores, 'media': media}
+        if curvas is not None:
+            resultado['ice'] = curvas
+        return resultado
+
+    def _avaliar_grade(self, features, valores, fundo):
+        # Probabilidades (pontos da grade, leituras do fundo), em blocos de pontos
+        colunas = [COLUNAS_ENTRADA.index(f) for f in features]
+        pontos_grade = np.stack([m.ravel() for m in np.meshgrid(*valores, indexing='ij')], axis=1)
+        por_bloco = max(1, self.tamanho_bloco // len(fundo))
+        blocos = [pontos_grade[i:i + por_bloco] for i in range(0, len(pontos_grade), por_bloco)]
+
+        def avaliar(bloco):
+            entrada = np.tile(fundo, (len(bloco), 1))
+            for j, coluna in enumerate(colunas):
+                entrada[:, coluna] = np.repeat(bloco[:, j], len(fundo))
+            return self._probabilidades(entrada).reshape(len(bloco), len(fundo))
+
+        if len(blocos) > 1 and self.workers > 1:
+            with ThreadPoolExecutor(min(self.workers, len(blocos))) as executor:
+                partes = list(executor.map(avaliar, blocos))
+        else:
+            partes = [avaliar(bloco) for bloco in blocos]
+        return np.concatenate(partes)
+
+    def metricas(self):
+        with self._lock:
+            return {'versao': self.versao, 'em_memoria': len(self._cache), 'acertos': self.acertos,
+                    'calculos': self.calculos, 'linhas_avaliadas': self.linhas_avaliadas}
+
@@ -0,0 +1,259 @@
+"""
+Cliente HTTP compartilhado para a API de irrigação.
+
+Usado pelo gerador de dados, pelo sistema de ML e pelo dashboard no lugar
+de chamadas soltas a requests.get/requests.post. Mantém sessões keep-alive
+com pool de conexões (uma por thread), compacta com gzip corpos grandes de
+requisição, aceita respostas em gzip, aplica timeout em toda chamada e
+repete falhas transitórias com backoff exponencial e jitter.
+
+GET/HEAD/OPTIONS são repetidos em qualquer falha de conexão, timeout ou
+status de sobrecarga. Os demais métodos (ex.: POST /dados/batch) só quando
+a requisição certamente não foi processada: falha ao abrir a conexão ou
+resposta 429/503; um timeout de leitura ou um 502/504 pode ter gravado os
+dados e sobe para quem chamou.
+
+Para importar a partir das outras pastas do projeto:
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+    from api_client import ClienteAPIIrrigacao
+"""
+import gzip
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+# Status que indicam sobrecarga/indisponibilidade momentânea do servidor
+STATUS_REPETIVEIS = {429, 502, 503, 504}
+# Status em que o servidor recusou a requisição sem processá-la (seguros para POST)
+STATUS_REPETIVEIS_ESCRITA = {429, 503}
+
+
+def _decodificar_json(response):
+    return response.json()
+
+
+def _falhou_antes_do_envio(erro):
+    # Timeout de conexão ou conexão recusada: o servidor não recebeu a requisição
+    if isinstance(erro, requests.exceptions.ConnectTimeout):
+        return True
+    motivo = erro.args[0] if erro.args else None
+    return isinstance(getattr(motivo, 'reason', motivo), NewConnectionError)
+
+
+class ClienteAPIIrrigacao:
+    """
+    Cliente com pool de conexões, compressão e retry para a API de irrigação.
+
+    Args:
+        api_url (str): URL base da API
+        timeout (float | tuple): Timeout (conexão, leitura) em segundos
+        max_tentativas (int): Tentativas por requisição, incluindo a primeira
+        backoff_base (float): Espera base do backoff exponencial em segundos
+        backoff_max (float): Espera máxima entre tentativas em segundos
+        comprimir_envio (bool): Compacta com gzip corpos JSON grandes
+        tamanho_min_compressao (int): Tamanho mínimo (bytes) para compactar
+        tamanho_pool (int): Conexões mantidas abertas por sessão
+    """
+
+    def __init__(self, api_url='http://localhost:5000', timeout=(3.05, 30), max_tentativas=3,
+                 backoff_base=0.2, backoff_max=5.0, comprimir_envio=True,
+                 tamanho_min_compressao=1024, tamanho_pool=32):
+        self.api_url = api_url.rstrip('/')
+        self.timeout = timeout
+        self.max_tentativas = max_tentativas
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.comprimir_envio = comprimir_envio
+        self.tamanho_min_compressao = tamanho_min_compressao
+        self.tamanho_pool = tamanho_pool
+        self._local = threading.local()
+        self._executor = None
+        self._max_em_voo = 0
+        self._lock_executor = threading.Lock()
+
+        # Formatos de resposta conhecidos: nome -> (Accept, decodificador)
+        self.formatos = {'json': ('application/json', _decodificar_json)}
+
+    @property
+    def sessao(self):
+        # Sessão keep-alive da thread atual (requests.Session não é thread-safe)
+        if not hasattr(self._local, 'sessao'):
+            sessao = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=self.tamanho_pool)
+            sessao.mount('http://', adaptador)
+            sessao.mount('https://', adaptador)
+            sessao.headers.update({'Accept-Encoding': 'gzip'})
+            self._local.sessao = sessao
+        return self._local.sessao
+
+    def registrar_formato(self, nome, accept, decodificador):
+        """
+        Registra um formato de resposta (ex.: colunar) para consultar().
+
+        Args:
+            nome (str): Valor enviado no parâmetro `formato` da consulta
+            accept (str): Content-Type pedido no cabeçalho Accept
+            decodificador (callable): Recebe a Response e devolve os dados
+        """
+        self.formatos[nome] = (accept, decodificador)
+
+    def _espera_backoff(self, tentativa):
+        # Backoff exponencial com "full jitter"
+        limite = min(self.backoff_max, self.backoff_base * (2 ** tentativa))
+        return random.uniform(0, limite)
+
+    def requisitar(self, metodo, caminho, json_corpo=None, tentativas=None, **kwargs):
+        """
+        Executa uma requisição com timeout, compressão e retry.
+
+        Requisições que não são GET só são repetidas quando a conexão falhou
+        antes do envio ou o servidor respondeu 429/503, para não duplicar
+        gravações que já foram aceitas.
+
+        Returns:
+            requests.Response: Última resposta recebida
+        """
+        tentativas = tentativas or self.max_tentativas
+        kwargs.setdefault('timeout', self.timeout)
+        headers = dict(kwargs.pop('headers', None) or {})
+
+        if json_corpo is not None:
+            corpo = json.dumps(json_corpo).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+            if self.comprimir_envio and len(corpo) >= self.tamanho_min_compressao:
+                corpo = gzip.compress(corpo, compresslevel=5)
+                headers['Content-Encoding'] = 'gzip'
+            kwargs['data'] = corpo
+
+        idempotente = metodo.upper() in ('GET', 'HEAD', 'OPTIONS')
+        url = f'{self.api_url}{caminho}'
+
+        for tentativa in range(tentativas):
+            ultima = tentativa == tentativas - 1
+            try:
+                response = self.sessao.request(metodo, url, headers=headers, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if ultima or not (idempotente or _falhou_antes_do_envio(e)):
+                    raise
+            else:
+                repetiveis = STATUS_REPETIVEIS if idempotente else STATUS_REPETIVEIS_ESCRITA
+                if response.status_code not in repetiveis or ultima:
+                    return response
+            time.sleep(self._espera_backoff(tentativa))
+
+    def get(self, caminho, **kwargs):
+        return self.requisitar('GET', caminho, **kwargs)
+
+    def post(self, caminho, json=None, **kwargs):
+        return self.requisitar('POST', caminho, json_corpo=json, **kwargs)
+
+    def verificar_saude(self, timeout=5):
+        # True se a API responder 200 em /health
+        try:
+            return self.get('/health', timeout=timeout, tentativas=1).status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    def consultar(self, formato='json', **params):
+        """
+        Consulta /dados/consulta e decodifica a resposta no formato pedido.
+
+        Returns:
+            Dados decodificados, ou None se a API responder com erro
+        """
+        accept, decodificador = self.formatos[formato]
+        if formato != 'json':
+            params['formato'] = formato
+        response = self.get('/dados/consulta', params=params, headers={'Accept': accept})
+        if response.status_code != 200:
+            print(f"Erro ao consultar dados: {response.status_code}")
+            return None
+        return decodificador(response)
+
+    def iterar_consulta(self, tamanho_pagina=5000, limite_total=None, **params):
+        """
+        Percorre /dados/consulta página a página, sem montar tudo em memória.
+
+        Yields:
+            list: Registros de cada página
+        """
+        offset = params.pop('offset', 0)
+        lidos = 0
+        while limite_total is None or lidos < limite_total:
+            pagina = tamanho_pagina if limite_total is None else min(tamanho_pagina, limite_total - lidos)
+            resultado = self.consultar(limite=pagina, offset=offset, **params)
+            if not resultado or not resultado.get('dados'):
+                return
+            dados = resultado['dados']
+            yield dados
+            lidos += len(dados)
+            offset += len(dados)
+            if len(dados) < pagina:
+                return
+
+    def _executor_envio(self, max_em_voo):
+        # Executor mantido entre chamadas: as threads (e suas sessões keep-alive) são reaproveitadas
+        with self._lock_executor:
+            if self._executor is None or self._max_em_voo != max_em_voo:
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                self._executor = ThreadPoolExecutor(max_workers=max_em_voo,
+                                                    thread_name_prefix='envio-lotes')
+                self._max_em_voo = max_em_voo
+            return self._executor
+
+    def fechar(self):
+        """
+        Encerra as threads de envio e a sessão da thread atual.
+        """
+        with self._lock_executor:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+        if hasattr(self._local, 'sessao'):
+            self._local.sessao.close()
+            del self._local.sessao
+
+    def enviar_lotes(self, registros, tamanho_lote=500, max_em_voo=4):
+        """
+        Envia registros para /dados/batch com vários lotes em voo ao mesmo tempo.
+
+        Args:
+            registros (list): Leituras a enviar
+            tamanho_lote (int): Registros por requisição
+            max_em_voo (int): Requisições simultâneas
+
+        Returns:
+            dict: Totais de sucessos, erros de linha e lotes que falharam
+        """
+        lotes = [registros[i:i + tamanho_lote] for i in range(0, len(registros), tamanho_lote)]
+        totais = {'sucessos': 0, 'erros': 0, 'lotes_falhos': 0}
+
+        def enviar(lote):
+            return self.post('/dados/batch', json=lote)
+
+        executor = self._executor_envio(max_em_voo)
+        futuros = [executor.submit(enviar, lote) for lote in lotes]
+        for futuro in as_completed(futuros):
+            try:
+                response = futuro.result()
+            except requests.exceptions.RequestException as e:
+                print(f"Erro ao enviar lote: {e}")
+                totais['lotes_falhos'] += 1
+                continue
+            if response.status_code == 201:
+                resultado = response.json()
+                totais['sucessos'] += resultado.get('sucessos', 0)
+                totais['erros'] += resultado.get('erros', 0)
+            else:
+                print(f"Erro no lote: {response.status_code} - {response.text[:200]}")
+                totais['lotes_falhos'] += 1
+
+        return totais